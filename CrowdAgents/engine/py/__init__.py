@@ -6,14 +6,19 @@ CrowdAgents Python 模拟引擎
 __version__ = "2.0.0"
 
 from .state import (
-    GameState, StateDiff, SnapshotType,
+    GameState, StateDiff, LazyStateDiff, SnapshotType,
     PlayerState, MonsterState, InventoryState, WorldState,
-    CharacterState, UIState, QuestState, EconomyState, EventState,
+    CharacterState, UIState, QuestState, EconomyState, EventState, ItemChange,
 )
 from .snapshot import (
     SnapshotManager, SnapshotStore, SnapshotStrategy,
-    SnapshotMetadata, SnapshotReplayer,
+    SnapshotMetadata, SnapshotReplayer, CompressedSnapshotStore,
+    RetentionPolicy,
 )
+from .codec import SnapshotCodec, get_codec, available_codecs
+from .snapshot_writer import SnapshotWriter
+from .sqlite_store import SqliteSnapshotStore, SnapshotQuery
+from .timetravel import ActionLog, TimeTravel
 from .config import ConfigLoader, GameConfig, SimulationConfig
 from .engine import GameEngine
 from .modules.base import (
@@ -28,15 +33,30 @@ from .evaluator import Evaluator
 from .analyzer import Analyzer
 from .advisor import Advisor
 from .simulator import Simulator, run_simulation
-from .expression import ExpressionEvaluator, EvaluationContext
-from .event_inference import EventInferenceEngine, EventRuleLoader, InferredEvent
+from .expression import (
+    ExpressionEvaluator, ExpressionCompiler, EvaluationContext, VectorizedCompiler, BatchContext,
+)
+from .rule_graph import RuleGraph
+from .timer_wheel import TimerWheel
+from .interning import EntityRegistry
+from .event_flags import EventFlag
+from .event_log import EventLog
+from .event_inference import (
+    EventInferenceEngine, EventRuleLoader, InferredEvent, CompiledRuleSet, RuleSetRegistry,
+    BatchInferenceEngine, RuleProfiler,
+)
+from .scoring import ScoringKernel, ScoringFactor
 
 __all__ = [
-    'GameState', 'StateDiff', 'SnapshotType',
+    'GameState', 'StateDiff', 'LazyStateDiff', 'SnapshotType',
     'PlayerState', 'MonsterState', 'InventoryState', 'WorldState',
-    'CharacterState', 'UIState', 'QuestState', 'EconomyState', 'EventState',
+    'CharacterState', 'UIState', 'QuestState', 'EconomyState', 'EventState', 'ItemChange',
     'SnapshotManager', 'SnapshotStore', 'SnapshotStrategy',
-    'SnapshotMetadata', 'SnapshotReplayer',
+    'SnapshotMetadata', 'SnapshotReplayer', 'CompressedSnapshotStore',
+    'RetentionPolicy',
+    'SnapshotCodec', 'get_codec', 'available_codecs', 'SnapshotWriter',
+    'SqliteSnapshotStore', 'SnapshotQuery',
+    'ActionLog', 'TimeTravel',
     'ConfigLoader', 'GameConfig', 'SimulationConfig',
     'GameEngine',
     'GameModule', 'Action', 'ActionResult', 'ActionType', 'GameContext',
@@ -45,6 +65,10 @@ __all__ = [
     'CasualAgent', 'HardcoreAgent', 'ExplorerAgent', 'SocialAgent', 'PayingAgent',
     'Evaluator', 'Analyzer', 'Advisor',
     'Simulator', 'run_simulation',
-    'ExpressionEvaluator', 'EvaluationContext',
+    'ExpressionEvaluator', 'ExpressionCompiler', 'EvaluationContext',
+    'VectorizedCompiler', 'BatchContext',
+    'RuleGraph', 'TimerWheel', 'EntityRegistry', 'EventFlag', 'EventLog',
     'EventInferenceEngine', 'EventRuleLoader', 'InferredEvent',
+    'CompiledRuleSet', 'RuleSetRegistry', 'BatchInferenceEngine', 'RuleProfiler',
+    'ScoringKernel', 'ScoringFactor',
 ]
@@ -3,13 +3,39 @@ Agent 基类
 定义 Agent 的核心接口和评分逻辑
 """
 
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass, field
 import time
 
 from state import GameState, StateDiff
 from modules.base import Action, ActionType
 from engine import GameEngine
+from scoring import ScoringKernel, ScoringFactor, ScoringVariables, EXPECTATIONS
+from event_flags import EVENT_BITS, event_mask
+from event_log import EventLog
+from timer_wheel import TimerWheel
+
+
+DIMENSIONS = ('excitement', 'growth', 'pacing', 'playability', 'retention', 'immersion')
+
+# 内存中保留的最近事件条数，完整历史见 EventLog 落盘
+EVENT_LOG_CAPACITY = 100
+
+# 期限型期望：因子名 -> (维度, 扣分, 期限 ms)。相关事件发生时重新计时，到期扣分后再计一个期限
+EXPECTATION_DEADLINES = {
+    'noDiscovery': ('playability', -0.08, 20000),
+    'noUpgrade': ('growth', -0.10, 300000),
+    'lowDropRate': ('growth', -0.08, 120000),
+    'progressStall': ('pacing', -0.10, 300000),
+}
+
+# 事件处理里直接加减分的因子：因子名 -> (维度, 分值)
+HANDLER_FACTORS = {
+    'newItem': ('playability', 0.1),
+}
+
+# 维度分保留两位小数，余量小于半个精度的调整会被 round 掉
+SCORE_EPSILON = 0.004
 
 
 @dataclass
@@ -56,27 +82,18 @@ class AgentBase:
         self._prev_state: Optional[GameState] = None
         self._consecutive_fails = 0
         
-        self.dimension_scores = {
-            'excitement': 0.0,
-            'growth': 0.0,
-            'pacing': 0.0,
-            'playability': 0.0,
-            'retention': 0.0,
-            'immersion': 0.0,
-        }
+        self.dimension_scores = {dim: 0.0 for dim in DIMENSIONS}
         
         self.stats = AgentStats()
-        self._event_log: List[Dict[str, Any]] = []
-        self._breakdown: List[Dict[str, Any]] = []
+        self._event_log = EventLog(EVENT_LOG_CAPACITY)
+        # (维度, 问题) -> 条目，按首次出现的顺序
+        self._breakdown: Dict[Tuple[str, str], Dict[str, Any]] = {}
         
         self._seen_monsters: set = set()
         self._used_skills: set = set()
         self._discovered_items: set = set()
         self._monster_kill_count: Dict[str, int] = {}
         
-        self._last_upgrade_time = time.time()
-        self._last_item_time = time.time()
-        self._last_discovery_time = time.time()
         self._floor_start_time = time.time()
         self._battle_start_time: Optional[float] = None
         self._last_level_up_time = time.time()
@@ -94,20 +111,47 @@ class AgentBase:
         self._battles_without_loot = 0
         self._kills_on_current_floor = 0
         self._total_monsters = 0
+        self._new_monster = False
+        self._battle_time_ms = 0.0
+        self._floor_time_ms = 0.0
+        self._since_last_level_up_ms = 0.0
         
         self._has_story_content = False
         self._has_world_lore = False
         self._has_npc_interaction = False
         
-        self._accumulated_scores: Dict[str, Dict[str, float]] = {}
-        dimensions = ['excitement', 'growth', 'pacing', 'playability', 'retention', 'immersion']
-        for dim in dimensions:
-            self._accumulated_scores[dim] = {'positive': 0.0, 'negative': 0.0}
+        # 每个维度正/负两格累计值：下标为 维度序号 * 2 + (0 正面 / 1 负面)
+        self._accumulated = [0.0] * (len(DIMENSIONS) * 2)
         
         self._factor_trigger_counts: Dict[str, int] = {}
+        # 期限型期望的定时轮由 Simulator 提供，键为 (agent.id, 因子名)
+        self._timers: Optional[TimerWheel] = None
+        self._tick_ms = 100
         self._evaluation_config: Optional[Dict[str, Any]] = None
+        self._scoring: Optional[ScoringKernel] = None
+        # 条件当前成立的 expectations 因子；计数器只在事件处理里变，处理过事件后才重新求值
+        self._unmet_expectations: List[ScoringFactor] = []
+        self._score_table: Dict[Tuple[str, str, bool], Tuple[int, Optional[float], float, Tuple[float, ...]]] = {}
+        # regularization.signedCapRemainder：负面因子封顶时余量按扣分计，关闭时与原实现一致按加分计
+        self._signed_cap_remainder = False
+        self._saturation_limits = self._build_saturation_limits()
         self._expectations = self._init_expectations()
         self._sensitivity = self._init_sensitivity()
+        
+        self._event_handlers = {
+            'battle_start': self._on_battle_start,
+            'battle_end': self._on_battle_end,
+            'player_damaged': self._on_player_damaged,
+            'player_healed': self._on_player_healed,
+            'level_up': self._on_level_up,
+            'floor_advance': self._on_floor_advance,
+            'item_obtain': self._on_item_obtain,
+            'item_use': self._on_item_use,
+            'player_death': self._on_player_death,
+            'monster_killed': self._on_monster_killed,
+        }
+        self._handler_mask = event_mask(self._event_handlers)
+        self._unmasked_handlers = self._event_handlers.keys() - EVENT_BITS.keys()
 
     def _init_expectations(self) -> Dict[str, float]:
         defaults = {
@@ -146,28 +190,104 @@ class AgentBase:
 
     def set_evaluation_config(self, config: Dict[str, Any]) -> None:
         self._evaluation_config = config
+        self._scoring = ScoringKernel.for_config(config) if config else None
+        self._score_table = self._build_score_table(config)
+        self._signed_cap_remainder = bool(config and config.get('regularization', {}).get('signedCapRemainder', False))
+        self._saturation_limits = self._build_saturation_limits()
+        self._refresh_expectations()
+
+    def _build_score_table(
+        self, config: Optional[Dict[str, Any]],
+    ) -> Dict[Tuple[str, str, bool], Tuple[int, Optional[float], float, Tuple[float, ...]]]:
+        """
+        把正则化参数按本 Agent 的敏感度、期望预先乘好：
+        (维度, 因子, 是否正面) -> (累计值下标, 调整后分值, 累计上限, (频率倍率, 敏感度, 期望))。
+        因子没有 baseScore 时调整后分值为 None，调用时以 |delta| 乘三个系数
+        """
+        table = {}
+        if not config or not config.get('regularization', {}).get('enabled', True):
+            return table
+        
+        multipliers = config.get('frequencyMultipliers', {})
+        for index, dimension in enumerate(DIMENSIONS):
+            for sign, factors in config.get('factors', {}).get(dimension, {}).items():
+                is_positive = sign == 'positive'
+                sensitivity_mod = self._calculate_sensitivity_modifier(is_positive)
+                expectation_mod = self._calculate_expectation_modifier(dimension)
+                for factor_id, factor in factors.items():
+                    if not factor:
+                        continue
+                    freq = factor.get('frequency', 'medium')
+                    freq_multiplier = multipliers.get(freq, {}).get('baseMultiplier', 1.0)
+                    base_score = factor.get('baseScore')
+                    table[(dimension, factor_id, is_positive)] = (
+                        index * 2 + (0 if is_positive else 1),
+                        None if base_score is None
+                        else base_score * freq_multiplier * sensitivity_mod * expectation_mod,
+                        factor.get('maxAccumulated', 10.0),
+                        (freq_multiplier, sensitivity_mod, expectation_mod),
+                    )
+        return table
+
+    def _build_saturation_limits(self) -> List[Tuple[str, int, float, float]]:
+        """
+        每个维度正/负两格还能累计到多少：(维度, 正面累计值下标, 正面上限, 负面上限)。
+        取会触发的因子里最大的 maxAccumulated；有因子不在评分表里（不受上限约束）时为 inf，没有因子时为 0
+        """
+        sources = [(name, dimension, delta) for name, (dimension, delta, _) in EXPECTATION_DEADLINES.items()]
+        sources += [(name, dimension, delta) for name, (dimension, delta) in HANDLER_FACTORS.items()]
+        if self._scoring is not None:
+            sources += [(factor.factor_id, factor.dimension, factor.delta) for factor in self._scoring.factors]
+        
+        limits = [0.0] * (len(DIMENSIONS) * 2)
+        for factor_id, dimension, delta in sources:
+            if not delta or dimension not in DIMENSIONS:
+                continue
+            entry = self._score_table.get((dimension, factor_id, delta > 0))
+            if entry is not None and entry[1] == 0:
+                continue
+            slot = DIMENSIONS.index(dimension) * 2 + (0 if delta > 0 else 1)
+            limits[slot] = max(limits[slot], entry[2] if entry is not None else float('inf'))
+        return [
+            (dimension, index * 2, limits[index * 2], limits[index * 2 + 1])
+            for index, dimension in enumerate(DIMENSIONS)
+            if limits[index * 2] or limits[index * 2 + 1]
+        ]
+
+    def is_saturated(self) -> bool:
+        """
+        还会触发的因子都已累计到上限，或只剩把分数推向已贴住的边界（10 / 0）的一侧：
+        之后的模拟不会再改变任何维度分
+        """
+        accumulated = self._accumulated
+        scores = self.dimension_scores
+        for dimension, slot, positive_limit, negative_limit in self._saturation_limits:
+            up = accumulated[slot] < positive_limit - SCORE_EPSILON
+            down = accumulated[slot + 1] < negative_limit - SCORE_EPSILON
+            if up and (down or scores[dimension] < 10):
+                return False
+            if down and scores[dimension] > 0:
+                return False
+        return True
 
     def decide(self, state: GameState) -> Action:
-        return Action(ActionType.ATTACK)
+        return Action.of(ActionType.ATTACK)
 
     def analyze_state_change(self, prev: GameState, curr: GameState, diff: StateDiff) -> None:
-        for event in diff.events_inferred:
-            self._process_event(event, diff, prev, curr)
+        events = diff.events_inferred
+        mask = diff.event_mask
+        if mask & self._handler_mask or not self._unmasked_handlers.isdisjoint(events):
+            for event in events:
+                self._process_event(event, diff, prev, curr)
+            self._refresh_expectations()
+        
+        if self._scoring is not None and self._scoring.triggered_by(events, mask):
+            variables = ScoringVariables(SCORING_VARIABLES, self, prev, curr)
+            for factor in self._scoring.fired(events, variables):
+                self._adjust_score(factor.dimension, factor.delta, factor.factor_id)
 
     def _process_event(self, event: str, diff: StateDiff, prev: GameState, curr: GameState) -> None:
-        handlers = {
-            'battle_start': self._on_battle_start,
-            'battle_end': self._on_battle_end,
-            'player_damaged': self._on_player_damaged,
-            'player_healed': self._on_player_healed,
-            'level_up': self._on_level_up,
-            'floor_advance': self._on_floor_advance,
-            'item_obtain': self._on_item_obtain,
-            'item_use': self._on_item_use,
-            'player_death': self._on_player_death,
-            'monster_killed': self._on_monster_killed,
-        }
-        handler = handlers.get(event)
+        handler = self._event_handlers.get(event)
         if handler:
             handler(diff, prev, curr)
 
@@ -178,23 +298,18 @@ class AgentBase:
         self._battle_turns = 0
         self._was_low_hp = False
         self._hit_combo = 0
+        self._new_monster = False
         
         if curr.monster:
             monster_id = curr.monster.id
             if monster_id not in self._seen_monsters:
                 self._seen_monsters.add(monster_id)
-                self._last_discovery_time = time.time()
-                self._adjust_score('playability', 0.15, 'newMonster')
-                self._adjust_score('excitement', 0.2, 'firstBlood')
-            
-            if curr.monster.is_boss:
-                self._adjust_score('excitement', 0.3, 'bossFight')
-            
-            if curr.world.floor >= 8:
-                self._adjust_score('excitement', 0.15, 'highFloor')
+                self._rearm('noDiscovery')
+                self._new_monster = True
 
     def _on_battle_end(self, diff: StateDiff, prev: GameState, curr: GameState) -> None:
         battle_time = (time.time() - self._battle_start_time) * 1000 if self._battle_start_time else 0
+        self._battle_time_ms = battle_time
         
         if prev.monster:
             self.stats.wins += 1
@@ -205,15 +320,11 @@ class AgentBase:
             self._battles_at_same_level += 1
             self._kills_on_current_floor += 1
             
-            self._adjust_score('growth', 0.03, 'battleVictory')
-            
             hp_ratio = curr.player.hp / curr.player.max_hp
             
-            if hp_ratio < 0.2:
-                self._adjust_score('excitement', 0.25, 'closeVictory')
-            elif hp_ratio > 0.9:
+            if hp_ratio > 0.9:
                 self._consecutive_easy_wins += 1
-            else:
+            elif hp_ratio >= 0.2:
                 self._consecutive_easy_wins = 0
             
             if hp_ratio < 0.3:
@@ -221,30 +332,10 @@ class AgentBase:
             else:
                 self._no_low_hp_battles += 1
             
-            if self._was_low_hp and hp_ratio > 0:
-                self._adjust_score('excitement', 0.30, 'comeback')
-            
-            if self._win_streak > 3:
-                self._adjust_score('retention', 0.10, 'winStreak')
-                self._adjust_score('pacing', 0.06, 'winStreak')
-            
-            if len(self._skills_used_in_battle) >= 3:
-                self._adjust_score('excitement', 0.20, 'skillCombo')
-                self._adjust_score('playability', 0.12, 'diversePlaystyle')
-            
-            if battle_time < 10000:
-                self._adjust_score('pacing', 0.03, 'quickBattle')
-            elif battle_time > 30000:
-                self._adjust_score('pacing', -0.08, 'battleTooLong')
-                self._adjust_score('excitement', -0.08, 'battleDrag')
-            
             self._consecutive_fails = 0
             
-            if prev.monster:
-                monster_id = prev.monster.id
-                self._monster_kill_count[monster_id] = self._monster_kill_count.get(monster_id, 0) + 1
-                if self._monster_kill_count[monster_id] > 10:
-                    self._adjust_score('playability', -0.1, 'repetitiveMonster')
+            monster_id = prev.monster.id
+            self._monster_kill_count[monster_id] = self._monster_kill_count.get(monster_id, 0) + 1
         
         self._log_event('battleEnd', {'battle_time': battle_time, 'victory': prev.monster is not None})
 
@@ -253,11 +344,7 @@ class AgentBase:
         hp_ratio = curr.player.hp / curr.player.max_hp
         
         if hp_ratio < 0.3:
-            self._adjust_score('excitement', 0.1, 'lowHPBattle')
             self._was_low_hp = True
-        
-        if hp_ratio < 0.15:
-            self._adjust_score('excitement', 0.15, 'lowHPBattle')
 
     def _on_player_healed(self, diff: StateDiff, prev: GameState, curr: GameState) -> None:
         pass
@@ -265,48 +352,36 @@ class AgentBase:
     def _on_level_up(self, diff: StateDiff, prev: GameState, curr: GameState) -> None:
         old_level = self.stats.level
         self.stats.level = curr.player.level
-        self._last_upgrade_time = time.time()
+        self._rearm('noUpgrade')
         self._battles_at_same_level = 0
         
-        self._adjust_score('growth', 0.2, 'levelUp')
-        self._adjust_score('growth', 0.10, 'statGain')
-        
         now = time.time()
-        if now - self._last_level_up_time < 300:
-            self._adjust_score('growth', 0.15, 'quickLevelUp')
+        self._since_last_level_up_ms = (now - self._last_level_up_time) * 1000
         self._last_level_up_time = now
         
         self._log_event('levelUp', {'new_level': curr.player.level, 'old_level': old_level})
 
     def _on_floor_advance(self, diff: StateDiff, prev: GameState, curr: GameState) -> None:
         time_spent = (time.time() - self._floor_start_time) * 1000
+        self._floor_time_ms = time_spent
         self.stats.max_floor = max(self.stats.max_floor, curr.world.floor)
         self._win_streak = 0
         self._kills_on_current_floor = 0
         
-        self._adjust_score('retention', 0.15, 'newFloor')
-        
-        if time_spent < 180000:
-            self._adjust_score('pacing', 0.10, 'fastFloorProgress')
-        elif time_spent > 300000:
-            self._adjust_score('pacing', -0.10, 'floorTooSlow')
-        
-        self._adjust_score('pacing', 0.05, 'progressVisible')
-        
         self._floor_start_time = time.time()
+        self._rearm('progressStall')
         self._log_event('floorAdvance', {'new_floor': curr.world.floor, 'time_spent': time_spent})
 
     def _on_item_obtain(self, diff: StateDiff, prev: GameState, curr: GameState) -> None:
-        self._last_item_time = time.time()
+        self._rearm('lowDropRate')
         self._battles_without_loot = 0
         
         for item_id in diff.item_obtained:
             if item_id not in self._discovered_items:
                 self._discovered_items.add(item_id)
-                self._last_discovery_time = time.time()
-                self._adjust_score('playability', 0.1, 'newItem')
-        
-        self._adjust_score('growth', 0.02, 'commonItem')
+                self._rearm('noDiscovery')
+                dimension, delta = HANDLER_FACTORS['newItem']
+                self._adjust_score(dimension, delta, 'newItem')
 
     def _on_item_use(self, diff: StateDiff, prev: GameState, curr: GameState) -> None:
         self.stats.items_used += 1
@@ -316,67 +391,36 @@ class AgentBase:
         self._win_streak = 0
         self._fail_streak += 1
         
-        self._adjust_score('retention', -0.5, 'death')
-        self._adjust_score('growth', -0.20, 'progressLoss')
-        self._adjust_score('pacing', -0.15, 'deathInterrupt')
-        
         self._log_event('playerDeath', {'floor': prev.world.floor})
 
     def _on_monster_killed(self, diff: StateDiff, prev: GameState, curr: GameState) -> None:
         if prev.monster:
             self._battles_without_loot += 1
-            if self._battles_without_loot >= 5:
-                self._adjust_score('retention', -0.08, 'noLootStreak')
 
     def _adjust_score(self, dimension: str, delta: float, factor_name: str = None) -> None:
-        if dimension not in self.dimension_scores:
+        score = self.dimension_scores.get(dimension)
+        if score is None:
             return
         
-        if self._evaluation_config and factor_name:
-            delta = self._calculate_adjusted_delta(dimension, delta, factor_name)
+        entry = self._score_table.get((dimension, factor_name, delta > 0)) if factor_name else None
+        if entry is not None:
+            slot, adjusted, max_accumulated, modifiers = entry
+            if adjusted is None:
+                adjusted = abs(delta) * modifiers[0] * modifiers[1] * modifiers[2]
+            accumulated = self._accumulated[slot]
+            if accumulated + adjusted > max_accumulated:
+                remaining = max_accumulated - accumulated
+                if remaining <= 0:
+                    remaining = 0
+                self._accumulated[slot] = accumulated + remaining
+                delta = -remaining if delta < 0 and self._signed_cap_remainder else remaining
+            else:
+                self._accumulated[slot] = accumulated + adjusted
+                delta = adjusted if delta > 0 else -adjusted
         
-        new_score = max(0, min(10, self.dimension_scores[dimension] + delta))
+        new_score = max(0, min(10, score + delta))
         self.dimension_scores[dimension] = round(new_score, 2)
 
-    def _calculate_adjusted_delta(self, dimension: str, delta: float, factor_name: str) -> float:
-        config = self._evaluation_config
-        if not config:
-            return delta
-        
-        regularization = config.get('regularization', {})
-        if not regularization.get('enabled', True):
-            return delta
-        
-        factors = config.get('factors', {}).get(dimension, {})
-        is_positive = delta > 0
-        factor_config = factors.get('positive' if is_positive else 'negative', {}).get(factor_name)
-        
-        if not factor_config:
-            return delta
-        
-        base_score = factor_config.get('baseScore', abs(delta))
-        freq = factor_config.get('frequency', 'medium')
-        freq_multiplier = config.get('frequencyMultipliers', {}).get(freq, {}).get('baseMultiplier', 1.0)
-        
-        sensitivity_mod = self._calculate_sensitivity_modifier(is_positive)
-        expectation_mod = self._calculate_expectation_modifier(dimension)
-        
-        adjusted = base_score * freq_multiplier * sensitivity_mod * expectation_mod
-        
-        accumulated_key = 'positive' if is_positive else 'negative'
-        current_accumulated = self._accumulated_scores[dimension][accumulated_key]
-        max_accumulated = factor_config.get('maxAccumulated', 10.0)
-        
-        if current_accumulated + abs(adjusted) > max_accumulated:
-            remaining = max_accumulated - current_accumulated
-            if remaining <= 0:
-                return 0
-            adjusted = remaining if is_positive else -remaining
-        
-        self._accumulated_scores[dimension][accumulated_key] += abs(adjusted)
-        
-        return adjusted if is_positive else -adjusted
-
     def _calculate_sensitivity_modifier(self, is_positive: bool) -> float:
         sensitivity = self._sensitivity['positive'] if is_positive else self._sensitivity['negative']
         return max(0.5, min(1.5, sensitivity))
@@ -407,7 +451,7 @@ class AgentBase:
                 'level': self.stats.level,
                 'kills': self.stats.kills,
             },
-            'breakdown': self._breakdown[-10:],
+            'breakdown': list(self._breakdown.values())[-10:],
         }
 
     def _calculate_overall_score(self) -> float:
@@ -432,55 +476,89 @@ class AgentBase:
             'data': data,
             'time': time.time(),
         })
-        
-        if len(self._event_log) > 100:
-            self._event_log = self._event_log[-100:]
+
+    @property
+    def event_log(self) -> EventLog:
+        return self._event_log
 
     def _add_breakdown(self, dimension: str, issue: str, severity: str) -> None:
-        existing = next((b for b in self._breakdown if b['dimension'] == dimension and b['issue'] == issue), None)
+        existing = self._breakdown.get((dimension, issue))
         if existing:
             existing['count'] = existing.get('count', 1) + 1
         else:
-            self._breakdown.append({
+            self._breakdown[(dimension, issue)] = {
                 'dimension': dimension,
                 'issue': issue,
                 'severity': severity,
                 'count': 1,
-            })
+            }
+
+    def schedule_expectations(self, timers: TimerWheel, tick_ms: int = 100) -> None:
+        """把期限型期望登记到 timers，之后到期的键交给 on_expectation_timer"""
+        self._timers = timers
+        self._tick_ms = tick_ms
+        for name in EXPECTATION_DEADLINES:
+            self._rearm(name)
+
+    def _rearm(self, name: str) -> None:
+        if self._timers is None:
+            return
+        self._timers.schedule((self.id, name), -(-EXPECTATION_DEADLINES[name][2] // self._tick_ms))
+
+    def on_expectation_timer(self, name: str) -> None:
+        dimension, delta, _ = EXPECTATION_DEADLINES[name]
+        self._adjust_score(dimension, delta, name)
+        self._rearm(name)
+
+    def _refresh_expectations(self) -> None:
+        """对 on 为 expectations 的条件因子求值，记下成立的因子"""
+        if self._scoring is None:
+            self._unmet_expectations = []
+            return
+        variables = ScoringVariables(SCORING_VARIABLES, self, None, None)
+        self._unmet_expectations = self._scoring.fired((EXPECTATIONS,), variables)
 
     def check_unmet_expectations(self) -> None:
-        now = time.time()
-        
-        if now - self._last_discovery_time > 20000:
-            self._adjust_score('playability', -0.08, 'noDiscovery')
-        
-        if self._total_monsters > 15 and len(self._seen_monsters) < 5:
-            self._adjust_score('playability', -0.15, 'monsterVarietyLow')
-        
-        if not self._has_story_content:
-            self._adjust_score('immersion', -0.08, 'noStoryContent')
-        
-        if now - self._last_upgrade_time > 300000:
-            self._adjust_score('growth', -0.10, 'noUpgrade')
-        
-        if now - self._last_item_time > 120000:
-            self._adjust_score('growth', -0.08, 'lowDropRate')
-        
-        if self._battles_at_same_level > 10:
-            self._adjust_score('growth', -0.12, 'levelStagnation')
-        
-        if self._consecutive_easy_wins > 5:
-            self._adjust_score('excitement', -0.08, 'battleTooEasy')
-        
-        if self._no_low_hp_battles > 10:
-            self._adjust_score('excitement', -0.10, 'noThrill')
-        
-        if self._fail_streak > 2:
-            self._adjust_score('pacing', -0.12, 'failStreak')
-            self._adjust_score('retention', -0.25, 'negativeFeedback')
-        
-        if now - self._floor_start_time > 300000:
-            self._adjust_score('pacing', -0.10, 'progressStall')
+        """
+        条件成立的 expectations 因子各加减一次分，每个 tick 调用，条件本身不在这里求值；
+        期限型期望由定时轮驱动，见 schedule_expectations
+        """
+        for factor in self._unmet_expectations:
+            self._adjust_score(factor.dimension, factor.delta, factor.factor_id)
+
+
+
+# 评分 trigger 可用的变量：(agent, prev, curr) -> 值；prev/curr 在 expectations 分组里为 None
+SCORING_VARIABLES = {
+    'wasLowHP': lambda agent, prev, curr: agent._was_low_hp,
+    'newMonster': lambda agent, prev, curr: agent._new_monster,
+    'winStreak': lambda agent, prev, curr: agent._win_streak,
+    'failStreak': lambda agent, prev, curr: agent._fail_streak,
+    'skillsInBattle': lambda agent, prev, curr: len(agent._skills_used_in_battle),
+    'hitCombo': lambda agent, prev, curr: agent._hit_combo,
+    'turns': lambda agent, prev, curr: agent._battle_turns,
+    'battleTimeMs': lambda agent, prev, curr: agent._battle_time_ms,
+    'floorTimeMs': lambda agent, prev, curr: agent._floor_time_ms,
+    'sinceLastLevelUpMs': lambda agent, prev, curr: agent._since_last_level_up_ms,
+    'battlesWithoutLoot': lambda agent, prev, curr: agent._battles_without_loot,
+    'battlesAtSameLevel': lambda agent, prev, curr: agent._battles_at_same_level,
+    'consecutiveEasyWins': lambda agent, prev, curr: agent._consecutive_easy_wins,
+    'noLowHPBattles': lambda agent, prev, curr: agent._no_low_hp_battles,
+    'totalMonsters': lambda agent, prev, curr: agent._total_monsters,
+    'monsterTypes': lambda agent, prev, curr: len(agent._seen_monsters),
+    'hasStory': lambda agent, prev, curr: agent._has_story_content,
+    'hasLore': lambda agent, prev, curr: agent._has_world_lore,
+    'hasNPC': lambda agent, prev, curr: agent._has_npc_interaction,
+    'hpRatio': lambda agent, prev, curr: curr.player.hp / curr.player.max_hp if curr.player.max_hp else 0,
+    'maxHP': lambda agent, prev, curr: curr.player.max_hp,
+    'damage': lambda agent, prev, curr: max(0, prev.player.hp - curr.player.hp),
+    'floor': lambda agent, prev, curr: curr.world.floor,
+    'victory': lambda agent, prev, curr: prev.monster is not None,
+    'isBoss': lambda agent, prev, curr: bool(curr.monster and curr.monster.is_boss),
+    'monsterKills': lambda agent, prev, curr: (
+        agent._monster_kill_count.get(prev.monster.id, 0) if prev.monster else 0
+    ),
+}
 
 
 from agents.casual import CasualAgent
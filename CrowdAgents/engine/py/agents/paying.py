@@ -24,21 +24,21 @@ class PayingAgent(AgentBase):
             if self.engine and self.engine.has_healing_item():
                 healing_item = self._get_healing_item()
                 if healing_item:
-                    return Action(ActionType.USE_ITEM, {'item_id': healing_item})
+                    return Action.of(ActionType.USE_ITEM, item_id=healing_item)
         
         if state.world.can_advance:
-            return Action(ActionType.NEXT_FLOOR)
+            return Action.of(ActionType.NEXT_FLOOR)
         
         if not state.world.in_battle:
-            return Action(ActionType.EXPLORE)
+            return Action.of(ActionType.EXPLORE)
         
         available_skills = self._get_available_skills(state)
         if available_skills:
             best_skill = self._select_best_skill(state, available_skills)
             if best_skill:
-                return Action(ActionType.USE_SKILL, {'skill_id': best_skill})
+                return Action.of(ActionType.USE_SKILL, skill_id=best_skill)
         
-        return Action(ActionType.ATTACK)
+        return Action.of(ActionType.ATTACK)
 
     def _get_healing_item(self) -> str:
         if self.engine:
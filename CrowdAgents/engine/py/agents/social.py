@@ -24,20 +24,20 @@ class SocialAgent(AgentBase):
             if self.engine and self.engine.has_healing_item():
                 healing_item = self._get_healing_item()
                 if healing_item:
-                    return Action(ActionType.USE_ITEM, {'item_id': healing_item})
+                    return Action.of(ActionType.USE_ITEM, item_id=healing_item)
         
         if state.world.can_advance:
             if random.random() < 0.6:
-                return Action(ActionType.NEXT_FLOOR)
+                return Action.of(ActionType.NEXT_FLOOR)
         
         if not state.world.in_battle:
-            return Action(ActionType.EXPLORE)
+            return Action.of(ActionType.EXPLORE)
         
         available_skills = self._get_available_skills(state)
         if available_skills and random.random() < 0.35:
-            return Action(ActionType.USE_SKILL, {'skill_id': random.choice(available_skills)})
+            return Action.of(ActionType.USE_SKILL, skill_id=random.choice(available_skills))
         
-        return Action(ActionType.ATTACK)
+        return Action.of(ActionType.ATTACK)
 
     def _get_healing_item(self) -> str:
         if self.engine:
@@ -0,0 +1,90 @@
+"""
+稳态分配基准测试
+每种人格的 Agent 驱动一个 GameEngine 跑相同的 tick 循环（取状态、决策、执行、取事件、推断事件、构建 StateDiff、
+Agent 分析），分别在默认模式与稳态模式（复用 ActionResult、StateDiff 池化）下运行。
+统计期间保留每个 tick 交给调用方的行动、结果与 diff，用 tracemalloc 与 sys.getallocatedblocks 计算
+这些对象平均每个 tick 新占用的内存：稳态模式下它们是同一批对象，增量应接近 0
+
+    python benchmarks/bench_alloc.py
+    python benchmarks/bench_alloc.py --ticks 3000 --warmup 300
+"""
+
+import argparse
+import gc
+import random
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import ConfigLoader
+from engine import GameEngine
+from agents.base import AgentBase
+from event_inference import EventInferenceEngine
+
+
+def run(game_config, evaluation_config, persona, steady_state: bool, ticks: int, warmup: int, seed: int):
+    random.seed(seed)
+    engine = GameEngine(game_config, seed, steady_state=steady_state)
+    agent = AgentBase.create(dict(persona))
+    agent.set_engine(engine)
+    agent.set_evaluation_config(evaluation_config)
+    inference = EventInferenceEngine()
+    inference.pool_diffs = steady_state
+
+    actions, results, diffs = [None] * ticks, [None] * ticks, [None] * ticks
+
+    def step(i: int) -> None:
+        prev = engine.get_state()
+        action = agent.decide(prev)
+        result = engine.execute(action)
+        engine.get_events()
+        curr = engine.get_state()
+        computed = inference._compute_values(prev, curr, engine.get_inventory_changes())
+        events, _ = inference.infer(prev, curr, computed=computed)
+        diff = inference.build_state_diff(prev, curr, events, computed)
+        agent.analyze_state_change(prev, curr, diff)
+        actions[i], results[i], diffs[i] = action, result, diff
+
+    for i in range(warmup):
+        step(i % ticks)
+    actions[:], results[:], diffs[:] = [None] * ticks, [None] * ticks, [None] * ticks
+
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    traced = tracemalloc.get_traced_memory()[0]
+    for i in range(ticks):
+        step(i)
+    gc.collect()
+    return (
+        (tracemalloc.get_traced_memory()[0] - traced) / ticks,
+        (sys.getallocatedblocks() - blocks) / ticks,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='稳态分配基准测试')
+    parser.add_argument('--ticks', type=int, default=1000, help='每个 Agent 统计的 tick 数')
+    parser.add_argument('--warmup', type=int, default=200, help='统计前预热的 tick 数（填满驻留表与对象池）')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    args = parser.parse_args()
+
+    loader = ConfigLoader()
+    game_config = loader.load_game_config()
+    evaluation_config = loader.load_evaluation_config()
+    personas = loader.load_simulation_config().agents
+
+    tracemalloc.start()
+    print(f"[Benchmark] {args.ticks} ticks x {len(personas)} personas")
+    print(f"{'persona':<12} {'default B/tick':>15} {'blocks':>7} {'steady B/tick':>14} {'blocks':>7}")
+    for persona in personas:
+        default = run(game_config, evaluation_config, persona, False, args.ticks, args.warmup, args.seed)
+        steady = run(game_config, evaluation_config, persona, True, args.ticks, args.warmup, args.seed)
+        print(f"{persona.get('type', '?'):<12} {default[0]:>15,.0f} {default[1]:>7.1f} "
+              f"{steady[0]:>14,.0f} {steady[1]:>7.1f}")
+    tracemalloc.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+批量事件推断基准测试
+让 N 个 Agent 锁步推进，按 tick 分批，对比逐个 Agent 调用 EventInferenceEngine.infer
+与 BatchInferenceEngine.infer_batch 一次处理整批，校验结果一致并报告每秒处理的 Agent-tick 数
+
+    python benchmarks/bench_batch_inference.py
+    python benchmarks/bench_batch_inference.py --agents 8 64 256 --ticks 100
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import ConfigLoader
+from engine import GameEngine
+from agents.base import AgentBase
+from event_inference import EventInferenceEngine, BatchInferenceEngine
+
+
+def collect_batches(loader: ConfigLoader, agents: int, ticks: int, seed: int):
+    random.seed(seed)
+    game_config = loader.load_game_config()
+    personas = loader.load_simulation_config().agents
+
+    engines = []
+    for i in range(agents):
+        engine = GameEngine(game_config, seed + i)
+        agent = AgentBase.create(dict(personas[i % len(personas)]))
+        agent.set_engine(engine)
+        engines.append((engine, agent, engine.get_state()))
+
+    batches = []
+    for _ in range(ticks):
+        prevs, currs = [], []
+        for n, (engine, agent, prev) in enumerate(engines):
+            engine.execute(agent.decide(prev))
+            curr = engine.get_state()
+            prevs.append(prev)
+            currs.append(curr)
+            engines[n] = (engine, agent, curr)
+        batches.append((prevs, currs))
+    return batches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量事件推断基准测试')
+    parser.add_argument('--agents', type=int, nargs='+', default=[8, 64, 256], help='每批 Agent 数量')
+    parser.add_argument('--ticks', type=int, default=100, help='锁步推进的 tick 数')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    args = parser.parse_args()
+
+    loader = ConfigLoader()
+    scalar = EventInferenceEngine()
+
+    print(f"{'agents':>6} {'per-agent/s':>13} {'batched/s':>13} {'speedup':>8} {'mismatches':>11}")
+    for agents in args.agents:
+        batches = collect_batches(loader, agents, args.ticks, args.seed)
+        batch = BatchInferenceEngine()
+        computeds = [
+            [scalar._compute_values(p, c) for p, c in zip(prevs, currs)]
+            for prevs, currs in batches
+        ]
+
+        start = time.perf_counter()
+        expected = [
+            [scalar.infer(p, c, computed=computed) for p, c, computed in zip(prevs, currs, batch_computed)]
+            for (prevs, currs), batch_computed in zip(batches, computeds)
+        ]
+        before = agents * args.ticks / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        actual = [
+            batch.infer_batch(prevs, currs, computeds=batch_computed)
+            for (prevs, currs), batch_computed in zip(batches, computeds)
+        ]
+        after = agents * args.ticks / (time.perf_counter() - start)
+
+        mismatches = sum(
+            1
+            for tick_expected, tick_actual in zip(expected, actual)
+            for (e_events, e_data), (a_events, a_data) in zip(tick_expected, tick_actual)
+            if [e.event_id for e in e_events] != [e.event_id for e in a_events] or e_data != a_data
+        )
+        print(f"{agents:>6} {before:>13,.0f} {after:>13,.0f} {after / before:>7.1f}x {mismatches:>11}")
+        print(f"       {batch.stats}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+事件规则表达式基准测试
+用若干 Agent 真实跑出的 (prev, curr) 状态对，对 event_rules.json 中所有条件和
+data_extract 表达式分别用解释执行（ExpressionEvaluator）与编译闭包（ExpressionCompiler）求值，
+校验结果一致并报告每秒求值次数
+
+    python benchmarks/bench_expression.py
+    python benchmarks/bench_expression.py --agents 5 --ticks 200 --repeat 3
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import ConfigLoader
+from engine import GameEngine
+from agents.base import AgentBase
+from event_inference import EventInferenceEngine
+from expression import ExpressionEvaluator, ExpressionCompiler, EvaluationContext
+
+
+def collect_contexts(loader: ConfigLoader, agents: int, ticks: int, seed: int):
+    random.seed(seed)
+    game_config = loader.load_game_config()
+    personas = loader.load_simulation_config().agents
+    inference = EventInferenceEngine()
+
+    contexts = []
+    for i in range(agents):
+        engine = GameEngine(game_config, seed + i)
+        agent = AgentBase.create(dict(personas[i % len(personas)]))
+        agent.set_engine(engine)
+        prev = engine.get_state()
+        for _ in range(ticks):
+            engine.execute(agent.decide(prev))
+            curr = engine.get_state()
+            contexts.append(EvaluationContext(
+                prev=prev, curr=curr,
+                computed=inference._compute_values(prev, curr),
+                events=[],
+            ))
+            prev = curr
+    return contexts
+
+
+def safe(fn, *args):
+    try:
+        return fn(*args)
+    except Exception as e:
+        return type(e)
+
+
+def run(expressions, contexts, evaluate, repeat: int) -> float:
+    count = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for context in contexts:
+            for expr in expressions:
+                try:
+                    evaluate(expr, context)
+                except Exception:
+                    pass
+                count += 1
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='事件规则表达式基准测试')
+    parser.add_argument('--agents', type=int, default=5, help='Agent 数量')
+    parser.add_argument('--ticks', type=int, default=400, help='每个 Agent 的 tick 数')
+    parser.add_argument('--repeat', type=int, default=3, help='重复求值轮数')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    args = parser.parse_args()
+
+    loader = ConfigLoader()
+    rules = EventInferenceEngine().loader.get_all_rules()
+    conditions = [rule.condition for rule in rules]
+    extracts = [field for rule in rules for field in rule.data_extract]
+    contexts = collect_contexts(loader, args.agents, args.ticks, args.seed)
+
+    evaluator = ExpressionEvaluator()
+    compiler = ExpressionCompiler()
+    compiled = {expr: compiler.compile(expr) for expr in conditions + extracts}
+
+    mismatches = 0
+    for context in contexts:
+        for expr in conditions + extracts:
+            if safe(evaluator.evaluate, expr, context) != safe(compiled[expr], context):
+                mismatches += 1
+
+    print(f"[Benchmark] {len(conditions)} conditions + {len(extracts)} extracts x {len(contexts)} state pairs")
+    print(f"[Benchmark] mismatches: {mismatches}")
+    print(f"{'expressions':<12} {'interpreted/s':>15} {'compiled/s':>15} {'speedup':>8}")
+    for name, expressions in (('conditions', conditions), ('extracts', extracts)):
+        before = run(expressions, contexts, evaluator.evaluate, args.repeat)
+        after = run(expressions, contexts, lambda expr, ctx: compiled[expr](ctx), args.repeat)
+        print(f"{name:<12} {before:>15,.0f} {after:>15,.0f} {after / before:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
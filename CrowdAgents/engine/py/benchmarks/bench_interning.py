@@ -0,0 +1,75 @@
+"""
+实体 ID 驻留基准测试
+对比技能冷却查询在三种键下的耗时：引擎每次列出可用技能都对每个已装备技能调用 is_skill_ready。
+字符串一列是定时器键直接含技能名，每次驻留一列是每次调用都先查名字再建键，
+预建键一列是当前 PlayerModule 的实现（配置加载时为每个技能建好键）
+
+    python benchmarks/bench_interning.py
+    python benchmarks/bench_interning.py --calls 500000
+"""
+
+import argparse
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import ConfigLoader
+from engine import GameEngine
+from timer_wheel import TimerWheel
+
+
+def bench_cooldowns(game_config, calls: int, seed: int):
+    engine = GameEngine(game_config, seed)
+    player = engine._engine.get_module('player')
+    skills = [skill['id'] for skill in game_config.skills]
+    rng = random.Random(seed)
+    queries = [rng.choice(skills) for _ in range(1024)]
+
+    # 一半技能处于冷却中，三种写法看到相同的冷却状态
+    by_name = TimerWheel()
+    names = player.registry.skills
+    for skill_id in skills[::2]:
+        player.start_cooldown(skill_id, 5)
+        by_name.schedule(('player', 'cooldown', skill_id), 5)
+
+    timers = player.timers
+
+    # 三种写法都以一次函数调用的形式出现，与引擎中的调用方式相同
+    def by_string(skill_id):
+        return ('player', 'cooldown', skill_id) not in by_name
+
+    def by_intern(skill_id):
+        return ('player', 'cooldown', names.intern(skill_id)) not in timers
+
+    def timed(ready):
+        def loop():
+            for skill_id in queries:
+                ready(skill_id)
+        return loop
+
+    readers = (by_string, by_intern, player.is_skill_ready)
+    expected = [by_string(skill_id) for skill_id in queries]
+    assert all([ready(skill_id) for skill_id in queries] == expected for ready in readers)
+    return [min(timeit.repeat(timed(ready), number=calls // len(queries), repeat=5)) * 1e9 / calls
+            for ready in readers]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='实体 ID 驻留基准测试')
+    parser.add_argument('--calls', type=int, default=200000, help='每种写法的调用次数')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    args = parser.parse_args()
+
+    game_config = ConfigLoader().load_game_config()
+
+    print(f"[Benchmark] {args.calls} calls, {len(game_config.skills)} skills")
+    string_keys, intern_per_call, prebuilt_keys = bench_cooldowns(game_config, args.calls, args.seed)
+    print(f"{'is_skill_ready':<16} {'string':>10} {'intern/call':>12} {'prebuilt':>10}  (ns/call)")
+    print(f"{'':<16} {string_keys:>10.1f} {intern_per_call:>12.1f} {prebuilt_keys:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
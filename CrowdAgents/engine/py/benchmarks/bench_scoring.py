@@ -0,0 +1,127 @@
+"""
+评分调整基准测试
+从 evaluation.json 的因子中按种子抽样出一串 _adjust_score 调用，分别在每种人格的 Agent 上
+用原先逐次查配置的正则化逻辑与预编译评分表重放，校验最终维度分一致并报告每秒调用次数
+
+    python benchmarks/bench_scoring.py
+    python benchmarks/bench_scoring.py --calls 50000 --repeat 5
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import ConfigLoader
+from agents.base import AgentBase, DIMENSIONS
+
+
+class LegacyScoring:
+    """改造前 _adjust_score 的实现：每次调用都从配置字典中查找正则化参数"""
+
+    def __init__(self, agent: AgentBase, config):
+        self.agent = agent
+        self.config = config
+        self.scores = {dim: 0.0 for dim in DIMENSIONS}
+        self.accumulated = {dim: {'positive': 0.0, 'negative': 0.0} for dim in DIMENSIONS}
+
+    def adjust(self, dimension: str, delta: float, factor_name: str = None) -> None:
+        if dimension not in self.scores:
+            return
+        if self.config and factor_name:
+            delta = self.adjusted_delta(dimension, delta, factor_name)
+        new_score = max(0, min(10, self.scores[dimension] + delta))
+        self.scores[dimension] = round(new_score, 2)
+
+    def adjusted_delta(self, dimension: str, delta: float, factor_name: str) -> float:
+        config = self.config
+        regularization = config.get('regularization', {})
+        if not regularization.get('enabled', True):
+            return delta
+
+        factors = config.get('factors', {}).get(dimension, {})
+        is_positive = delta > 0
+        factor_config = factors.get('positive' if is_positive else 'negative', {}).get(factor_name)
+        if not factor_config:
+            return delta
+
+        base_score = factor_config.get('baseScore', abs(delta))
+        freq = factor_config.get('frequency', 'medium')
+        freq_multiplier = config.get('frequencyMultipliers', {}).get(freq, {}).get('baseMultiplier', 1.0)
+        sensitivity_mod = self.agent._calculate_sensitivity_modifier(is_positive)
+        expectation_mod = self.agent._calculate_expectation_modifier(dimension)
+        adjusted = base_score * freq_multiplier * sensitivity_mod * expectation_mod
+
+        key = 'positive' if is_positive else 'negative'
+        current = self.accumulated[dimension][key]
+        max_accumulated = factor_config.get('maxAccumulated', 10.0)
+        if current + abs(adjusted) > max_accumulated:
+            remaining = max_accumulated - current
+            if remaining <= 0:
+                return 0
+            # signedCapRemainder 关闭时与原实现一致：负面因子封顶的那一次余量按加分计
+            signed = regularization.get('signedCapRemainder', False)
+            adjusted = remaining if is_positive or signed else -remaining
+
+        self.accumulated[dimension][key] += abs(adjusted)
+        return adjusted if is_positive else -adjusted
+
+
+def sample_calls(config, count: int, seed: int):
+    rng = random.Random(seed)
+    factors = [
+        (dimension, factor_id, factor['baseScore'] if sign == 'positive' else -factor['baseScore'])
+        for dimension, signs in config['factors'].items()
+        for sign, group in signs.items()
+        for factor_id, factor in group.items()
+    ]
+    # 也混入没有配置的因子名，走不做正则化的分支
+    factors.append(('playability', 'unconfigured', 0.05))
+    return [rng.choice(factors) for _ in range(count)]
+
+
+def run(adjust, calls, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for dimension, factor_id, delta in calls:
+            adjust(dimension, delta, factor_id)
+    return len(calls) * repeat / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='评分调整基准测试')
+    parser.add_argument('--calls', type=int, default=20000, help='每个 Agent 重放的调用次数')
+    parser.add_argument('--repeat', type=int, default=3, help='重放轮数')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    args = parser.parse_args()
+
+    loader = ConfigLoader()
+    config = loader.load_evaluation_config()
+    personas = loader.load_simulation_config().agents
+    calls = sample_calls(config, args.calls, args.seed)
+
+    print(f"[Benchmark] {len(calls)} calls x {len(personas)} personas")
+    print(f"{'persona':<12} {'match':>6} {'legacy/s':>12} {'table/s':>12} {'speedup':>8}")
+    for persona in personas:
+        def fresh():
+            agent = AgentBase.create(dict(persona))
+            agent.set_evaluation_config(config)
+            return agent, LegacyScoring(agent, config)
+
+        agent, legacy = fresh()
+        for dimension, factor_id, delta in calls:
+            agent._adjust_score(dimension, delta, factor_id)
+            legacy.adjust(dimension, delta, factor_id)
+        match = agent.dimension_scores == legacy.scores
+
+        agent, legacy = fresh()
+        before = run(legacy.adjust, calls, args.repeat)
+        after = run(agent._adjust_score, calls, args.repeat)
+        print(f"{agent.type:<12} {str(match):>6} {before:>12,.0f} {after:>12,.0f} {after / before:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+快照压缩基准测试
+驱动 N 个 Agent 运行指定时长，将每个 tick 的状态写入 CompressedSnapshotStore，
+报告各编解码器的压缩率以及写入、随机读取吞吐（MB/s，按未压缩字节计）
+
+默认规模为 10 分钟、1000 个 Agent：
+    python benchmarks/bench_snapshot_codec.py
+小规模试跑：
+    python benchmarks/bench_snapshot_codec.py --agents 50 --duration 60000
+"""
+
+import argparse
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import ConfigLoader
+from engine import GameEngine
+from agents.base import AgentBase
+from snapshot import CompressedSnapshotStore
+from codec import available_codecs, get_codec
+
+
+def build_agents(loader: ConfigLoader, count: int):
+    personas = loader.load_simulation_config().agents
+    configs = []
+    for i in range(count):
+        config = dict(personas[i % len(personas)])
+        config['id'] = f"{config.get('id', 'agent')}_{i:04d}"
+        configs.append(config)
+    return configs
+
+
+def run_codec(codec_name: str, agent_configs, game_config, ticks: int,
+              reads: int, block_size: int, seed: int) -> dict:
+    random.seed(seed)
+    root = Path(tempfile.mkdtemp(prefix=f"snap_{codec_name}_"))
+    codec = get_codec(codec_name)
+
+    instances = []
+    for i, agent_config in enumerate(agent_configs):
+        engine = GameEngine(game_config, seed + i)
+        agent = AgentBase.create(agent_config)
+        agent.set_engine(engine)
+        store = CompressedSnapshotStore(
+            str(root / agent_config['id']), codec, block_size=block_size,
+            dictionary_path=str(root / CompressedSnapshotStore.DICTIONARY_FILE),
+        )
+        instances.append((agent, engine, store))
+
+    write_time = 0.0
+    for _ in range(ticks):
+        for agent, engine, store in instances:
+            engine.execute(agent.decide(engine.get_state()))
+            state = engine.get_state()
+            start = time.perf_counter()
+            store.save(state)
+            write_time += time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _, _, store in instances:
+        store.flush()
+    write_time += time.perf_counter() - start
+
+    raw_bytes = sum(store.raw_bytes for _, _, store in instances)
+    disk_bytes = sum(f.stat().st_size for f in root.rglob('*') if f.is_file())
+
+    rng = random.Random(seed)
+    targets = []
+    for _ in range(reads):
+        store = instances[rng.randrange(len(instances))][2]
+        snapshot_id = rng.choice(list(store._locations.keys()))
+        targets.append((store, snapshot_id))
+
+    read_bytes = 0
+    start = time.perf_counter()
+    for store, snapshot_id in targets:
+        read_bytes += len(store._read_record(snapshot_id))
+    read_time = time.perf_counter() - start
+
+    shutil.rmtree(root, ignore_errors=True)
+
+    mb = 1024 * 1024
+    return {
+        'codec': codec_name,
+        'records': ticks * len(instances),
+        'raw_mb': raw_bytes / mb,
+        'disk_mb': disk_bytes / mb,
+        'ratio': raw_bytes / disk_bytes if disk_bytes else 0.0,
+        'write_mb_s': raw_bytes / mb / write_time if write_time > 0 else 0.0,
+        'read_mb_s': read_bytes / mb / read_time if read_time > 0 else 0.0,
+        'reads_per_s': reads / read_time if read_time > 0 else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='快照压缩基准测试')
+    parser.add_argument('--agents', type=int, default=1000, help='Agent 数量')
+    parser.add_argument('--duration', type=int, default=600000, help='模拟时长(毫秒)')
+    parser.add_argument('--codecs', default=','.join(c for c in available_codecs() if c != 'none'),
+                        help='逗号分隔的编解码器列表')
+    parser.add_argument('--reads', type=int, default=10000, help='随机读取次数')
+    parser.add_argument('--block-size', type=int, default=64, help='每块快照条数')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    args = parser.parse_args()
+
+    loader = ConfigLoader()
+    game_config = loader.load_game_config()
+    tick_interval = loader.load_simulation_config().tick_interval_ms
+    ticks = args.duration // tick_interval
+    agent_configs = build_agents(loader, args.agents)
+
+    print(f"[Benchmark] {args.agents} agents x {ticks} ticks, block_size={args.block_size}")
+    print(f"{'codec':<6} {'records':>10} {'raw MB':>9} {'disk MB':>9} {'ratio':>7} {'write MB/s':>11} {'read MB/s':>10} {'reads/s':>9}")
+    for codec_name in args.codecs.split(','):
+        r = run_codec(codec_name.strip(), agent_configs, game_config, ticks,
+                      args.reads, args.block_size, args.seed)
+        print(f"{r['codec']:<6} {r['records']:>10} {r['raw_mb']:>9.1f} {r['disk_mb']:>9.2f} "
+              f"{r['ratio']:>7.1f} {r['write_mb_s']:>11.1f} {r['read_mb_s']:>10.1f} {r['reads_per_s']:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
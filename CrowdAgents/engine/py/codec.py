@@ -0,0 +1,144 @@
+"""
+快照压缩编解码器
+按块压缩快照数据，运行时选择 zlib / lzma / zstd（带训练字典）
+"""
+
+from typing import Dict, List, Optional, Type
+import threading
+import zlib
+import lzma
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class SnapshotCodec:
+    """编解码器基类，不压缩"""
+
+    name = 'none'
+
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    def decompress(self, data: bytes) -> bytes:
+        return data
+
+    @property
+    def needs_training(self) -> bool:
+        return False
+
+    def train(self, samples: List[bytes]) -> bool:
+        return False
+
+    def get_dictionary(self) -> Optional[bytes]:
+        return None
+
+    def load_dictionary(self, data: bytes) -> None:
+        pass
+
+
+class ZlibCodec(SnapshotCodec):
+    name = 'zlib'
+
+    def __init__(self, level: int = 6):
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+
+class LzmaCodec(SnapshotCodec):
+    name = 'lzma'
+
+    def __init__(self, preset: int = 6):
+        self.preset = preset
+
+    def compress(self, data: bytes) -> bytes:
+        return lzma.compress(data, format=lzma.FORMAT_XZ, preset=self.preset)
+
+    def decompress(self, data: bytes) -> bytes:
+        return lzma.decompress(data)
+
+
+class ZstdCodec(SnapshotCodec):
+    """
+    zstd 编解码器
+    字典由首批快照样本训练，同一实例可在多个 Store 之间共享
+    """
+
+    name = 'zstd'
+
+    def __init__(self, level: int = 3, dict_size: int = 16384, dictionary: bytes = None):
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed")
+        self.level = level
+        self.dict_size = dict_size
+        self._lock = threading.Lock()
+        self._dict: Optional['zstandard.ZstdCompressionDict'] = None
+        self._trained = False
+        self._build(None)
+        if dictionary:
+            self.load_dictionary(dictionary)
+
+    def _build(self, dict_data) -> None:
+        self._dict = dict_data
+        self._compressor = zstandard.ZstdCompressor(level=self.level, dict_data=dict_data)
+        self._decompressor = zstandard.ZstdDecompressor(dict_data=dict_data)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._decompressor.decompress(data)
+
+    @property
+    def needs_training(self) -> bool:
+        return not self._trained
+
+    def train(self, samples: List[bytes]) -> bool:
+        with self._lock:
+            if self._trained:
+                return True
+            self._trained = True
+            try:
+                dict_data = zstandard.train_dictionary(self.dict_size, samples)
+            except zstandard.ZstdError:
+                return False
+            self._build(dict_data)
+            return True
+
+    def get_dictionary(self) -> Optional[bytes]:
+        return self._dict.as_bytes() if self._dict else None
+
+    def load_dictionary(self, data: bytes) -> None:
+        with self._lock:
+            self._trained = True
+            self._build(zstandard.ZstdCompressionDict(data))
+
+
+CODECS: Dict[str, Type[SnapshotCodec]] = {
+    'none': SnapshotCodec,
+    'zlib': ZlibCodec,
+    'lzma': LzmaCodec,
+}
+if zstandard is not None:
+    CODECS['zstd'] = ZstdCodec
+
+
+def available_codecs() -> List[str]:
+    return list(CODECS.keys())
+
+
+def get_codec(name: str = 'auto', **kwargs) -> SnapshotCodec:
+    """按名称创建编解码器，auto 优先 zstd，不可用时退回 zlib"""
+    if name == 'auto':
+        name = 'zstd' if 'zstd' in CODECS else 'zlib'
+    codec_class = CODECS.get(name)
+    if codec_class is None:
+        raise ValueError(f"Unknown or unavailable snapshot codec: {name}")
+    return codec_class(**kwargs)
@@ -18,6 +18,21 @@ class SimulationConfig:
     random_seed: Optional[int] = None
     log_level: str = "INFO"
     agents: List[Dict[str, Any]] = field(default_factory=list)
+    snapshot_dir: Optional[str] = None
+    snapshot_codec: Optional[str] = None
+    snapshot_db: Optional[str] = None
+    snapshot_writer_threads: int = 0
+    snapshot_queue_size: int = 1024
+    snapshot_retention: Optional[Dict[str, Any]] = None
+    action_log_dir: Optional[str] = None
+    keyframe_interval: int = 500
+    batch_inference: bool = False
+    hybrid_events: bool = False
+    profile_rules: bool = False
+    steady_state: bool = False
+    retire_converged: bool = False
+    convergence_window: int = 0
+    convergence_epsilon: float = 0.01
 
 
 @dataclass
@@ -56,7 +71,7 @@ class ConfigLoader:
         if path:
             config_path = Path(path)
         else:
-            config_path = self._project_root / "MainGame" / "Configs" / "config.json"
+            config_path = self._project_root / "MainGame" / "public" / "Configs" / "config.json"
         
         data = orjson.loads(config_path.read_bytes())
         
@@ -97,6 +112,7 @@ class ConfigLoader:
             random_seed=None,
             log_level="INFO",
             agents=data.get('agents', []),
+            snapshot_retention=simulation.get('snapshotRetention'),
         )
         
         self._agents_config = data
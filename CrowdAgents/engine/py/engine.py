@@ -4,25 +4,42 @@
 """
 
 from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
+from array import array
+import hashlib
 import time
 
-from state import GameState, PlayerState, MonsterState, InventoryState, WorldState, CharacterState, UIState
+from state import (
+    GameState, PlayerState, MonsterState, InventoryState, WorldState, CharacterState, UIState, ItemChange,
+)
 from modules.base import ModularGameEngine, Action, ActionResult, ActionType
 from modules.player import PlayerModule
 from modules.combat import CombatModule
 from modules.world import WorldModule
 from modules.inventory import InventoryModule
 from config import GameConfig
+from event_flags import EVENT_BITS
+
+
+# 这些行动可能结束战斗，成功后由引擎结算掉落、楼层进度与死亡
+BATTLE_RESULT_ACTIONS = frozenset({ActionType.ATTACK, ActionType.USE_SKILL})
+
+BATTLE_START = EVENT_BITS['battle_start']
+BATTLE_END = EVENT_BITS['battle_end']
+MONSTER_KILLED = EVENT_BITS['monster_killed']
+PLAYER_DEATH = EVENT_BITS['player_death']
+ITEM_OBTAIN = EVENT_BITS['item_obtain']
 
 
 class GameEngine:
-    def __init__(self, config: GameConfig, seed: int = None):
+    def __init__(self, config: GameConfig, seed: int = None, steady_state: bool = False):
+        """steady_state 为真时模块复用行动结果对象，execute 返回的结果只在下一次同类行动前有效"""
         self.config = config
         self._engine = ModularGameEngine(config, seed)
+        self._engine.recycle_results = steady_state
         self._tick = 0
         
-        self._player_module = PlayerModule(config.player)
+        self._player_module = PlayerModule(config.player, config.equipment)
         self._combat_module = CombatModule(
             config.player,
             config.monsters,
@@ -47,6 +64,7 @@ class GameEngine:
         self._engine.register_module(self._inventory_module)
         
         self._last_events: List[str] = []
+        self._last_event_mask = 0
         self._last_action_result: Optional[ActionResult] = None
         
         self._character = CharacterState()
@@ -93,6 +111,13 @@ class GameEngine:
                 learned_skills=player_state['learned_skills'],
                 equipped_skills=player_state['equipped_skills'],
                 skill_cooldowns=player_state['skill_cooldowns'],
+                buffs=player_state['buffs'],
+                debuffs=player_state['debuffs'],
+                total_atk=player_state['total_atk'],
+                total_def=player_state['total_def'],
+                total_crit_rate=player_state['total_crit_rate'],
+                total_dodge_rate=player_state['total_dodge_rate'],
+                total_max_hp=player_state['total_max_hp'],
             ),
             monster=monster_state,
             inventory=InventoryState(
@@ -106,62 +131,29 @@ class GameEngine:
                 can_advance=world_state['can_advance'],
                 in_battle=world_state['in_battle'],
             ),
-            character=self._character,
-            ui=self._ui,
+            character=self._character.copy(),
+            # 引擎只整体替换 UIState 中的列表、不原地修改，各状态可以共用
+            ui=replace(self._ui),
         )
 
     def execute(self, action: Action) -> ActionResult:
         self._last_events.clear()
+        self._last_event_mask = 0
+        self._inventory_module.journal.clear()
         self._update_ui_before_action(action)
         
-        if action.type == ActionType.EXPLORE:
-            result = self._engine.process_action(action)
-            if result.success:
-                self._last_events.extend(result.events)
-        
-        elif action.type == ActionType.ATTACK:
-            result = self._engine.process_action(action)
-            if result.success:
-                self._last_events.extend(result.events)
-                self._handle_battle_result(result)
-        
-        elif action.type == ActionType.USE_SKILL:
-            result = self._engine.process_action(action)
-            if result.success:
-                self._last_events.extend(result.events)
+        result = self._engine.process_action(action)
+        if result.success:
+            self._last_events.extend(result.events)
+            self._last_event_mask = result.event_mask
+            if action.type in BATTLE_RESULT_ACTIONS:
                 self._handle_battle_result(result)
         
-        elif action.type == ActionType.USE_ITEM:
-            result = self._engine.process_action(action)
-            if result.success:
-                self._last_events.extend(result.events)
-        
-        elif action.type == ActionType.NEXT_FLOOR:
-            result = self._engine.process_action(action)
-            if result.success:
-                self._last_events.extend(result.events)
-        
-        elif action.type == ActionType.FORGE:
-            result = self._engine.process_action(action)
-            if result.success:
-                self._last_events.extend(result.events)
-        
-        elif action.type == ActionType.DEFEND:
-            result = self._engine.process_action(action)
-            if result.success:
-                self._last_events.extend(result.events)
-        
-        else:
-            result = ActionResult(
-                success=False,
-                action_type=action.type,
-                message=f"Unknown action type: {action.type}"
-            )
-        
         self._last_action_result = result
         self._tick += 1
         
-        self._player_module.reduce_cooldowns()
+        # 冷却与增益/减益按行动计时：每次 execute 推进一格，tick() 不推进
+        self._engine.advance_timers(self._engine.timers.now + 1)
         
         self._update_ui_after_action(action, result)
         self._update_character_state(result)
@@ -169,7 +161,7 @@ class GameEngine:
         return result
 
     def _handle_battle_result(self, result: ActionResult) -> None:
-        if 'battle_end' in result.events or 'monster_killed' in result.events:
+        if self._last_event_mask & (BATTLE_END | MONSTER_KILLED):
             self._world_module.on_battle_end(
                 victory=result.data.get('victory', False),
                 context=self._engine._context
@@ -185,16 +177,63 @@ class GameEngine:
                     if loot:
                         result.data['loot'] = loot
                         self._last_events.append('item_obtain')
+                        self._last_event_mask |= ITEM_OBTAIN
         
         if result.data.get('enemy_attack', {}).get('player_died'):
             self._world_module.on_player_death(self._engine._context)
             self._last_events.append('player_death')
+            self._last_event_mask |= PLAYER_DEATH
 
-    def get_events(self) -> List[str]:
-        events = self._last_events.copy()
+    def save_keyframe(self) -> Dict[str, Any]:
+        """完整引擎状态（含模块内部字段与 RNG），用于确定性重放"""
+        version, internal, gauss_next = self._engine.rng.getstate()
+        return {
+            'tick': self._tick,
+            'engine_tick': self._engine._tick,
+            'modules': self._engine.get_state(),
+            'rng': [version, list(internal), gauss_next],
+            'character': self._character.to_dict(),
+            'ui': self._ui.to_dict(),
+        }
+
+    def load_keyframe(self, keyframe: Dict[str, Any]) -> None:
+        self._tick = keyframe['tick']
+        self._engine._tick = keyframe['engine_tick']
+        self._engine.timers.clear(self._tick)
+        self._engine.set_state(keyframe['modules'])
+        version, internal, gauss_next = keyframe['rng']
+        self._engine.rng.setstate((version, tuple(internal), gauss_next))
+        self._character = CharacterState.from_dict(keyframe['character'])
+        self._ui = UIState.from_dict(keyframe['ui'])
         self._last_events.clear()
+        self._last_event_mask = 0
+        self._last_action_result = None
+
+    def rng_digest(self) -> int:
+        """
+        RNG 完整状态的 64 位摘要，用于校验重放是否一致。
+        只取 Mersenne Twister 的位置下标不够：下标每 624 次抽取回绕，分歧的两次运行可能报告相同的位置
+        """
+        version, internal, gauss_next = self._engine.rng.getstate()
+        digest = hashlib.blake2b(array('I', internal).tobytes(), digest_size=8)
+        if gauss_next is not None:
+            digest.update(repr(gauss_next).encode())
+        return int.from_bytes(digest.digest(), 'little')
+
+    def get_events(self) -> List[str]:
+        """取出上一次 execute 的事件，返回的列表归调用方所有"""
+        events = self._last_events
+        self._last_events = []
         return events
 
+    def get_event_mask(self) -> int:
+        """上一次 execute 产生的引擎事件（EventFlag 位掩码）"""
+        return self._last_event_mask
+
+    def get_inventory_changes(self) -> List[ItemChange]:
+        """上一次 execute 引起的背包变动（按发生顺序），取出后清空"""
+        return self._inventory_module.drain_journal()
+
     def get_last_result(self) -> Optional[ActionResult]:
         return self._last_action_result
 
@@ -206,12 +245,17 @@ class GameEngine:
         self._tick = 0
         self._engine.reset()
         self._last_events.clear()
+        self._last_event_mask = 0
         self._last_action_result = None
 
     @property
     def rng(self):
         return self._engine.rng
 
+    @property
+    def registry(self):
+        return self._engine.registry
+
     def is_in_battle(self) -> bool:
         return self._world_module.in_battle
 
@@ -228,21 +272,19 @@ class GameEngine:
         return self._inventory_module.has_healing_item()
 
     def get_available_skills(self) -> List[str]:
-        return [
-            skill_id for skill_id in self._player_module.equipped_skills
-            if self._player_module.skill_cooldowns.get(skill_id, 0) == 0
-        ]
+        player = self._player_module
+        return [skill_id for skill_id in player.equipped_skills if player.is_skill_ready(skill_id)]
 
     def _update_ui_before_action(self, action: Action) -> None:
         self._ui.last_action_time = time.time()
 
     def _update_ui_after_action(self, action: Action, result: ActionResult) -> None:
-        world_state = self._world_module.get_state()
+        in_battle = self._world_module.in_battle
         new_scene = self._ui.current_scene
         
-        if world_state['in_battle'] and self._ui.current_scene != 'battle':
+        if in_battle and self._ui.current_scene != 'battle':
             new_scene = 'battle'
-        elif not world_state['in_battle'] and self._ui.current_scene == 'battle':
+        elif not in_battle and self._ui.current_scene == 'battle':
             new_scene = 'explore'
         
         if action.type == ActionType.FORGE:
@@ -254,27 +296,27 @@ class GameEngine:
             self._ui.current_scene = new_scene
             self._ui.scene_enter_time = time.time()
         
-        if 'player_death' in self._last_events:
+        if self._last_event_mask & PLAYER_DEATH:
             self._ui.current_scene = 'death'
             self._ui.active_dialog = 'death_screen'
         
         if result.data.get('level_up'):
-            self._ui.notifications.append({
+            self._ui.notifications = self._ui.notifications + [{
                 'type': 'level_up',
                 'level': self._player_module.level,
                 'time': time.time()
-            })
+            }]
 
     def _update_character_state(self, result: ActionResult) -> None:
         self._character.playtime_ms += 100
         
-        if 'battle_start' in self._last_events:
+        if self._last_event_mask & BATTLE_START:
             self._character.total_battles += 1
         
-        if 'monster_killed' in self._last_events:
+        if self._last_event_mask & MONSTER_KILLED:
             self._character.total_kills += 1
         
-        if 'player_death' in self._last_events:
+        if self._last_event_mask & PLAYER_DEATH:
             self._character.deaths += 1
         
         current_floor = self._world_module.floor
@@ -0,0 +1,51 @@
+"""
+事件位掩码
+由引擎事件名与 event_rules.json 中的规则 id 生成 IntFlag，每个事件占一位。一组事件用一个整数表示，
+成员判断、并集和“是否包含任一触发事件”都是一次整数运算；不在表中的事件名不占位
+"""
+
+import json
+from enum import IntFlag
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+
+# 模块在 ActionResult.events 中可能产生的事件名
+ENGINE_EVENTS = (
+    'explore', 'battle_start', 'battle_end', 'player_attack', 'monster_damage', 'monster_killed',
+    'monster_dodged', 'critical_hit', 'enemy_attack', 'defend', 'skill_use', 'level_up',
+    'player_death', 'floor_advance', 'item_obtain', 'item_use', 'forge_success',
+)
+
+DEFAULT_EVENT_RULES = Path(__file__).parent.parent.parent / 'config' / 'event_rules.json'
+
+
+def load_event_names(event_rules_path: str = None) -> List[str]:
+    """引擎事件名在前，随后是 event_rules.json 中按出现顺序的规则 id，去重"""
+    names = dict.fromkeys(ENGINE_EVENTS)
+    path = Path(event_rules_path) if event_rules_path else DEFAULT_EVENT_RULES
+    if path.exists():
+        data = json.loads(path.read_text(encoding='utf-8'))
+        for category, events in data.get('state_change_events', {}).items():
+            if category.startswith('_'):
+                continue
+            names.update(dict.fromkeys(event_id for event_id in events if not event_id.startswith('_')))
+    return list(names)
+
+
+EventFlag = IntFlag('EventFlag', {name: 1 << i for i, name in enumerate(load_event_names())})
+
+# 热路径上用普通 int 运算，避开 IntFlag 的枚举开销
+EVENT_BITS: Dict[str, int] = {flag.name: flag.value for flag in EventFlag}
+
+
+def event_mask(events: Iterable[str]) -> int:
+    bits = EVENT_BITS
+    mask = 0
+    for event in events:
+        mask |= bits.get(event, 0)
+    return mask
+
+
+def event_names(mask: int) -> List[str]:
+    return [name for name, bit in EVENT_BITS.items() if mask & bit]
@@ -3,15 +3,27 @@
 根据状态变化和配置规则推断游戏事件
 """
 
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Optional, Set, Tuple
 from dataclasses import dataclass, field
+from collections import Counter
 from pathlib import Path
 import logging
+import threading
+import time
 
 import orjson
 
-from state import GameState, StateDiff
-from expression import ExpressionEvaluator, EvaluationContext
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from state import GameState, StateDiff, LazyStateDiff, LAZY_DIFF_FIELDS, ItemChange, summarize_item_changes
+from expression import (
+    ExpressionEvaluator, ExpressionCompiler, EvaluationContext,
+    VectorizedCompiler, BatchContext,
+)
+from rule_graph import RuleGraph
 
 
 @dataclass
@@ -43,6 +55,7 @@ class EventRuleLoader:
             self.config_dir = Path(__file__).parent.parent.parent / "config"
         
         self._rules: Dict[str, List[EventRule]] = {}
+        self._sorted_rules: Optional[List[EventRule]] = None
         self._computed_value_defs: Dict[str, str] = {}
     
     def load(self, path: str = None) -> Dict[str, List[EventRule]]:
@@ -58,6 +71,7 @@ class EventRuleLoader:
         data = orjson.loads(config_path.read_bytes())
         
         self._rules = {}
+        self._sorted_rules = None
         state_events = data.get('state_change_events', {})
         
         for category, events in state_events.items():
@@ -94,30 +108,321 @@ class EventRuleLoader:
         return self._rules
     
     def get_all_rules(self) -> List[EventRule]:
-        rules = []
-        for category_rules in self.get_rules().values():
-            rules.extend(category_rules)
-        return sorted(rules, key=lambda r: r.priority)
+        if self._sorted_rules is None:
+            rules = []
+            for category_rules in self.get_rules().values():
+                rules.extend(category_rules)
+            self._sorted_rules = sorted(rules, key=lambda r: r.priority)
+        return list(self._sorted_rules)
     
     def get_computed_value_defs(self) -> Dict[str, str]:
         return self._computed_value_defs
 
 
+CompiledRule = Tuple[EventRule, Any, List[Tuple[str, Any]], Optional[frozenset]]
+
+
+@dataclass(frozen=True)
+class CompiledRuleSet:
+    """一份规则文件编译后的结果，构建后不再修改，可被所有推断引擎共享"""
+    path: Path
+    mtime_ns: Optional[int]
+    loader: EventRuleLoader
+    graph: RuleGraph
+    rules: Tuple[CompiledRule, ...]
+
+    @classmethod
+    def build(cls, path: Path, mtime_ns: Optional[int]) -> 'CompiledRuleSet':
+        loader = EventRuleLoader()
+        loader.load(str(path))
+        compiler = ExpressionCompiler()
+        graph = RuleGraph(loader.get_all_rules(), compiler)
+        rules = tuple(
+            (
+                node.rule,
+                compiler.compile(node.rule.condition),
+                [
+                    (field.split('.')[-1].replace('(', '').replace(')', ''), compiler.compile(field))
+                    for field in node.rule.data_extract
+                ],
+                node.inputs if node.skippable else None,
+            )
+            for node in graph.order
+        )
+        return cls(path, mtime_ns, loader, graph, rules)
+
+
+class RuleSetRegistry:
+    """
+    进程内按规则文件路径共享 CompiledRuleSet，fork 出的 worker 直接继承父进程已编译的规则。
+    距上次检查超过 check_interval 秒时比较文件 mtime，变化则重新编译并替换；
+    文件被删除或新文件解析失败时保留旧规则
+    """
+
+    def __init__(self, check_interval: float = 1.0):
+        self.check_interval = check_interval
+        self._sets: Dict[Path, CompiledRuleSet] = {}
+        self._checked: Dict[Path, float] = {}
+        self._missing: Set[Path] = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def resolve(rules_path: str = None) -> Path:
+        if rules_path:
+            return Path(rules_path).resolve()
+        return (EventRuleLoader().config_dir / "event_rules.json").resolve()
+
+    def get(self, path: Path) -> CompiledRuleSet:
+        rule_set = self._sets.get(path)
+        if rule_set is not None and time.monotonic() - self._checked[path] < self.check_interval:
+            return rule_set
+
+        with self._lock:
+            rule_set = self._sets.get(path)
+            mtime_ns = self._mtime(path)
+            if rule_set is not None and mtime_ns is None:
+                # 文件被删除或暂时不可读：继续用上次成功编译的规则，只在首次发现时告警
+                if path not in self._missing:
+                    self._missing.add(path)
+                    logging.warning(f"Event rules file missing: {path}, keeping previous rules")
+            elif rule_set is None or mtime_ns != rule_set.mtime_ns:
+                self._missing.discard(path)
+                try:
+                    rule_set = CompiledRuleSet.build(path, mtime_ns)
+                    if path in self._sets:
+                        logging.info(f"Event rules reloaded: {path}")
+                    self._sets[path] = rule_set
+                except Exception as e:
+                    if rule_set is None:
+                        raise
+                    logging.warning(f"Failed to reload event rules {path}, keeping previous rules: {e}")
+            self._checked[path] = time.monotonic()
+        return rule_set
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sets.clear()
+            self._checked.clear()
+            self._missing.clear()
+
+    @staticmethod
+    def _mtime(path: Path) -> Optional[int]:
+        try:
+            return path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+
+RULE_SETS = RuleSetRegistry()
+
+
+def diff_stats(diffs: int, touched: Counter) -> Dict[str, Any]:
+    """diffs 个 StateDiff 中各延迟字段被读取的次数，按次数降序"""
+    return {
+        'diffs': diffs,
+        'fields': len(LAZY_DIFF_FIELDS),
+        'fieldsTouched': len(touched),
+        'touches': dict(touched.most_common()),
+    }
+
+
+def _journal_inputs(computed: Dict[str, Any]) -> Tuple[str, ...]:
+    """物品增减来自背包日志时，同一 tick 先得后用的物品会让 inventory.items 前后相等，仍要算作已变化"""
+    return ('inventory.items',) if computed.get('item_obtained') or computed.get('item_used') else ()
+
+
+# 引擎模块自己发出的事件名 -> 规则事件 id；混合模式下这些规则以引擎事件为准，不再做状态比对
+ENGINE_EVENT_RULES: Dict[str, str] = {
+    'battle_start': 'battle_start',
+    'monster_killed': 'monster_killed',
+    'critical_hit': 'critical_hit_dealt',
+    'skill_use': 'skill_used',
+    'level_up': 'level_up',
+    'player_death': 'player_death',
+    'floor_advance': 'floor_advance',
+    'item_use': 'item_use',
+    'forge_success': 'forge_success',
+    'forge_fail': 'forge_fail',
+}
+TRUSTED_RULES = frozenset(ENGINE_EVENT_RULES.values())
+
+
+def engine_event_ids(events: List[str], result: Any = None) -> List[str]:
+    """把 GameEngine.get_events 的事件名换成规则事件 id；失败的锻造不产生引擎事件，这里补上 forge_fail"""
+    ids = list(dict.fromkeys(ENGINE_EVENT_RULES[e] for e in events if e in ENGINE_EVENT_RULES))
+    if result is not None and not result.success and getattr(result.action_type, 'value', None) == 'forge':
+        ids.append('forge_fail')
+    return ids
+
+
+def action_result_view(result: Any) -> Optional[Dict[str, Any]]:
+    """
+    ActionResult 转成规则里 action_result.* 能读到的字典：
+    保留 data 原有字段，另补 critical / enemy_critical / dodged（玩家闪避）/ damage_taken
+    """
+    if result is None:
+        return None
+    data = result.data or {}
+    enemy = data.get('enemy_attack') or {}
+    view = dict(data)
+    view.update(
+        success=result.success,
+        action_type=getattr(result.action_type, 'value', result.action_type),
+        critical=bool(data.get('is_critical')),
+        enemy_critical=bool(enemy.get('is_critical')),
+        dodged=bool(enemy.get('dodged')),
+        damage=data.get('damage', 0),
+        damage_taken=enemy.get('damage', 0),
+    )
+    return view
+
+
+@dataclass
+class RuleProfile:
+    event_id: str
+    category: str
+    condition: str
+    evaluations: int = 0
+    hits: int = 0
+    ns: int = 0
+    errors: int = 0
+    last_error: Optional[str] = None
+
+    def to_dict(self, ticks: int) -> Dict[str, Any]:
+        return {
+            'eventId': self.event_id,
+            'category': self.category,
+            'evaluations': self.evaluations,
+            'skipped': max(0, ticks - self.evaluations),
+            'hits': self.hits,
+            'hitRate': round(self.hits / self.evaluations, 4) if self.evaluations else 0.0,
+            'totalUs': round(self.ns / 1000, 1),
+            'avgNs': self.ns // self.evaluations if self.evaluations else 0,
+            'errors': self.errors,
+            'lastError': self.last_error,
+            'condition': self.condition,
+        }
+
+
+class RuleProfiler:
+    """
+    逐条规则的求值次数、命中率、累计耗时与被吞掉的异常。
+    挂到 EventInferenceEngine.profiler 上后，infer 改用计时包装过的条件闭包；多个引擎可以共用一个
+    """
+
+    SORT_KEYS = {
+        'cost': lambda row: -row['totalUs'],
+        'avg': lambda row: -row['avgNs'],
+        'hits': lambda row: -row['hits'],
+        'hit-rate': lambda row: row['hitRate'],
+        'errors': lambda row: -row['errors'],
+    }
+
+    def __init__(self):
+        self.profiles: Dict[str, RuleProfile] = {}
+        self.ticks = 0
+        self._wrapped: Tuple[Optional[CompiledRuleSet], Tuple[CompiledRule, ...]] = (None, ())
+
+    def wrap(self, rule_set: CompiledRuleSet) -> Tuple[CompiledRule, ...]:
+        """返回条件换成计时闭包的规则元组，按规则集缓存"""
+        if self._wrapped[0] is not rule_set:
+            self._wrapped = (rule_set, tuple(
+                (rule, self._timed(self.profile(rule), condition), extractors, inputs)
+                for rule, condition, extractors, inputs in rule_set.rules
+            ))
+        return self._wrapped[1]
+
+    def profile(self, rule: EventRule) -> RuleProfile:
+        profile = self.profiles.get(rule.event_id)
+        if profile is None:
+            profile = self.profiles[rule.event_id] = RuleProfile(rule.event_id, rule.category, rule.condition)
+        return profile
+
+    def record(self, rule: EventRule, evaluations: int, hits: int, ns: int, error: Exception = None) -> None:
+        profile = self.profile(rule)
+        profile.evaluations += evaluations
+        profile.hits += hits
+        profile.ns += ns
+        if error is not None:
+            profile.errors += 1
+            profile.last_error = repr(error)
+
+    @staticmethod
+    def _timed(profile: RuleProfile, condition: Any) -> Any:
+        clock = time.perf_counter_ns
+
+        def timed(context: EvaluationContext) -> Any:
+            start = clock()
+            try:
+                result = condition(context)
+            except Exception as e:
+                profile.errors += 1
+                profile.last_error = repr(e)
+                raise
+            finally:
+                profile.ns += clock() - start
+                profile.evaluations += 1
+            if result:
+                profile.hits += 1
+            return result
+
+        return timed
+
+    def report(self, sort: str = 'cost') -> List[Dict[str, Any]]:
+        rows = [profile.to_dict(self.ticks) for profile in self.profiles.values()]
+        rows.sort(key=self.SORT_KEYS[sort])
+        return rows
+
+    def summary(self) -> Dict[str, Any]:
+        total_ns = sum(profile.ns for profile in self.profiles.values())
+        return {
+            'ticks': self.ticks,
+            'rules': len(self.profiles),
+            'totalMs': round(total_ns / 1e6, 2),
+            'neverFired': sorted(p.event_id for p in self.profiles.values() if not p.hits),
+            'erroring': sorted(p.event_id for p in self.profiles.values() if p.errors),
+            'rows': self.report(),
+        }
+
+
 class EventInferenceEngine:
-    """事件推断引擎"""
+    """
+    事件推断引擎
+    规则按 RuleGraph 的拓扑序求值；short_circuit 为真时跳过输入未变化且必然不触发的规则。
+    编译好的规则来自进程共享的 RULE_SETS，规则文件修改后下一次 infer 自动换用新规则。
+    infer 传入 engine_events 时为混合模式：TRUSTED_RULES 里的规则直接取引擎事件，只对其余规则求值
+    """
     
-    def __init__(self, rules_path: str = None):
-        self.loader = EventRuleLoader()
-        if rules_path:
-            self.loader.load(rules_path)
-        else:
-            self.loader.load()
+    def __init__(self, rules_path: str = None, short_circuit: bool = True,
+                 registry: RuleSetRegistry = None):
+        self.registry = registry or RULE_SETS
+        self.rules_path = self.registry.resolve(rules_path)
+        self.rule_set = self.registry.get(self.rules_path)
         
         self.evaluator = ExpressionEvaluator()
+        self.compiler = ExpressionCompiler()
         self._computed_cache: Dict[str, Any] = {}
+        self.short_circuit = short_circuit
+        self.rule_stats = {'ticks': 0, 'evaluated': 0, 'skipped': 0, 'trusted': 0}
+        self.diffs_built = 0
+        self.diff_fields_touched: Counter = Counter()
+        self.profiler: Optional[RuleProfiler] = None
+        # 为真时 build_state_diff 每次返回同一个 LazyStateDiff，diff 只在下一次构建前有效
+        self.pool_diffs = False
+        self._pooled_diff: Optional[LazyStateDiff] = None
+    
+    @property
+    def loader(self) -> EventRuleLoader:
+        return self.rule_set.loader
+    
+    @property
+    def graph(self) -> RuleGraph:
+        return self.rule_set.graph
     
     def infer(self, prev: GameState, curr: GameState, 
-              action_result: Dict[str, Any] = None) -> Tuple[List[InferredEvent], Dict[str, Any]]:
+              action_result: Dict[str, Any] = None,
+              computed: Dict[str, Any] = None,
+              engine_events: List[str] = None) -> Tuple[List[InferredEvent], Dict[str, Any]]:
         """
         推断状态变化事件
         
@@ -125,11 +430,21 @@ class EventInferenceEngine:
             prev: 前一状态
             curr: 当前状态
             action_result: 动作执行结果
+            computed: 已算好的派生值，省略时在这里计算
+            engine_events: engine_event_ids 换算后的引擎事件，给出时启用混合模式
             
         Returns:
             (推断的事件列表, 提取的数据)
         """
-        computed = self._compute_values(prev, curr)
+        if computed is None:
+            computed = self._compute_values(prev, curr)
+        rule_set = self.rule_set = self.registry.get(self.rules_path)
+        profiler = self.profiler
+        if profiler is None:
+            rules = rule_set.rules
+        else:
+            rules = profiler.wrap(rule_set)
+            profiler.ticks += 1
         
         context = EvaluationContext(
             prev=prev,
@@ -141,12 +456,22 @@ class EventInferenceEngine:
         
         events = []
         extracted_data: Dict[str, Any] = {}
-        
-        rules = self.loader.get_all_rules()
-        
-        for rule in rules:
+        dirty = (
+            rule_set.graph.dirty_inputs(prev, curr, action_result, _journal_inputs(computed))
+            if self.short_circuit else None
+        )
+        trusted_rules = TRUSTED_RULES if engine_events is not None else ()
+        skipped = resolved = 0
+        
+        for rule, condition, extractors, inputs in rules:
+            trusted = rule.event_id in trusted_rules
+            if trusted:
+                resolved += 1
+            elif dirty is not None and inputs is not None and inputs.isdisjoint(dirty):
+                skipped += 1
+                continue
             try:
-                if self.evaluator.evaluate(rule.condition, context):
+                if rule.event_id in engine_events if trusted else condition(context):
                     event = InferredEvent(
                         event_id=rule.event_id,
                         description=rule.description,
@@ -154,8 +479,8 @@ class EventInferenceEngine:
                         priority=rule.priority,
                     )
                     
-                    if rule.data_extract:
-                        event.data = self._extract_data(rule.data_extract, context)
+                    if extractors:
+                        event.data = self._extract_data(extractors, context)
                         extracted_data[rule.event_id] = event.data
                     
                     events.append(event)
@@ -164,12 +489,19 @@ class EventInferenceEngine:
             except Exception as e:
                 logging.debug(f"Error evaluating rule {rule.event_id}: {e}")
         
+        stats = self.rule_stats
+        stats['ticks'] += 1
+        stats['skipped'] += skipped
+        stats['trusted'] += resolved
+        stats['evaluated'] += len(rules) - skipped - resolved
+        
         events.sort(key=lambda e: e.priority)
         
         return events, extracted_data
     
-    def _compute_values(self, prev: GameState, curr: GameState) -> Dict[str, Any]:
-        """计算派生值"""
+    def _compute_values(self, prev: GameState, curr: GameState,
+                        inventory_changes: List[ItemChange] = None) -> Dict[str, Any]:
+        """计算派生值；给出背包变动日志时物品增减直接由日志汇总，不再比对整个背包"""
         computed = {}
         
         computed['hp_delta'] = curr.player.hp - prev.player.hp
@@ -187,26 +519,31 @@ class EventInferenceEngine:
         else:
             computed['mp_ratio'] = 0
         
-        prev_items = {item['id']: item.get('count', 1) for item in prev.inventory.items}
-        curr_items = {item['id']: item.get('count', 1) for item in curr.inventory.items}
-        
         obtained = []
         used = []
-        for item_id, count in curr_items.items():
-            if item_id not in prev_items:
-                obtained.append(item_id)
-            elif count > prev_items.get(item_id, 0):
-                obtained.append(item_id)
-        
-        for item_id, count in prev_items.items():
-            if item_id not in curr_items:
-                used.append(item_id)
-            elif count > curr_items.get(item_id, 0):
-                used.append(item_id)
+        item_count_delta = 0
+        if inventory_changes is not None:
+            obtained, used, item_count_delta = summarize_item_changes(inventory_changes)
+        elif curr.inventory.items != prev.inventory.items:
+            prev_items = {item['id']: item.get('count', 1) for item in prev.inventory.items}
+            curr_items = {item['id']: item.get('count', 1) for item in curr.inventory.items}
+            
+            for item_id, count in curr_items.items():
+                if item_id not in prev_items:
+                    obtained.append(item_id)
+                elif count > prev_items.get(item_id, 0):
+                    obtained.append(item_id)
+            
+            for item_id, count in prev_items.items():
+                if item_id not in curr_items:
+                    used.append(item_id)
+                elif count > curr_items.get(item_id, 0):
+                    used.append(item_id)
+            item_count_delta = len(curr_items) - len(prev_items)
         
         computed['item_obtained'] = obtained
         computed['item_used'] = used
-        computed['item_count_delta'] = len(curr_items) - len(prev_items)
+        computed['item_count_delta'] = item_count_delta
         
         computed['floor_changed'] = curr.world.floor != prev.world.floor
         computed['battle_started'] = curr.world.in_battle and not prev.world.in_battle
@@ -231,26 +568,34 @@ class EventInferenceEngine:
             curr.ui.tutorial_step > prev.ui.tutorial_step
         )
         
-        new_achievements = [a for a in curr.character.achievements if a not in prev.character.achievements]
-        computed['achievement_unlocked'] = new_achievements
+        prev_character = prev.character
+        curr_character = curr.character
+        if curr_character.achievements == prev_character.achievements:
+            computed['achievement_unlocked'] = []
+        else:
+            computed['achievement_unlocked'] = [
+                a for a in curr_character.achievements if a not in prev_character.achievements
+            ]
         
-        new_features = [f for f in curr.character.unlocked_features if f not in prev.character.unlocked_features]
-        computed['feature_unlocked'] = new_features
+        if curr_character.unlocked_features == prev_character.unlocked_features:
+            computed['feature_unlocked'] = []
+        else:
+            computed['feature_unlocked'] = [
+                f for f in curr_character.unlocked_features if f not in prev_character.unlocked_features
+            ]
         
         computed['story_progress_updated'] = curr.character.story_progress != prev.character.story_progress
         computed['playtime_delta_ms'] = curr.character.playtime_ms - prev.character.playtime_ms
         
         return computed
     
-    def _extract_data(self, fields: List[str], context: EvaluationContext) -> Dict[str, Any]:
+    def _extract_data(self, extractors: List[Tuple[str, Any]], context: EvaluationContext) -> Dict[str, Any]:
         """提取事件相关数据"""
         data = {}
         
-        for field in fields:
+        for field_name, extract in extractors:
             try:
-                value = self.evaluator.evaluate(field, context)
-                field_name = field.split('.')[-1].replace('(', '').replace(')', '')
-                data[field_name] = value
+                data[field_name] = extract(context)
             except Exception:
                 pass
         
@@ -259,33 +604,145 @@ class EventInferenceEngine:
     def build_state_diff(self, prev: GameState, curr: GameState,
                          events: List[InferredEvent],
                          computed: Dict[str, Any]) -> StateDiff:
-        """构建 StateDiff 对象"""
-        event_ids = [e.event_id for e in events]
-        
-        return StateDiff(
+        """构建 StateDiff 对象，字段在首次访问时才从 computed 取出"""
+        self.diffs_built += 1
+        if self.pool_diffs:
+            diff = self._pooled_diff
+            if diff is None:
+                diff = self._pooled_diff = LazyStateDiff(0, 0, computed, [], self.diff_fields_touched)
+            return diff.reuse(prev.tick, curr.tick, computed, (e.event_id for e in events))
+        return LazyStateDiff(
             tick_from=prev.tick,
             tick_to=curr.tick,
             changes=computed,
-            events_inferred=event_ids,
-            hp_delta=computed.get('hp_delta', 0),
-            gold_delta=computed.get('gold_delta', 0),
-            exp_delta=computed.get('exp_delta', 0),
-            floor_changed=computed.get('floor_changed', False),
-            battle_started=computed.get('battle_started', False),
-            battle_ended=computed.get('battle_ended', False),
-            level_up=computed.get('level_up', False),
-            item_obtained=computed.get('item_obtained', []),
-            item_used=computed.get('item_used', []),
-            monster_killed=computed.get('monster_killed'),
-            player_died=computed.get('player_died', False),
-            scene_changed=computed.get('scene_changed', False),
-            scene_from=computed.get('scene_from'),
-            scene_to=computed.get('scene_to'),
-            dialog_opened=computed.get('dialog_opened', False),
-            dialog_closed=computed.get('dialog_closed', False),
-            tutorial_advanced=computed.get('tutorial_advanced', False),
-            achievement_unlocked=computed.get('achievement_unlocked', []),
-            feature_unlocked=computed.get('feature_unlocked', []),
-            story_progress_updated=computed.get('story_progress_updated', False),
-            playtime_delta_ms=computed.get('playtime_delta_ms', 0),
+            events_inferred=[e.event_id for e in events],
+            touched=self.diff_fields_touched,
         )
+    
+    def diff_stats(self) -> Dict[str, Any]:
+        """各 StateDiff 字段被读取的次数"""
+        return diff_stats(self.diffs_built, self.diff_fields_touched)
+
+
+class BatchInferenceEngine:
+    """
+    批量事件推断：对锁步推进的一批 Agent，每条规则用 VectorizedCompiler 在整批状态列上求值一次，
+    得到 Agent × 事件的布尔矩阵。向量求值抛异常的规则退回标量闭包逐个 Agent 求值；
+    short_circuit 为真时，整批 Agent 的输入都未变化的可跳过规则整列为假
+    """
+
+    def __init__(self, rules_path: str = None, short_circuit: bool = True,
+                 registry: RuleSetRegistry = None):
+        self.scalar = EventInferenceEngine(rules_path, short_circuit, registry)
+        self.compiler = VectorizedCompiler()
+        self.short_circuit = short_circuit
+        self.stats = {'batches': 0, 'agents': 0, 'vectorized': 0, 'skipped': 0, 'fallbacks': 0, 'trusted': 0}
+
+    def event_matrix(self, prevs: List[GameState], currs: List[GameState],
+                     computeds: List[Dict[str, Any]],
+                     action_results: List[Optional[Dict[str, Any]]] = None,
+                     engine_events: List[List[str]] = None) -> Tuple[Any, CompiledRuleSet]:
+        """
+        返回 (Agent × 规则 的布尔矩阵, 所用规则集)，列顺序为 rule_set.rules 的顺序。
+        给出 engine_events 时 TRUSTED_RULES 的列直接由引擎事件填充
+        """
+        engine = self.scalar
+        rule_set = engine.rule_set = engine.registry.get(engine.rules_path)
+        rules = rule_set.rules
+        matrix = np.zeros((len(currs), len(rules)), dtype=bool)
+        context = BatchContext(prevs, currs, computeds, action_results=action_results)
+        dirty = None
+        if self.short_circuit:
+            dirty = set()
+            for i, (prev, curr) in enumerate(zip(prevs, currs)):
+                dirty |= rule_set.graph.dirty_inputs(
+                    prev, curr, action_results[i] if action_results else None, _journal_inputs(computeds[i]),
+                )
+
+        stats = self.stats
+        profiler = engine.profiler
+        if profiler is not None:
+            profiler.ticks += len(currs)
+        trusted_rules = TRUSTED_RULES if engine_events is not None else ()
+        for j, (rule, condition, _, inputs) in enumerate(rules):
+            if rule.event_id in trusted_rules:
+                matrix[:, j] = [rule.event_id in ids for ids in engine_events]
+                stats['trusted'] += 1
+            elif dirty is not None and inputs is not None and inputs.isdisjoint(dirty):
+                stats['skipped'] += 1
+                continue
+            else:
+                start = time.perf_counter_ns()
+                error = None
+                try:
+                    matrix[:, j] = self.compiler.compile_condition(rule.condition)(context)
+                    stats['vectorized'] += 1
+                except Exception as e:
+                    logging.debug(f"Vectorized rule {rule.event_id} failed, evaluating per agent: {e}")
+                    matrix[:, j] = self._scalar_column(j, condition, rules, matrix, context)
+                    stats['fallbacks'] += 1
+                    error = e
+                if profiler is not None:
+                    profiler.record(rule, len(currs), int(matrix[:, j].sum()),
+                                    time.perf_counter_ns() - start, error)
+            context.events[rule.event_id] = matrix[:, j]
+
+        stats['batches'] += 1
+        stats['agents'] += len(currs)
+        return matrix, rule_set
+
+    def infer_batch(self, prevs: List[GameState], currs: List[GameState],
+                    action_results: List[Optional[Dict[str, Any]]] = None,
+                    computeds: List[Dict[str, Any]] = None,
+                    engine_events: List[List[str]] = None) -> List[Tuple[List[InferredEvent], Dict[str, Any]]]:
+        """逐个 Agent 返回与 EventInferenceEngine.infer 相同的 (事件列表, 提取的数据)"""
+        if computeds is None:
+            computeds = [self.scalar._compute_values(prev, curr) for prev, curr in zip(prevs, currs)]
+        matrix, rule_set = self.event_matrix(prevs, currs, computeds, action_results, engine_events)
+        rules = rule_set.rules
+
+        fired: Dict[int, List[int]] = {}
+        for i, j in zip(*matrix.nonzero()):
+            fired.setdefault(i, []).append(j)
+
+        results = []
+        for i in range(len(currs)):
+            events = []
+            extracted_data: Dict[str, Any] = {}
+            if i in fired:
+                context = EvaluationContext(
+                    prev=prevs[i], curr=currs[i], computed=computeds[i], events=[],
+                    action_result=action_results[i] if action_results else None,
+                )
+                for j in fired[i]:
+                    rule, _, extractors, _ = rules[j]
+                    event = InferredEvent(
+                        event_id=rule.event_id,
+                        description=rule.description,
+                        category=rule.category,
+                        priority=rule.priority,
+                    )
+                    if extractors:
+                        event.data = self.scalar._extract_data(extractors, context)
+                        extracted_data[rule.event_id] = event.data
+                    events.append(event)
+                    context.events.append(rule.event_id)
+                events.sort(key=lambda e: e.priority)
+            results.append((events, extracted_data))
+        return results
+
+    @staticmethod
+    def _scalar_column(j: int, condition: Any, rules: Tuple[CompiledRule, ...],
+                       matrix: Any, context: BatchContext) -> List[bool]:
+        column = []
+        for i in range(context.size):
+            scalar_context = EvaluationContext(
+                prev=context.prevs[i], curr=context.currs[i], computed=context.computed[i],
+                events=[rules[k][0].event_id for k in matrix[i, :j].nonzero()[0]],
+                action_result=context.action_results[i] if context.action_results else None,
+            )
+            try:
+                column.append(bool(condition(scalar_context)))
+            except Exception:
+                column.append(False)
+        return column
@@ -0,0 +1,62 @@
+"""
+Agent 事件日志
+内存中只保留最近 capacity 条（环形缓冲），追加为 O(1)、内存有上限；
+指定落盘文件后每条同时以 JSON Lines 追加写入，文件里是本次运行的完整历史
+"""
+
+from collections import deque
+from pathlib import Path
+from typing import Any, BinaryIO, Deque, Dict, Iterator, List, Optional
+
+import orjson
+
+
+class EventLog:
+    SPILL_FILE = 'events.jsonl'
+
+    def __init__(self, capacity: int = 100, spill_path: str = None):
+        self.entries: Deque[Dict[str, Any]] = deque(maxlen=capacity)
+        self.total = 0
+        self._spill: Optional[BinaryIO] = None
+        if spill_path:
+            self.spill_to(spill_path)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.entries)
+
+    @property
+    def capacity(self) -> int:
+        return self.entries.maxlen
+
+    def spill_to(self, path: str) -> None:
+        """之后追加的条目同时写入 path；path 中已有的内容（上一次运行的历史）被清空"""
+        self.close()
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._spill = open(path, 'wb')
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        self.entries.append(entry)
+        self.total += 1
+        if self._spill is not None:
+            self._spill.write(orjson.dumps(entry, option=orjson.OPT_APPEND_NEWLINE))
+
+    def recent(self, count: int) -> List[Dict[str, Any]]:
+        entries = self.entries
+        if count >= len(entries):
+            return list(entries)
+        return [entries[i] for i in range(len(entries) - count, len(entries))]
+
+    def close(self) -> None:
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+    @staticmethod
+    def load(path: str) -> List[Dict[str, Any]]:
+        """读回落盘的完整历史"""
+        with open(path, 'rb') as f:
+            return [orjson.loads(line) for line in f if line.strip()]
@@ -3,9 +3,16 @@
 用于解析和评估事件触发条件表达式
 """
 
-from typing import Any, Dict, Optional, List, Tuple
+from typing import Any, Callable, Dict, Optional, List, Tuple
+from operator import attrgetter
 import re
-from dataclasses import dataclass
+import threading
+from dataclasses import dataclass, field
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 @dataclass
@@ -17,6 +24,24 @@ class EvaluationContext:
     action_result: Optional[Dict[str, Any]] = None
 
 
+@dataclass
+class BatchContext:
+    """
+    一批 Agent 的求值上下文，第 i 个元素对应第 i 个 Agent
+    events 为已求值规则的触发列（事件 id -> 布尔数组），columns 缓存本批次取出的状态列
+    """
+    prevs: List[Any]
+    currs: List[Any]
+    computed: List[Dict[str, Any]]
+    events: Dict[str, Any] = field(default_factory=dict)
+    action_results: Optional[List[Optional[Dict[str, Any]]]] = None
+    columns: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def size(self) -> int:
+        return len(self.currs)
+
+
 class ExpressionEvaluator:
     """
     安全的表达式解析器，支持：
@@ -111,7 +136,8 @@ class ExpressionEvaluator:
         
         return self._get_attribute(expr, context)
     
-    def _split_logical(self, expr: str, op: str) -> List[str]:
+    @staticmethod
+    def _split_logical(expr: str, op: str) -> List[str]:
         parts = []
         depth = 0
         current = ""
@@ -210,6 +236,494 @@ class ExpressionEvaluator:
         return obj
 
 
+COMPARISON_OPS = ['!=', '==', '>=', '<=', '>', '<']
+ARITHMETIC_OPS = ['+', '-', '*', '/']
+
+CompiledExpression = Callable[[EvaluationContext], Any]
+
+
+class ExpressionCompiler:
+    """
+    把表达式一次性解析为 AST（嵌套元组），再编译为闭包
+    解析过程逐步对应 ExpressionEvaluator.evaluate 的字符串切分规则，两者结果一致；
+    唯一区别是 evaluate 遇到只在括号内出现 ||/&& 的表达式会无限递归，这里按普通表达式继续解析。
+
+    curr./prev. 开头的点路径直接走属性访问，不再查 computed 与已触发事件
+    （computed 名与事件 id 都不含 '.'）。
+    编译结果按表达式字符串缓存在类级别，所有实例共享。
+    """
+
+    _cache: Dict[str, CompiledExpression] = {}
+    _lock = threading.Lock()
+
+    def compile(self, expr: str) -> CompiledExpression:
+        compiled = self._cache.get(expr)
+        if compiled is None:
+            compiled = self._compile_node(self.parse(expr))
+            with self._lock:
+                compiled = self._cache.setdefault(expr, compiled)
+        return compiled
+
+    def evaluate(self, expr: str, context: EvaluationContext) -> Any:
+        return self.compile(expr)(context)
+
+    def parse(self, expr: str) -> tuple:
+        expr = expr.strip()
+        
+        if not expr:
+            return ('const', False)
+        
+        for op, kind in (('||', 'or'), ('&&', 'and')):
+            if op in expr:
+                parts = ExpressionEvaluator._split_logical(expr, op)
+                if len(parts) != 1 or parts[0] != expr:
+                    return (kind, [self.parse(p) for p in parts])
+        
+        if expr.startswith('!') and not expr.startswith('!='):
+            inner = expr[1:].strip()
+            if inner.startswith('(') and inner.endswith(')'):
+                inner = inner[1:-1]
+            return ('not', self.parse(inner))
+        
+        if expr.startswith('(') and expr.endswith(')'):
+            return self.parse(expr[1:-1])
+        
+        for op in COMPARISON_OPS:
+            if op in expr:
+                idx = expr.find(op)
+                return ('cmp', op, self.parse(expr[:idx]), self.parse(expr[idx + len(op):]))
+        
+        for op in ARITHMETIC_OPS:
+            if op in expr and not expr.startswith(op):
+                left, right = expr.split(op, 1)
+                return ('arith', op, self.parse(left), self.parse(right))
+        
+        if expr.isdigit() or (expr.startswith('-') and expr[1:].isdigit()):
+            return ('const', int(expr))
+        
+        if expr.replace('.', '', 1).isdigit():
+            return ('const', float(expr))
+        
+        if expr == 'null' or expr == 'None':
+            return ('const', None)
+        if expr == 'true' or expr == 'True':
+            return ('const', True)
+        if expr == 'false' or expr == 'False':
+            return ('const', False)
+        
+        if expr.startswith('len(') and expr.endswith(')'):
+            return ('len', self.parse(expr[4:-1]))
+        
+        if expr.startswith('count(') and expr.endswith(')'):
+            return ('len', self.parse(expr[6:-1]))
+        
+        if expr.startswith('"') and expr.endswith('"'):
+            return ('const', expr[1:-1])
+        if expr.startswith("'") and expr.endswith("'"):
+            return ('const', expr[1:-1])
+        
+        return ('name', expr)
+
+    def _compile_node(self, node: tuple) -> CompiledExpression:
+        kind = node[0]
+        
+        if kind == 'const':
+            value = node[1]
+            return lambda ctx: value
+        
+        if kind == 'or':
+            parts = [self._compile_node(n) for n in node[1]]
+            if len(parts) == 2:
+                a, b = parts
+                return lambda ctx: True if a(ctx) or b(ctx) else False
+            
+            def _or(ctx):
+                for part in parts:
+                    if part(ctx):
+                        return True
+                return False
+            return _or
+        
+        if kind == 'and':
+            parts = [self._compile_node(n) for n in node[1]]
+            if len(parts) == 2:
+                a, b = parts
+                return lambda ctx: True if a(ctx) and b(ctx) else False
+            
+            def _and(ctx):
+                for part in parts:
+                    if not part(ctx):
+                        return False
+                return True
+            return _and
+        
+        if kind == 'not':
+            inner = self._compile_node(node[1])
+            return lambda ctx: not inner(ctx)
+        
+        if kind == 'cmp':
+            return self._compile_comparison(node[1], self._compile_node(node[2]), self._compile_node(node[3]))
+        
+        if kind == 'arith':
+            return self._compile_arithmetic(node[1], self._compile_node(node[2]), self._compile_node(node[3]))
+        
+        if kind == 'len':
+            inner = self._compile_node(node[1])
+            
+            def _len(ctx):
+                value = inner(ctx)
+                if value is None:
+                    return 0
+                return len(value) if hasattr(value, '__len__') else 0
+            return _len
+        
+        return self._compile_name(node[1])
+
+    def _compile_comparison(self, op: str, left: CompiledExpression,
+                            right: CompiledExpression) -> CompiledExpression:
+        if op == '==':
+            return lambda ctx: left(ctx) == right(ctx)
+        if op == '!=':
+            return lambda ctx: left(ctx) != right(ctx)
+        
+        if op == '>':
+            def _cmp(ctx):
+                a = left(ctx)
+                b = right(ctx)
+                return a is not None and b is not None and a > b
+        elif op == '<':
+            def _cmp(ctx):
+                a = left(ctx)
+                b = right(ctx)
+                return a is not None and b is not None and a < b
+        elif op == '>=':
+            def _cmp(ctx):
+                a = left(ctx)
+                b = right(ctx)
+                return a is not None and b is not None and a >= b
+        else:
+            def _cmp(ctx):
+                a = left(ctx)
+                b = right(ctx)
+                return a is not None and b is not None and a <= b
+        return _cmp
+
+    def _compile_arithmetic(self, op: str, left: CompiledExpression,
+                            right: CompiledExpression) -> CompiledExpression:
+        def operands(ctx):
+            a = left(ctx)
+            b = right(ctx)
+            return (0 if a is None else a), (0 if b is None else b)
+        
+        if op == '+':
+            def _arith(ctx):
+                a, b = operands(ctx)
+                return a + b
+        elif op == '-':
+            def _arith(ctx):
+                a, b = operands(ctx)
+                return a - b
+        elif op == '*':
+            def _arith(ctx):
+                a, b = operands(ctx)
+                return a * b
+        else:
+            def _arith(ctx):
+                a, b = operands(ctx)
+                return 0 if b == 0 else a / b
+        return _arith
+
+    def _compile_name(self, name: str) -> CompiledExpression:
+        parts = name.split('.')
+        root = parts[0]
+        
+        if root == 'computed':
+            key = '.'.join(parts[1:])
+            return self._with_lookups(name, lambda ctx: ctx.computed.get(key))
+        
+        if root not in ('curr', 'prev', 'action_result'):
+            return self._with_lookups(name, lambda ctx: None)
+        
+        path = parts[1:]
+        if root == 'action_result':
+            walk = self._walker(path)
+            return self._with_lookups(name, lambda ctx: walk(ctx.action_result or {}))
+        
+        if not path:
+            if root == 'curr':
+                return self._with_lookups(name, lambda ctx: ctx.curr)
+            return self._with_lookups(name, lambda ctx: ctx.prev)
+        
+        getter = attrgetter('.'.join(path))
+        walk = self._walker(path)
+        
+        if root == 'curr':
+            def _curr(ctx):
+                try:
+                    return getter(ctx.curr)
+                except AttributeError:
+                    return walk(ctx.curr)
+            return _curr
+        
+        def _prev(ctx):
+            try:
+                return getter(ctx.prev)
+            except AttributeError:
+                return walk(ctx.prev)
+        return _prev
+
+    @staticmethod
+    def _with_lookups(name: str, resolve: CompiledExpression) -> CompiledExpression:
+        """未带 curr./prev. 前缀的名字依次查 computed、已触发事件，最后才走路径解析"""
+        def _name(ctx):
+            computed = ctx.computed
+            if name in computed:
+                return computed[name]
+            if name in ctx.events:
+                return True
+            return resolve(ctx)
+        return _name
+
+    @staticmethod
+    def _walker(path: List[str]) -> Callable[[Any], Any]:
+        def walk(obj):
+            for part in path:
+                if obj is None:
+                    return None
+                try:
+                    obj = getattr(obj, part)
+                except AttributeError:
+                    if isinstance(obj, dict):
+                        obj = obj.get(part)
+                    else:
+                        return None
+            return obj
+        return walk
+
+
+VectorExpression = Callable[[BatchContext], Any]
+
+
+class VectorizedCompiler:
+    """
+    ExpressionCompiler 的 NumPy 后端：同一个 AST 编译为对整批 Agent 的列运算，
+    返回长度为批大小的数组，语义与标量闭包一致（空值参与大小比较为假、算术中空值按 0、除以 0 得 0）。
+    纯数值列直接走 NumPy 运算；含 None、字符串或对象的列用 object 数组逐元素比较，
+    元素间比较抛出的异常原样抛出，由调用方退回标量求值
+    """
+
+    _cache: Dict[str, VectorExpression] = {}
+    _conditions: Dict[str, VectorExpression] = {}
+    _lock = threading.Lock()
+
+    def __init__(self):
+        if np is None:
+            raise ImportError("VectorizedCompiler requires numpy")
+        self._parser = ExpressionCompiler()
+
+    def compile(self, expr: str) -> VectorExpression:
+        compiled = self._cache.get(expr)
+        if compiled is None:
+            compiled = self._compile_node(self._parser.parse(expr))
+            with self._lock:
+                compiled = self._cache.setdefault(expr, compiled)
+        return compiled
+
+    def compile_condition(self, expr: str) -> VectorExpression:
+        """条件表达式：结果按真值转换为布尔数组"""
+        condition = self._conditions.get(expr)
+        if condition is None:
+            compiled = self.compile(expr)
+            condition = self._conditions.setdefault(expr, lambda ctx: _truth(compiled(ctx)))
+        return condition
+
+    def _compile_node(self, node: tuple) -> VectorExpression:
+        kind = node[0]
+
+        if kind == 'const':
+            value = node[1]
+            return lambda ctx: _full(value, ctx.size)
+
+        if kind in ('or', 'and'):
+            parts = [self._compile_node(n) for n in node[1]]
+            combine = np.logical_or if kind == 'or' else np.logical_and
+
+            def _logical(ctx):
+                result = _truth(parts[0](ctx))
+                for part in parts[1:]:
+                    result = combine(result, _truth(part(ctx)))
+                return result
+            return _logical
+
+        if kind == 'not':
+            inner = self._compile_node(node[1])
+            return lambda ctx: ~_truth(inner(ctx))
+
+        if kind == 'cmp':
+            op = node[1]
+            left = self._compile_node(node[2])
+            right = self._compile_node(node[3])
+            return lambda ctx: _vcompare(op, left(ctx), right(ctx))
+
+        if kind == 'arith':
+            op = node[1]
+            left = self._compile_node(node[2])
+            right = self._compile_node(node[3])
+            return lambda ctx: _varith(op, left(ctx), right(ctx))
+
+        if kind == 'len':
+            inner = self._compile_node(node[1])
+
+            def _len(ctx):
+                return np.fromiter(
+                    (0 if v is None else (len(v) if hasattr(v, '__len__') else 0) for v in inner(ctx)),
+                    dtype=np.int64, count=ctx.size,
+                )
+            return _len
+
+        return self._compile_name(node[1])
+
+    def _compile_name(self, name: str) -> VectorExpression:
+        parts = name.split('.')
+        root = parts[0]
+
+        if root in ('curr', 'prev') and len(parts) > 1:
+            getter = attrgetter('.'.join(parts[1:]))
+            walk = ExpressionCompiler._walker(parts[1:])
+
+            def get(state):
+                try:
+                    return getter(state)
+                except AttributeError:
+                    return walk(state)
+
+            def _state(ctx):
+                column = ctx.columns.get(name)
+                if column is None:
+                    states = ctx.currs if root == 'curr' else ctx.prevs
+                    try:
+                        values = list(map(getter, states))
+                    except AttributeError:
+                        values = [get(s) for s in states]
+                    column = ctx.columns[name] = _column(values)
+                return column
+            return _state
+
+        if root == 'computed':
+            key = '.'.join(parts[1:])
+            resolve = lambda ctx, i: ctx.computed[i].get(key)
+        elif root == 'action_result':
+            walk = ExpressionCompiler._walker(parts[1:])
+            resolve = lambda ctx, i: walk((ctx.action_results[i] if ctx.action_results else None) or {})
+        elif root in ('curr', 'prev'):
+            resolve = lambda ctx, i: (ctx.currs if root == 'curr' else ctx.prevs)[i]
+        else:
+            resolve = lambda ctx, i: None
+
+        def _name(ctx):
+            column = ctx.columns.get(name)
+            if column is not None:
+                return column
+            computed = ctx.computed
+            if computed and all(name in c for c in computed):
+                column = ctx.columns[name] = _column([c[name] for c in computed])
+                return column
+            fired = ctx.events.get(name)
+            values = []
+            for i in range(ctx.size):
+                if name in computed[i]:
+                    values.append(computed[i][name])
+                elif fired is not None and fired[i]:
+                    values.append(True)
+                else:
+                    values.append(resolve(ctx, i))
+            return _column(values)
+        return _name
+
+
+_NUMERIC_TYPES = (int, float, bool)
+
+
+def _column(values: List[Any]):
+    """全为数值（含 bool）时建数值数组，否则建 object 数组"""
+    if all(type(v) in _NUMERIC_TYPES for v in values):
+        return np.array(values)
+    column = np.empty(len(values), dtype=object)
+    for i, v in enumerate(values):
+        column[i] = v
+    return column
+
+
+def _full(value: Any, size: int):
+    if type(value) in _NUMERIC_TYPES:
+        return np.full(size, value)
+    column = np.empty(size, dtype=object)
+    column.fill(value)
+    return column
+
+
+def _not_none(column):
+    if column.dtype != object:
+        return np.ones(len(column), dtype=bool)
+    return np.fromiter((v is not None for v in column), dtype=bool, count=len(column))
+
+
+def _truth(column):
+    if column.dtype == bool:
+        return column
+    if column.dtype != object:
+        return column != 0
+    return np.fromiter((bool(v) for v in column), dtype=bool, count=len(column))
+
+
+_ORDERED = {'>': np.greater, '<': np.less, '>=': np.greater_equal, '<=': np.less_equal} if np else {}
+
+
+def _vcompare(op: str, a, b):
+    if op in ('==', '!='):
+        if a.dtype == object or b.dtype == object:
+            equal = np.fromiter((x == y for x, y in zip(a, b)), dtype=bool, count=len(a))
+        else:
+            equal = a == b
+        return equal if op == '==' else ~equal
+
+    compare = _ORDERED[op]
+    if a.dtype != object and b.dtype != object:
+        return compare(a, b)
+    mask = _not_none(a) & _not_none(b)
+    result = np.zeros(len(a), dtype=bool)
+    if mask.any():
+        result[mask] = compare(a[mask], b[mask]).astype(bool)
+    return result
+
+
+def _varith(op: str, a, b):
+    a = _zero_none(a)
+    b = _zero_none(b)
+    if op == '+':
+        return a + b
+    if op == '-':
+        return a - b
+    if op == '*':
+        return a * b
+    zero = b == 0
+    if not zero.any():
+        return a / b
+    safe = np.where(zero, 1, b)
+    return np.where(zero, 0, a / safe)
+
+
+def _zero_none(column):
+    if column.dtype == bool:
+        return column.astype(np.int64)
+    if column.dtype != object:
+        return column
+    column = np.where(_not_none(column), column, 0)
+    if all(type(v) in _NUMERIC_TYPES for v in column):
+        return np.array(column.tolist())
+    return column
+
+
 class EventConditionParser:
     """
     事件条件解析器
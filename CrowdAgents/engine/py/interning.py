@@ -0,0 +1,87 @@
+"""
+实体 ID 驻留
+把物品、技能名映射为从 0 开始的连续整数：背包按物品 ID 作计数下标，技能冷却以技能 ID 作定时器键。
+配置中的实体在加载时驻留一次；GameState、快照、Agent 和报告仍使用字符串，只在模块边界处互相转换
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class Namespace:
+    """一类实体的名字 <-> 整数 ID；配置里没有的名字在第一次出现时追加"""
+
+    __slots__ = ('kind', 'ids', 'names', '_lock')
+
+    def __init__(self, kind: str, names: Iterable[str] = ()):
+        self.kind = kind
+        self.ids: Dict[str, int] = {}
+        self.names: List[str] = []
+        self._lock = threading.Lock()
+        for name in names:
+            self.intern(name)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.ids
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
+
+    def intern(self, name: str) -> int:
+        index = self.ids.get(name)
+        if index is None:
+            with self._lock:
+                index = self.ids.get(name)
+                if index is None:
+                    index = len(self.names)
+                    self.names.append(name)
+                    self.ids[name] = index
+        return index
+
+    def get(self, name: str, default: Optional[int] = None) -> Optional[int]:
+        return self.ids.get(name, default)
+
+    def name(self, index: int) -> str:
+        return self.names[index]
+
+
+class EntityRegistry:
+    """
+    物品与技能的驻留表。from_config 按 GameConfig 预先分配 ID，
+    配置里的实体 ID 连续且顺序固定；同一份 GameConfig 在进程内只建一次，
+    最近使用的 CACHE_SIZE 份保留在缓存中
+    """
+
+    CACHE_SIZE = 8
+    _cache: 'OrderedDict[int, Tuple[Any, EntityRegistry]]' = OrderedDict()
+    _lock = threading.Lock()
+
+    def __init__(self, items: Iterable[str] = (), skills: Iterable[str] = ()):
+        self.items = Namespace('items', items)
+        self.skills = Namespace('skills', skills)
+
+    @classmethod
+    def from_config(cls, game_config: Any) -> 'EntityRegistry':
+        items = [item['id'] for group in game_config.items.values() for item in group]
+        items += [item['id'] for group in game_config.equipment.values() for item in group]
+        return cls(items=items, skills=[skill['id'] for skill in game_config.skills])
+
+    @classmethod
+    def for_config(cls, game_config: Any) -> 'EntityRegistry':
+        key = id(game_config)
+        with cls._lock:
+            entry = cls._cache.get(key)
+            if entry is not None and entry[0] is game_config:
+                cls._cache.move_to_end(key)
+                return entry[1]
+        registry = cls.from_config(game_config)
+        with cls._lock:
+            cls._cache[key] = (game_config, registry)
+            cls._cache.move_to_end(key)
+            while len(cls._cache) > cls.CACHE_SIZE:
+                cls._cache.popitem(last=False)
+        return registry
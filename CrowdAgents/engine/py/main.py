@@ -92,6 +92,30 @@ def main():
     parser.add_argument('--output', '-o', default='../output/report.json', help='输出文件路径')
     parser.add_argument('--log-level', '-l', default='INFO', help='日志级别')
     parser.add_argument('--dashboard', action='store_true', help='模拟完成后打开仪表盘')
+    parser.add_argument('--snapshot-dir', default=None, help='快照落盘目录（每个 Agent 一个子目录）')
+    parser.add_argument('--snapshot-codec', default=None,
+                        help='快照压缩编解码器: auto/zstd/zlib/lzma/none，不指定则按单文件 JSON 存储')
+    parser.add_argument('--snapshot-db', default=None,
+                        help='快照写入 SQLite 数据库，可用 snapshot_query.py 查询')
+    parser.add_argument('--snapshot-writers', type=int, default=0,
+                        help='后台快照写入线程数，0 表示在 tick 循环内同步写入')
+    parser.add_argument('--snapshot-retention', action='store_true',
+                        help='启用快照保留策略（关注事件附近密集保留，平淡期抽稀，旧历史降采样）')
+    parser.add_argument('--action-log', default=None,
+                        help='行动日志目录，记录行动与关键帧（可用 TimeTravel 还原任意 tick）及 Agent 的完整事件历史')
+    parser.add_argument('--keyframe-interval', type=int, default=500, help='行动日志关键帧间隔(tick)')
+    parser.add_argument('--batch-inference', action='store_true',
+                        help='每个 tick 对所有 Agent 批量推断事件（NumPy 向量化，Agent 数量多时更快）')
+    parser.add_argument('--hybrid-events', action='store_true',
+                        help='引擎模块发出的事件与 ActionResult 直接进入 diff，只推断引擎观察不到的事件')
+    parser.add_argument('--profile-rules', action='store_true',
+                        help='统计每条事件规则的耗时与命中率，写入报告 meta.ruleProfile（可用 rules_profile.py 查看）')
+    parser.add_argument('--steady-state', action='store_true',
+                        help='稳态模式：复用行动结果与 StateDiff 对象，减少每个 tick 的内存分配')
+    parser.add_argument('--retire-converged', action='store_true',
+                        help='评分因子全部饱和、分数不会再变的 Agent 提前退役，退役 tick 写入报告 meta.retiredAt 与 agents[].retiredAtTick')
+    parser.add_argument('--convergence-window', type=int, default=0,
+                        help='配合 --retire-converged：分数在该窗口(tick)内几乎不变也视为收敛（近似），0 表示只按饱和判断')
     
     args = parser.parse_args()
     
@@ -106,6 +130,19 @@ def main():
         duration_ms=args.duration,
         seed=args.seed,
         log_level=args.log_level,
+        snapshot_dir=args.snapshot_dir,
+        snapshot_codec=args.snapshot_codec,
+        snapshot_db=args.snapshot_db,
+        snapshot_writer_threads=args.snapshot_writers,
+        snapshot_retention=args.snapshot_retention,
+        action_log_dir=args.action_log,
+        keyframe_interval=args.keyframe_interval,
+        batch_inference=args.batch_inference,
+        hybrid_events=args.hybrid_events,
+        profile_rules=args.profile_rules,
+        steady_state=args.steady_state,
+        retire_converged=args.retire_converged,
+        convergence_window=args.convergence_window,
     )
     
     save_report(report, args.output)
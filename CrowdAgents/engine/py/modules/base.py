@@ -5,9 +5,12 @@
 
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from enum import Enum
 
+from timer_wheel import TimerWheel
+from event_flags import event_mask
+
 
 class ActionType(Enum):
     ATTACK = "attack"
@@ -27,6 +30,21 @@ class Action:
     def __init__(self, action_type: ActionType, params: Dict[str, Any] = None):
         self.type = action_type
         self.params = params or {}
+    
+    @classmethod
+    def of(cls, action_type: ActionType, **params: Any) -> 'Action':
+        """
+        驻留的行动：同一类型与参数总是返回同一个对象，Agent 每次决策不必新建 Action。
+        驻留的行动被所有 Agent 共享，不要修改它的 params
+        """
+        key = (action_type, *params.items()) if params else action_type
+        action = _INTERNED_ACTIONS.get(key)
+        if action is None:
+            action = _INTERNED_ACTIONS.setdefault(key, cls(action_type, params))
+        return action
+
+
+_INTERNED_ACTIONS: Dict[Any, Action] = {}
 
 
 @dataclass
@@ -36,12 +54,36 @@ class ActionResult:
     data: Dict[str, Any] = field(default_factory=dict)
     events: List[str] = field(default_factory=list)
     message: str = ""
+    # events 的 EventFlag 位掩码，模块返回结果后由引擎算一次
+    event_mask: int = 0
+    
+    def reset(self, success: bool = True, message: str = "") -> 'ActionResult':
+        """清空 data 与 events 以便复用"""
+        self.success = success
+        self.message = message
+        self.data.clear()
+        self.events.clear()
+        self.event_mask = 0
+        return self
 
 
 class GameContext:
     def __init__(self, engine: 'ModularGameEngine' = None):
         self.engine = engine
         self._shared_data: Dict[str, Any] = {}
+        self._results: Dict[ActionType, ActionResult] = {}
+    
+    def result(self, action_type: ActionType, success: bool = True, message: str = "") -> ActionResult:
+        """
+        模块返回的行动结果。引擎开启 recycle_results 时复用按行动类型预分配的对象，
+        结果只在同类行动下一次执行前有效；否则每次新建
+        """
+        if self.engine is None or not self.engine.recycle_results:
+            return ActionResult(success=success, action_type=action_type, message=message)
+        result = self._results.get(action_type)
+        if result is None:
+            result = self._results[action_type] = ActionResult(success=success, action_type=action_type)
+        return result.reset(success, message)
     
     def get_module(self, module_id: str) -> Optional['GameModule']:
         if self.engine:
@@ -59,6 +101,9 @@ class GameContext:
 
 
 class GameModule(ABC):
+    # 本模块处理的行动类型，注册时登记到引擎的分发表
+    actions: Tuple[ActionType, ...] = ()
+
     @property
     @abstractmethod
     def module_id(self) -> str:
@@ -82,6 +127,15 @@ class GameModule(ABC):
         pass
     
     def on_tick(self, tick: int, context: GameContext) -> None:
+        """只有覆写了 on_tick 的模块才会在 tick 时被调用"""
+        pass
+    
+    def bind(self, dependencies: Dict[str, 'GameModule']) -> None:
+        """注册时传入 dependencies 中已注册的模块，模块可保存引用，免得每次按名字查找"""
+        pass
+    
+    def on_timer(self, kind: str, key: Any) -> None:
+        """本模块登记的 (module_id, kind, key) 定时器到期"""
         pass
     
     def reset(self) -> None:
@@ -91,61 +145,95 @@ class GameModule(ABC):
 class ModularGameEngine:
     def __init__(self, config: Any = None, seed: int = None):
         import random
+        from interning import EntityRegistry
         self.config = config
         self.rng = random.Random(seed)
         self._modules: Dict[str, GameModule] = {}
+        self._order: List[GameModule] = []
+        self._tick_modules: List[GameModule] = []
+        self._action_table: Dict[ActionType, GameModule] = {}
         self._context = GameContext(self)
         self._tick = 0
+        # 冷却、增益/减益等效果的到期时间，时钟为 GameEngine.execute 的次数
+        self.timers = TimerWheel()
+        self.registry = EntityRegistry.for_config(config) if config is not None else EntityRegistry()
+        # 稳态模式：模块经 GameContext.result 复用行动结果对象
+        self.recycle_results = False
     
     def register_module(self, module: GameModule) -> None:
         self._modules[module.module_id] = module
+        if hasattr(module, 'timers'):
+            module.timers = self.timers
+        if hasattr(module, 'registry'):
+            module.registry = self.registry
+        self._build_dispatch()
+    
+    def _build_dispatch(self) -> None:
+        """按 dependencies 拓扑排序，重建分发表并把依赖模块交给各模块；尚未注册的依赖跳过"""
+        order: List[GameModule] = []
+        state: Dict[str, bool] = {}
+        
+        def visit(module_id: str, path: Tuple[str, ...]) -> None:
+            if state.get(module_id):
+                return
+            if module_id in path:
+                raise ValueError(f"Circular module dependency: {' -> '.join(path + (module_id,))}")
+            module = self._modules[module_id]
+            for dep in module.dependencies:
+                if dep in self._modules:
+                    visit(dep, path + (module_id,))
+            state[module_id] = True
+            order.append(module)
+        
+        for module_id in self._modules:
+            visit(module_id, ())
+        
+        self._order = order
+        self._tick_modules = [m for m in order if type(m).on_tick is not GameModule.on_tick]
+        self._action_table = {}
+        for module in order:
+            module.bind({dep: self._modules[dep] for dep in module.dependencies if dep in self._modules})
+            for action_type in module.actions:
+                self._action_table.setdefault(action_type, module)
+    
+    def advance_timers(self, now: int) -> None:
+        for module_id, kind, key in self.timers.advance(now):
+            module = self._modules.get(module_id)
+            if module:
+                module.on_timer(kind, key)
     
     def get_module(self, module_id: str) -> Optional[GameModule]:
         return self._modules.get(module_id)
     
     def process_action(self, action: Action) -> ActionResult:
-        module_id = self._get_module_for_action(action.type)
-        module = self._modules.get(module_id)
+        module = self._action_table.get(action.type)
         
         if module:
-            return module.process_action(action, self._context)
+            result = module.process_action(action, self._context)
+            result.event_mask = event_mask(result.events)
+            return result
         
-        return ActionResult(
-            success=False,
-            action_type=action.type,
-            message=f"No module found for action type: {action.type}"
-        )
+        return self._context.result(action.type, False, f"No module found for action type: {action.type}")
     
     def tick(self) -> None:
         self._tick += 1
-        for module in self._modules.values():
+        for module in self._tick_modules:
             module.on_tick(self._tick, self._context)
     
     def get_state(self) -> Dict[str, Any]:
         return {
-            module_id: module.get_state()
-            for module_id, module in self._modules.items()
+            module.module_id: module.get_state()
+            for module in self._order
         }
     
     def set_state(self, state: Dict[str, Any]) -> None:
-        for module_id, module_state in state.items():
-            if module_id in self._modules:
-                self._modules[module_id].set_state(module_state)
+        for module in self._order:
+            if module.module_id in state:
+                module.set_state(state[module.module_id])
     
     def reset(self) -> None:
         self._tick = 0
-        for module in self._modules.values():
+        self.timers.clear(0)
+        for module in self._order:
             module.reset()
         self._context.clear_shared()
-    
-    def _get_module_for_action(self, action_type: ActionType) -> str:
-        mapping = {
-            ActionType.ATTACK: 'combat',
-            ActionType.DEFEND: 'combat',
-            ActionType.USE_SKILL: 'combat',
-            ActionType.USE_ITEM: 'inventory',
-            ActionType.EXPLORE: 'world',
-            ActionType.NEXT_FLOOR: 'world',
-            ActionType.FORGE: 'inventory',
-        }
-        return mapping.get(action_type, '')
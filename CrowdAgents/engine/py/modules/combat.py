@@ -8,6 +8,10 @@ from dataclasses import dataclass
 from modules.base import GameModule, Action, ActionResult, ActionType, GameContext
 
 
+# 减速每承受一次敌方攻击衰减的比例
+SLOW_DECAY = 0.1
+
+
 @dataclass
 class Monster:
     id: str
@@ -24,17 +28,21 @@ class Monster:
 
 
 class CombatModule(GameModule):
+    actions = (ActionType.ATTACK, ActionType.DEFEND, ActionType.USE_SKILL)
+
     def __init__(self, config: Dict[str, Any], monsters: List[Dict[str, Any]], 
                  skills: List[Dict[str, Any]], battle_config: Dict[str, Any]):
         self._config = config
         self._monsters = monsters
         self._skills = {s['id']: s for s in skills}
         self._battle_config = battle_config
+        self._player = None
         
         self.current_monster: Optional[Monster] = None
         self.slow_effect: float = 0
         self.battle_turns: int = 0
         self._events: List[str] = []
+        self._enemy_result: Dict[str, Any] = {}
 
     @property
     def module_id(self) -> str:
@@ -42,7 +50,10 @@ class CombatModule(GameModule):
 
     @property
     def dependencies(self) -> List[str]:
-        return ['player', 'world']
+        return ['player']
+
+    def bind(self, dependencies: Dict[str, GameModule]) -> None:
+        self._player = dependencies.get('player')
 
     def get_state(self) -> Dict[str, Any]:
         return {
@@ -95,54 +106,56 @@ class CombatModule(GameModule):
         elif action.type == ActionType.USE_SKILL:
             return self._process_skill(action.params.get('skill_id'), context)
         
-        return ActionResult(success=False, action_type=action.type, message="Unknown action")
+        return context.result(action.type, False, "Unknown action")
 
     def _process_attack(self, context: GameContext) -> ActionResult:
-        player_module = context.get_module('player')
+        player_module = self._player
         if not player_module or not self.current_monster:
-            return ActionResult(success=False, action_type=ActionType.ATTACK, message="No monster")
+            return context.result(ActionType.ATTACK, False, "No monster")
         
         self.battle_turns += 1
         rng = context.engine.rng if context.engine else None
         
         damage = self._calc_damage(
-            player_module.get_total_atk(context.engine.config.equipment if context.engine else None),
+            player_module.stats.atk,
             self.current_monster.defense,
             self._battle_config.get('normalAttackRand', 5),
             rng
         )
         
+        result = context.result(ActionType.ATTACK)
+        result_data, events = result.data, result.events
+        
         if rng and rng.random() < self.current_monster.dodge_rate:
-            return ActionResult(
-                success=True,
-                action_type=ActionType.ATTACK,
-                data={'dodged': True, 'damage': 0},
-                events=['monster_dodged']
-            )
+            result_data['dodged'] = True
+            result_data['damage'] = 0
+            events.append('monster_dodged')
+            return result
         
-        is_critical = rng.random() < player_module.crit_rate if rng else False
+        is_critical = rng.random() < player_module.stats.crit_rate if rng else False
         if is_critical:
             damage = int(damage * 1.5)
         
         self.current_monster.hp -= damage
         
-        events = ['player_attack', 'monster_damage']
+        events.append('player_attack')
+        events.append('monster_damage')
         if is_critical:
             events.append('critical_hit')
         
-        result_data = {
-            'damage': damage,
-            'is_critical': is_critical,
-            'monster_hp': max(0, self.current_monster.hp),
-            'monster_max_hp': self.current_monster.max_hp,
-        }
+        result_data['damage'] = damage
+        result_data['is_critical'] = is_critical
+        result_data['monster_hp'] = max(0, self.current_monster.hp)
+        result_data['monster_max_hp'] = self.current_monster.max_hp
         
         if self.current_monster.hp <= 0:
             events.append('monster_killed')
             events.append('battle_end')
             result_data['victory'] = True
             result_data['rewards'] = self._get_rewards(context)
-            self._apply_rewards(result_data['rewards'], context)
+            if self._apply_rewards(result_data['rewards'], context):
+                events.append('level_up')
+                result_data['level_up'] = True
             self.current_monster = None
         else:
             enemy_result = self._enemy_attack(context)
@@ -150,50 +163,50 @@ class CombatModule(GameModule):
             if enemy_result.get('player_died'):
                 events.append('player_death')
         
-        return ActionResult(success=True, action_type=ActionType.ATTACK, data=result_data, events=events)
+        return result
 
     def _process_defend(self, context: GameContext) -> ActionResult:
         if not self.current_monster:
-            return ActionResult(success=False, action_type=ActionType.DEFEND, message="No monster")
+            return context.result(ActionType.DEFEND, False, "No monster")
         
         self.battle_turns += 1
-        enemy_result = self._enemy_attack(context)
-        
-        return ActionResult(
-            success=True,
-            action_type=ActionType.DEFEND,
-            data={'enemy_attack': enemy_result},
-            events=['defend', 'enemy_attack']
-        )
+        result = context.result(ActionType.DEFEND)
+        result.data['enemy_attack'] = self._enemy_attack(context)
+        result.events.append('defend')
+        result.events.append('enemy_attack')
+        return result
 
     def _process_skill(self, skill_id: str, context: GameContext) -> ActionResult:
-        player_module = context.get_module('player')
+        player_module = self._player
         if not player_module or not self.current_monster:
-            return ActionResult(success=False, action_type=ActionType.USE_SKILL, message="No monster")
+            return context.result(ActionType.USE_SKILL, False, "No monster")
         
         skill = self._skills.get(skill_id)
         if not skill:
-            return ActionResult(success=False, action_type=ActionType.USE_SKILL, message="Unknown skill")
+            return context.result(ActionType.USE_SKILL, False, "Unknown skill")
         
-        if player_module.skill_cooldowns.get(skill_id, 0) > 0:
-            return ActionResult(success=False, action_type=ActionType.USE_SKILL, message="Skill on cooldown")
+        if not player_module.is_skill_ready(skill_id):
+            return context.result(ActionType.USE_SKILL, False, "Skill on cooldown")
         
-        player_module.skill_cooldowns[skill_id] = skill.get('cd', 0)
+        player_module.start_cooldown(skill_id, skill.get('cd', 0))
         self.battle_turns += 1
         rng = context.engine.rng if context.engine else None
         
-        events = ['skill_use']
-        result_data = {'skill_id': skill_id, 'skill_name': skill.get('name', skill_id)}
+        result = context.result(ActionType.USE_SKILL)
+        result_data, events = result.data, result.events
+        events.append('skill_use')
+        result_data['skill_id'] = skill_id
+        result_data['skill_name'] = skill.get('name', skill_id)
         
         if skill.get('type') == 'attack':
             damage = self._calc_damage(
-                player_module.get_total_atk(context.engine.config.equipment if context.engine else None) * skill.get('damageMultiplier', 1.0),
+                player_module.stats.atk * skill.get('damageMultiplier', 1.0),
                 self.current_monster.defense,
                 skill.get('damageRand', 5),
                 rng
             )
             
-            is_critical = rng.random() < player_module.crit_rate if rng else False
+            is_critical = rng.random() < player_module.stats.crit_rate if rng else False
             if is_critical:
                 damage = int(damage * 1.5)
             
@@ -214,42 +227,52 @@ class CombatModule(GameModule):
                 events.append('battle_end')
                 result_data['victory'] = True
                 result_data['rewards'] = self._get_rewards(context)
-                self._apply_rewards(result_data['rewards'], context)
+                if self._apply_rewards(result_data['rewards'], context):
+                    events.append('level_up')
+                    result_data['level_up'] = True
                 self.current_monster = None
             else:
                 enemy_result = self._enemy_attack(context)
                 result_data['enemy_attack'] = enemy_result
         
         elif skill.get('type') == 'heal':
-            heal_amount = int(player_module.max_hp * skill.get('healPercent', 0.2))
+            heal_amount = int(player_module.stats.max_hp * skill.get('healPercent', 0.2))
             player_module.heal(heal_amount)
             result_data['heal'] = heal_amount
             enemy_result = self._enemy_attack(context)
             result_data['enemy_attack'] = enemy_result
         
-        return ActionResult(success=True, action_type=ActionType.USE_SKILL, data=result_data, events=events)
+        return result
 
     def _enemy_attack(self, context: GameContext) -> Dict[str, Any]:
-        player_module = context.get_module('player')
+        player_module = self._player
+        # 复用行动结果时敌方攻击结果也复用同一个字典，与所在的 ActionResult 同时失效
+        recycle = context.engine is not None and context.engine.recycle_results
+        result = self._enemy_result if recycle else {}
+        result.clear()
+        
         if not self.current_monster or not player_module:
-            return {'damage': 0}
+            result['damage'] = 0
+            return result
         
         rng = context.engine.rng if context.engine else None
         
         atk = self.current_monster.atk
         if self.slow_effect > 0:
             atk = int(atk * (1 - self.slow_effect))
-            self.slow_effect = max(0, self.slow_effect - 0.1)
+            self.slow_effect = max(0, self.slow_effect - SLOW_DECAY)
         
-        player_dodge_rate = player_module.dodge_rate
+        player_dodge_rate = player_module.stats.dodge_rate
         if rng and rng.random() < player_dodge_rate:
-            return {'damage': 0, 'dodged': True}
+            result['damage'] = 0
+            result['dodged'] = True
+            return result
         
         is_critical = rng.random() < self.current_monster.crit_rate if rng else False
         
         damage = self._calc_damage(
             atk,
-            player_module.get_total_def(context.engine.config.equipment if context.engine else None),
+            player_module.stats.defense,
             self._battle_config.get('enemyAttackRand', 3),
             rng
         )
@@ -259,12 +282,10 @@ class CombatModule(GameModule):
         
         player_module.take_damage(damage)
         
-        result = {
-            'damage': damage,
-            'is_critical': is_critical,
-            'player_hp': player_module.hp,
-            'player_max_hp': player_module.max_hp,
-        }
+        result['damage'] = damage
+        result['is_critical'] = is_critical
+        result['player_hp'] = player_module.hp
+        result['player_max_hp'] = player_module.stats.max_hp
         
         if player_module.hp <= 0:
             result['player_died'] = True
@@ -286,18 +307,17 @@ class CombatModule(GameModule):
             'monster_id': self.current_monster.id,
         }
 
-    def _apply_rewards(self, rewards: Dict[str, Any], context: GameContext) -> None:
-        player_module = context.get_module('player')
+    def _apply_rewards(self, rewards: Dict[str, Any], context: GameContext) -> bool:
+        player_module = self._player
         if not player_module:
-            return
+            return False
         
+        leveled_up = False
         if rewards.get('exp'):
-            player_module.add_exp(rewards['exp'])
+            leveled_up = player_module.add_exp(rewards['exp'])
         if rewards.get('gold'):
             player_module.add_gold(rewards['gold'])
-
-    def on_tick(self, tick: int, context: GameContext) -> None:
-        pass
+        return leveled_up
 
     def reset(self) -> None:
         self.current_monster = None
@@ -3,20 +3,48 @@
 管理物品、锻造、消耗品使用
 """
 
-from typing import Dict, List, Optional, Any
+from array import array
+from typing import Dict, List, Optional, Any, Tuple
 from modules.base import GameModule, Action, ActionResult, ActionType, GameContext
+from state import ItemChange
+from interning import EntityRegistry
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+ITEM_GROUPS = ('consumables', 'materials', 'scrolls')
 
 
 class InventoryModule(GameModule):
+    """
+    背包以物品的驻留 ID 为下标：_counts 为各物品数量，_order 为占用格子的物品 ID（按入包顺序），
+    增删与计数都是 O(1)。items 是由二者生成的只读视图，背包未变动时重复取用同一个列表
+    """
+
+    actions = (ActionType.USE_ITEM, ActionType.FORGE)
+
     def __init__(self, config: Dict[str, Any], items_config: Dict[str, Any], 
                  equipment_config: Dict[str, Any], loot_table: Dict[str, List[Dict[str, Any]]]):
         self._config = config
         self._items_config = items_config
         self._equipment_config = equipment_config
         self._loot_table = loot_table
+        self._item_defs = {item['id']: item for group in ITEM_GROUPS for item in items_config.get(group, [])}
+        self._consumables = {item['id']: item for item in items_config.get('consumables', [])}
+        self._healing = {item_id for item_id, item in self._consumables.items() if item.get('heal')}
         
         self.slots: int = config.get('initialSlots', 20)
-        self.items: List[Dict[str, Any]] = []
+        self.journal: List[ItemChange] = []
+        self._player = None
+        self._registry = EntityRegistry()
+        self._counts = array('q')
+        self._order: Dict[int, None] = {}
+        self._view: Optional[List[Dict[str, Any]]] = None
+        # 装备 ID -> (材料 ID, 所需数量)
+        self._recipes: Dict[str, Tuple[Any, Any]] = {}
 
     @property
     def module_id(self) -> str:
@@ -26,15 +54,55 @@ class InventoryModule(GameModule):
     def dependencies(self) -> List[str]:
         return ['player']
 
+    @property
+    def registry(self) -> EntityRegistry:
+        return self._registry
+
+    @registry.setter
+    def registry(self, registry: EntityRegistry) -> None:
+        """注册到引擎时换成引擎共用的驻留表，已有物品按名字重新编号"""
+        items = self.items
+        self._registry = registry
+        self._recipes.clear()
+        self._load(items)
+
+    @property
+    def items(self) -> List[Dict[str, Any]]:
+        """[{'id', 'count'}, ...]，按入包顺序；调用方只读"""
+        view = self._view
+        if view is None:
+            names, counts = self._registry.items.names, self._counts
+            view = self._view = [{'id': names[index], 'count': counts[index]} for index in self._order]
+        return view
+
+    def bind(self, dependencies: Dict[str, GameModule]) -> None:
+        self._player = dependencies.get('player')
+
     def get_state(self) -> Dict[str, Any]:
         return {
             'slots': self.slots,
-            'items': list(self.items),
+            'items': self.items,
         }
 
     def set_state(self, state: Dict[str, Any]) -> None:
         self.slots = state.get('slots', self.slots)
-        self.items = state.get('items', [])
+        self._load(state.get('items', []))
+        self.journal.clear()
+
+    def _load(self, items: List[Dict[str, Any]]) -> None:
+        self._counts = array('q', bytes(8 * len(self._registry.items)))
+        self._order = {}
+        for item in items:
+            index = self._registry.items.intern(item['id'])
+            self._reserve(index)[index] = item.get('count', 1)
+            self._order[index] = None
+        self._view = None
+
+    def _reserve(self, index: int) -> array:
+        counts = self._counts
+        if index >= len(counts):
+            counts.extend(array('q', bytes(8 * (index + 1 - len(counts)))))
+        return counts
 
     def process_action(self, action: Action, context: GameContext) -> ActionResult:
         if action.type == ActionType.USE_ITEM:
@@ -46,123 +114,141 @@ class InventoryModule(GameModule):
                 context
             )
         
-        return ActionResult(success=False, action_type=action.type, message="Unknown action")
+        return context.result(action.type, False, "Unknown action")
 
     def _process_use_item(self, item_id: str, context: GameContext) -> ActionResult:
-        player_module = context.get_module('player')
+        player_module = self._player
         if not player_module:
-            return ActionResult(success=False, action_type=ActionType.USE_ITEM, message="No player module")
+            return context.result(ActionType.USE_ITEM, False, "No player module")
         
-        item = self._find_item(item_id)
-        if not item:
-            return ActionResult(success=False, action_type=ActionType.USE_ITEM, message="Item not found")
+        if not self.get_item_count(item_id):
+            return context.result(ActionType.USE_ITEM, False, "Item not found")
         
-        consumables = self._items_config.get('consumables', [])
-        item_def = next((c for c in consumables if c['id'] == item_id), None)
+        item_def = self._consumables.get(item_id)
         
         if not item_def or not item_def.get('heal'):
-            return ActionResult(success=False, action_type=ActionType.USE_ITEM, message="Item not consumable")
+            return context.result(ActionType.USE_ITEM, False, "Item not consumable")
         
-        heal_amount = min(item_def['heal'], player_module.max_hp - player_module.hp)
+        heal_amount = min(item_def['heal'], player_module.stats.max_hp - player_module.hp)
         player_module.heal(heal_amount)
         
-        self._remove_item(item_id, 1)
+        self._remove_item(item_id, 1, 'use')
         
-        return ActionResult(
-            success=True,
-            action_type=ActionType.USE_ITEM,
-            data={
-                'item_id': item_id,
-                'item_name': item_def.get('name', item_id),
-                'heal': heal_amount,
-            },
-            events=['item_use']
-        )
+        result = context.result(ActionType.USE_ITEM)
+        result.data['item_id'] = item_id
+        result.data['item_name'] = item_def.get('name', item_id)
+        result.data['heal'] = heal_amount
+        result.events.append('item_use')
+        return result
 
     def _process_forge(self, category: str, item_id: str, context: GameContext) -> ActionResult:
-        player_module = context.get_module('player')
+        player_module = self._player
         if not player_module:
-            return ActionResult(success=False, action_type=ActionType.FORGE, message="No player module")
+            return context.result(ActionType.FORGE, False, "No player module")
         
         equipment_list = self._equipment_config.get(category, [])
         item_def = next((e for e in equipment_list if e['id'] == item_id), None)
         
         if not item_def:
-            return ActionResult(success=False, action_type=ActionType.FORGE, message="Equipment not found")
+            return context.result(ActionType.FORGE, False, "Equipment not found")
         
         if not self._can_forge(item_def):
-            return ActionResult(success=False, action_type=ActionType.FORGE, message="Not enough materials")
+            return context.result(ActionType.FORGE, False, "Not enough materials")
         
         for mat_id, count in item_def.get('materials', {}).items():
-            self._remove_item(mat_id, count)
+            self._remove_item(mat_id, count, 'forge')
         
         if category == 'weapons':
             player_module.weapon = item_id
         else:
             player_module.armor = item_id
         
-        return ActionResult(
-            success=True,
-            action_type=ActionType.FORGE,
-            data={
-                'item_id': item_id,
-                'item_name': item_def.get('name', item_id),
-                'category': category,
-            },
-            events=['forge_success']
-        )
-
-    def add_item(self, item_id: str, count: int = 1) -> bool:
-        all_items = (
-            self._items_config.get('consumables', []) +
-            self._items_config.get('materials', []) +
-            self._items_config.get('scrolls', [])
-        )
-        item_def = next((i for i in all_items if i['id'] == item_id), None)
-        
+        result = context.result(ActionType.FORGE)
+        result.data['item_id'] = item_id
+        result.data['item_name'] = item_def.get('name', item_id)
+        result.data['category'] = category
+        result.events.append('forge_success')
+        return result
+
+    def add_item(self, item_id: str, count: int = 1, source: str = 'add') -> bool:
+        item_def = self._item_defs.get(item_id)
         if not item_def:
             return False
         
         stack_max = item_def.get('stackMax', 99)
+        index = self._registry.items.intern(item_id)
+        counts = self._reserve(index)
         
-        existing = next((i for i in self.items if i['id'] == item_id), None)
-        if existing:
-            existing['count'] = min(existing['count'] + count, stack_max)
+        if index in self._order:
+            old_count = counts[index]
+            counts[index] = min(old_count + count, stack_max)
+            self.journal.append(ItemChange(item_id, counts[index] - old_count, 0, source))
+        elif len(self._order) < self.slots:
+            counts[index] = min(count, stack_max)
+            self._order[index] = None
+            self.journal.append(ItemChange(item_id, counts[index], 1, source))
         else:
-            if len(self.items) < self.slots:
-                self.items.append({'id': item_id, 'count': min(count, stack_max)})
-            else:
-                return False
+            return False
         
+        self._view = None
         return True
 
     def remove_item(self, item_id: str, count: int = 1) -> bool:
-        return self._remove_item(item_id, count)
+        return self._remove_item(item_id, count, 'remove')
 
-    def _remove_item(self, item_id: str, count: int = 1) -> bool:
-        item = self._find_item(item_id)
-        if not item:
+    def _remove_item(self, item_id: str, count: int = 1, source: str = 'remove') -> bool:
+        index = self._registry.items.get(item_id)
+        if index not in self._order:
             return False
         
-        item['count'] -= count
-        if item['count'] <= 0:
-            self.items.remove(item)
+        counts = self._counts
+        old_count = counts[index]
+        if old_count <= count:
+            counts[index] = 0
+            del self._order[index]
+            self.journal.append(ItemChange(item_id, -old_count, -1, source))
+        else:
+            counts[index] = old_count - count
+            self.journal.append(ItemChange(item_id, -count, 0, source))
         
+        self._view = None
         return True
 
+    def drain_journal(self) -> List[ItemChange]:
+        """取出并清空自上次取出以来的背包变动"""
+        journal = self.journal
+        self.journal = []
+        return journal
+
     def get_item_count(self, item_id: str) -> int:
-        item = self._find_item(item_id)
-        return item['count'] if item else 0
+        index = self._registry.items.get(item_id)
+        if index is None or index >= len(self._counts):
+            return 0
+        return self._counts[index]
 
-    def _find_item(self, item_id: str) -> Optional[Dict[str, Any]]:
-        return next((i for i in self.items if i['id'] == item_id), None)
+    def _recipe(self, item_def: Dict[str, Any]) -> Tuple[Any, Any]:
+        recipe = self._recipes.get(item_def['id'])
+        if recipe is None:
+            materials = item_def.get('materials', {})
+            ids = [self._registry.items.intern(mat_id) for mat_id in materials]
+            need = list(materials.values())
+            if np is not None:
+                ids, need = np.array(ids, dtype=np.intp), np.array(need, dtype=np.int64)
+            recipe = self._recipes[item_def['id']] = (ids, need)
+        return recipe
 
     def _can_forge(self, item_def: Dict[str, Any]) -> bool:
-        materials = item_def.get('materials', {})
-        for mat_id, count in materials.items():
-            if self.get_item_count(mat_id) < count:
-                return False
-        return True
+        ids, need = self._recipe(item_def)
+        if not len(ids):
+            return True
+        counts = self._reserve(int(max(ids)))
+        if np is not None:
+            return bool((np.frombuffer(counts, dtype=np.int64)[ids] >= need).all())
+        return all(counts[index] >= count for index, count in zip(ids, need))
+
+    def forgeable(self, category: str) -> List[str]:
+        """category 下当前材料足够锻造的装备 ID"""
+        return [item_def['id'] for item_def in self._equipment_config.get(category, []) if self._can_forge(item_def)]
 
     def grant_loot(self, monster_id: str, rng=None) -> List[Dict[str, Any]]:
         import random
@@ -178,13 +264,8 @@ class InventoryModule(GameModule):
                     loot.get('maxCount', 1)
                 ) if not rng else rng.randint(loot.get('minCount', 1), loot.get('maxCount', 1))
                 
-                if self.add_item(loot['itemId'], count):
-                    all_items = (
-                        self._items_config.get('consumables', []) +
-                        self._items_config.get('materials', []) +
-                        self._items_config.get('scrolls', [])
-                    )
-                    item_def = next((i for i in all_items if i['id'] == loot['itemId']), None)
+                if self.add_item(loot['itemId'], count, 'loot'):
+                    item_def = self._item_defs.get(loot['itemId'])
                     
                     rarity = 'common'
                     if loot.get('rate', 1) < 0.1:
@@ -202,22 +283,16 @@ class InventoryModule(GameModule):
         return obtained
 
     def has_healing_item(self) -> bool:
-        consumables = self._items_config.get('consumables', [])
-        healing_items = {c['id'] for c in consumables if c.get('heal')}
-        return any(item['id'] in healing_items for item in self.items)
+        return self.get_healing_item() is not None
 
     def get_healing_item(self) -> Optional[str]:
-        consumables = self._items_config.get('consumables', [])
-        healing_items = {c['id'] for c in consumables if c.get('heal')}
-        
-        for item in self.items:
-            if item['id'] in healing_items:
-                return item['id']
+        names = self._registry.items.names
+        for index in self._order:
+            if names[index] in self._healing:
+                return names[index]
         return None
 
-    def on_tick(self, tick: int, context: GameContext) -> None:
-        pass
-
     def reset(self) -> None:
         self.slots = self._config.get('initialSlots', 20)
-        self.items.clear()
+        self._load([])
+        self.journal.clear()
@@ -3,13 +3,36 @@
 管理玩家属性、技能、装备
 """
 
-from typing import Dict, List, Optional, Any
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Any, Tuple
 from modules.base import GameModule, Action, ActionResult, ActionType, GameContext
+from timer_wheel import TimerWheel
+from interning import EntityRegistry
+
+
+EFFECT_KINDS = ('buffs', 'debuffs')
+
+
+@dataclass(frozen=True)
+class DerivedStats:
+    atk: int
+    defense: int
+    crit_rate: float
+    dodge_rate: float
+    max_hp: int
 
 
 class PlayerModule(GameModule):
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], equipment_config: Dict[str, Any] = None):
         self._config = config
+        self._equipment_config = equipment_config
+        self._stats: Optional[DerivedStats] = None
+        # 注册到引擎后换成引擎共用的定时轮
+        self.timers = TimerWheel()
+        # 冷却中的技能，键为技能的驻留 ID
+        self._cooling: Dict[int, None] = {}
+        self.registry = EntityRegistry()
+        self._effects: Dict[str, Dict[str, Dict[str, Any]]] = {kind: {} for kind in EFFECT_KINDS}
         self._init_state()
 
     @property
@@ -39,7 +62,83 @@ class PlayerModule(GameModule):
         self.armor: Optional[str] = None
         self.learned_skills: List[str] = ['powerStrike']
         self.equipped_skills: List[str] = ['powerStrike']
-        self.skill_cooldowns: Dict[str, int] = {}
+        self._clear_timers()
+        self.invalidate_stats()
+
+    @property
+    def registry(self) -> EntityRegistry:
+        return self._registry
+
+    @registry.setter
+    def registry(self, registry: EntityRegistry) -> None:
+        """注册到引擎时换成引擎共用的驻留表；配置中技能的冷却定时器键在此一次建好"""
+        self._registry = registry
+        self._cooldown_keys: Dict[str, Tuple[str, str, int]] = {
+            name: ('player', 'cooldown', index) for index, name in enumerate(registry.skills.names)
+        }
+
+    def _cooldown_key(self, skill_id: str) -> Tuple[str, str, int]:
+        key = self._cooldown_keys.get(skill_id)
+        if key is None:
+            key = self._cooldown_keys[skill_id] = ('player', 'cooldown', self._registry.skills.intern(skill_id))
+        return key
+
+    @property
+    def weapon(self) -> Optional[str]:
+        return self._weapon
+
+    @weapon.setter
+    def weapon(self, item_id: Optional[str]) -> None:
+        self._weapon = item_id
+        self._stats = None
+
+    @property
+    def armor(self) -> Optional[str]:
+        return self._armor
+
+    @armor.setter
+    def armor(self, item_id: Optional[str]) -> None:
+        self._armor = item_id
+        self._stats = None
+
+    @property
+    def stats(self) -> DerivedStats:
+        """
+        计入装备与效果后的属性。装备、升级、效果增减时失效，其余时候直接返回缓存；
+        直接改写 atk/defense 等基础属性后需调用 invalidate_stats
+        """
+        if self._stats is None:
+            self._stats = self._compute_stats(self._equipment_config)
+        return self._stats
+
+    def invalidate_stats(self) -> None:
+        self._stats = None
+
+    def _compute_stats(self, equipment_config: Optional[Dict[str, Any]]) -> DerivedStats:
+        atk, defense = self.atk, self.defense
+        if equipment_config:
+            if self.weapon:
+                weapon = next((w for w in equipment_config.get('weapons', []) if w['id'] == self.weapon), None)
+                atk += weapon.get('atk', 0) if weapon else 0
+            if self.armor:
+                armor = next((a for a in equipment_config.get('armors', []) if a['id'] == self.armor), None)
+                defense += armor.get('def', 0) if armor else 0
+        return DerivedStats(
+            atk=atk + self._effect_bonus('atk'),
+            defense=defense + self._effect_bonus('def'),
+            crit_rate=self.crit_rate + self._effect_bonus('crit_rate'),
+            dodge_rate=self.dodge_rate + self._effect_bonus('dodge_rate'),
+            max_hp=self.max_hp + self._effect_bonus('max_hp'),
+        )
+
+    def _clear_timers(self) -> None:
+        for skill in self._cooling:
+            self.timers.cancel(('player', 'cooldown', skill))
+        for kind, effects in self._effects.items():
+            for effect_id in effects:
+                self.timers.cancel(('player', kind, effect_id))
+            effects.clear()
+        self._cooling.clear()
 
     def get_state(self) -> Dict[str, Any]:
         return {
@@ -57,9 +156,16 @@ class PlayerModule(GameModule):
             'dodge_rate': self.dodge_rate,
             'weapon': self.weapon,
             'armor': self.armor,
-            'learned_skills': self.learned_skills,
-            'equipped_skills': self.equipped_skills,
-            'skill_cooldowns': dict(self.skill_cooldowns),
+            'learned_skills': list(self.learned_skills),
+            'equipped_skills': list(self.equipped_skills),
+            'skill_cooldowns': self.skill_cooldowns,
+            'buffs': self._effect_list('buffs'),
+            'debuffs': self._effect_list('debuffs'),
+            'total_atk': self.stats.atk,
+            'total_def': self.stats.defense,
+            'total_crit_rate': self.stats.crit_rate,
+            'total_dodge_rate': self.stats.dodge_rate,
+            'total_max_hp': self.stats.max_hp,
         }
 
     def set_state(self, state: Dict[str, Any]) -> None:
@@ -79,7 +185,14 @@ class PlayerModule(GameModule):
         self.armor = state.get('armor')
         self.learned_skills = state.get('learned_skills', self.learned_skills)
         self.equipped_skills = state.get('equipped_skills', self.equipped_skills)
-        self.skill_cooldowns = state.get('skill_cooldowns', {})
+        self._clear_timers()
+        for skill_id, turns in state.get('skill_cooldowns', {}).items():
+            self.start_cooldown(skill_id, turns)
+        for kind in EFFECT_KINDS:
+            for effect in state.get(kind, []):
+                effect = dict(effect)
+                self.apply_effect(kind, effect.pop('id'), effect.pop('remaining', 0), **effect)
+        self.invalidate_stats()
 
     def process_action(self, action: Action, context: GameContext) -> ActionResult:
         return ActionResult(
@@ -88,8 +201,12 @@ class PlayerModule(GameModule):
             message="PlayerModule does not process actions directly"
         )
 
-    def on_tick(self, tick: int, context: GameContext) -> None:
-        pass
+    def on_timer(self, kind: str, key: Any) -> None:
+        if kind == 'cooldown':
+            self._cooling.pop(key, None)
+        elif kind in self._effects:
+            self._effects[kind].pop(key, None)
+            self._stats = None
 
     def reset(self) -> None:
         self._init_state()
@@ -118,6 +235,7 @@ class PlayerModule(GameModule):
         self.atk += atk_gain
         self.defense += def_gain
         self.max_exp = int(self.max_exp * exp_multiplier)
+        self.invalidate_stats()
         
         return {
             'hp': hp_gain,
@@ -130,34 +248,70 @@ class PlayerModule(GameModule):
         return self.hp
 
     def heal(self, amount: int) -> int:
-        self.hp = min(self.max_hp, self.hp + amount)
+        self.hp = min(self.stats.max_hp, self.hp + amount)
         return self.hp
 
     def add_gold(self, amount: int) -> int:
         self.gold += amount
         return self.gold
 
-    def reduce_cooldowns(self) -> None:
-        for skill_id in list(self.skill_cooldowns.keys()):
-            if self.skill_cooldowns[skill_id] > 0:
-                self.skill_cooldowns[skill_id] -= 1
+    @property
+    def skill_cooldowns(self) -> Dict[str, int]:
+        """冷却中的技能及剩余行动数，冷却结束的技能不在其中"""
+        names = self.registry.skills.names
+        return {names[skill]: self.timers.remaining(('player', 'cooldown', skill)) for skill in self._cooling}
+
+    def start_cooldown(self, skill_id: str, turns: int) -> None:
+        key = self._cooldown_key(skill_id)
+        if self.timers.schedule(key, turns) > self.timers.now:
+            self._cooling[key[2]] = None
+        else:
+            self._cooling.pop(key[2], None)
+
+    def cooldown_remaining(self, skill_id: str) -> int:
+        key = self._cooldown_keys.get(skill_id)
+        return self.timers.remaining(key) if key is not None else 0
+
+    def is_skill_ready(self, skill_id: str) -> bool:
+        key = self._cooldown_keys.get(skill_id)
+        return key is None or key not in self.timers
+
+    def apply_effect(self, kind: str, effect_id: str, turns: int, **modifiers: Any) -> None:
+        """
+        kind 为 buffs 或 debuffs；同 id 的效果重复施加时刷新持续时间与数值。
+        modifiers 中的 atk/def 计入 get_total_atk/get_total_def
+        """
+        effects = self._effects[kind]
+        if self.timers.schedule(('player', kind, effect_id), turns) > self.timers.now:
+            effects[effect_id] = modifiers
+        else:
+            effects.pop(effect_id, None)
+        self._stats = None
+
+    def remove_effect(self, kind: str, effect_id: str) -> bool:
+        self.timers.cancel(('player', kind, effect_id))
+        self._stats = None
+        return self._effects[kind].pop(effect_id, None) is not None
+
+    def _effect_list(self, kind: str) -> List[Dict[str, Any]]:
+        return [
+            {'id': effect_id, 'remaining': self.timers.remaining(('player', kind, effect_id)), **modifiers}
+            for effect_id, modifiers in self._effects[kind].items()
+        ]
+
+    def _effect_bonus(self, stat: str) -> int:
+        return sum(
+            modifiers.get(stat, 0)
+            for effects in self._effects.values()
+            for modifiers in effects.values()
+        )
 
     def get_total_atk(self, equipment_config: Dict[str, Any] = None) -> int:
-        total = self.atk
-        if self.weapon and equipment_config:
-            weapons = equipment_config.get('weapons', [])
-            for w in weapons:
-                if w['id'] == self.weapon:
-                    total += w.get('atk', 0)
-                    break
-        return total
+        if equipment_config is None or equipment_config is self._equipment_config:
+            return self.stats.atk
+        return self._compute_stats(equipment_config).atk
 
     def get_total_def(self, equipment_config: Dict[str, Any] = None) -> int:
-        total = self.defense
-        if self.armor and equipment_config:
-            armors = equipment_config.get('armors', [])
-            for a in armors:
-                if a['id'] == self.armor:
-                    total += a.get('def', 0)
-                    break
-        return total
+        if equipment_config is None or equipment_config is self._equipment_config:
+            return self.stats.defense
+        return self._compute_stats(equipment_config).defense
@@ -9,6 +9,8 @@ from modules.combat import Monster
 
 
 class WorldModule(GameModule):
+    actions = (ActionType.EXPLORE, ActionType.NEXT_FLOOR)
+
     def __init__(self, config: Dict[str, Any], monsters: List[Dict[str, Any]], 
                  floor_config: Dict[str, Any]):
         self._config = config
@@ -22,6 +24,7 @@ class WorldModule(GameModule):
         
         self._seen_lore: set = set()
         self._seen_npcs: set = set()
+        self._combat = None
 
     @property
     def module_id(self) -> str:
@@ -29,7 +32,10 @@ class WorldModule(GameModule):
 
     @property
     def dependencies(self) -> List[str]:
-        return ['player']
+        return ['player', 'combat']
+
+    def bind(self, dependencies: Dict[str, GameModule]) -> None:
+        self._combat = dependencies.get('combat')
 
     def get_state(self) -> Dict[str, Any]:
         return {
@@ -52,15 +58,15 @@ class WorldModule(GameModule):
         elif action.type == ActionType.NEXT_FLOOR:
             return self._process_next_floor(context)
         
-        return ActionResult(success=False, action_type=action.type, message="Unknown action")
+        return context.result(action.type, False, "Unknown action")
 
     def _process_explore(self, context: GameContext) -> ActionResult:
         if self.in_battle:
-            return ActionResult(success=False, action_type=ActionType.EXPLORE, message="Already in battle")
+            return context.result(ActionType.EXPLORE, False, "Already in battle")
         
-        combat_module = context.get_module('combat')
+        combat_module = self._combat
         if not combat_module:
-            return ActionResult(success=False, action_type=ActionType.EXPLORE, message="No combat module")
+            return context.result(ActionType.EXPLORE, False, "No combat module")
         
         rng = context.engine.rng if context.engine else None
         monster = self._create_monster(rng)
@@ -71,39 +77,29 @@ class WorldModule(GameModule):
             combat_module.slow_effect = 0
             self.in_battle = True
             
-            return ActionResult(
-                success=True,
-                action_type=ActionType.EXPLORE,
-                data={
-                    'monster': combat_module._monster_to_dict(monster) if hasattr(combat_module, '_monster_to_dict') else None,
-                    'floor': self.floor,
-                },
-                events=['battle_start', 'explore']
-            )
-        
-        return ActionResult(success=False, action_type=ActionType.EXPLORE, message="No monsters available")
+            result = context.result(ActionType.EXPLORE)
+            result.data['monster'] = combat_module._monster_to_dict(monster) if hasattr(combat_module, '_monster_to_dict') else None
+            result.data['floor'] = self.floor
+            result.events.append('battle_start')
+            result.events.append('explore')
+            return result
+        
+        return context.result(ActionType.EXPLORE, False, "No monsters available")
 
     def _process_next_floor(self, context: GameContext) -> ActionResult:
         if not self.can_advance:
-            return ActionResult(success=False, action_type=ActionType.NEXT_FLOOR, message="Cannot advance")
+            return context.result(ActionType.NEXT_FLOOR, False, "Cannot advance")
         
         old_floor = self.floor
         self.floor += 1
         self.killed_on_floor = 0
         self.can_advance = False
         
-        events = ['floor_advance']
-        data = {
-            'old_floor': old_floor,
-            'new_floor': self.floor,
-        }
-        
-        return ActionResult(
-            success=True,
-            action_type=ActionType.NEXT_FLOOR,
-            data=data,
-            events=events
-        )
+        result = context.result(ActionType.NEXT_FLOOR)
+        result.data['old_floor'] = old_floor
+        result.data['new_floor'] = self.floor
+        result.events.append('floor_advance')
+        return result
 
     def _create_monster(self, rng) -> Optional[Monster]:
         import random
@@ -164,9 +160,6 @@ class WorldModule(GameModule):
         else:
             return min(base + 3, max_monsters)
 
-    def on_tick(self, tick: int, context: GameContext) -> None:
-        pass
-
     def reset(self) -> None:
         self.floor = 1
         self.killed_on_floor = 0
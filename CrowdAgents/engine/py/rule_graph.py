@@ -0,0 +1,397 @@
+"""
+事件规则依赖图
+分析每条规则读取的输入（状态路径、派生值、其它事件），按事件引用拓扑排序一次；
+并静态判断规则在输入都未变化时是否必然不触发，每个 tick 只求值输入变化过的规则
+"""
+
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Set, Tuple
+from dataclasses import dataclass, field, fields, is_dataclass
+from operator import attrgetter
+import heapq
+import logging
+
+from expression import ExpressionCompiler
+
+
+UNKNOWN = object()
+
+ACTION_RESULT = 'action_result'
+
+# _compute_values 产出的派生值：依赖的状态路径，以及这些路径都未变化时的取值（UNKNOWN 表示不确定）
+COMPUTED_VALUE_INPUTS: Dict[str, Tuple[Tuple[str, ...], Any]] = {
+    'hp_delta': (('player.hp',), 0),
+    'mp_delta': (('player.mp',), 0),
+    'gold_delta': (('player.gold',), 0),
+    'exp_delta': (('player.exp',), 0),
+    'hp_ratio': (('player.hp', 'player.max_hp'), UNKNOWN),
+    'mp_ratio': (('player.mp', 'player.max_mp'), UNKNOWN),
+    'item_obtained': (('inventory.items',), []),
+    'item_used': (('inventory.items',), []),
+    'item_count_delta': (('inventory.items',), 0),
+    'floor_changed': (('world.floor',), False),
+    'battle_started': (('world.in_battle',), False),
+    'battle_ended': (('world.in_battle',), False),
+    'level_up': (('player.level',), False),
+    'player_died': (('player.hp',), False),
+    'monster_killed': (('monster', 'world.in_battle'), None),
+    'scene_changed': (('ui.current_scene',), False),
+    'scene_from': (('ui.current_scene',), None),
+    'scene_to': (('ui.current_scene',), None),
+    'dialog_opened': (('ui.active_dialog',), UNKNOWN),
+    'dialog_closed': (('ui.active_dialog',), UNKNOWN),
+    'tutorial_advanced': (('ui.tutorial_step',), False),
+    'achievement_unlocked': (('character.achievements',), []),
+    'feature_unlocked': (('character.unlocked_features',), []),
+    'story_progress_updated': (('character.story_progress',), False),
+    'playtime_delta_ms': (('character.playtime_ms',), 0),
+}
+
+
+@dataclass
+class RuleNode:
+    rule: Any
+    event_refs: Set[str] = field(default_factory=set)
+    inputs: FrozenSet[str] = frozenset()
+    skippable: bool = False
+
+
+class RuleGraph:
+    """
+    order 为拓扑序：被引用的事件排在引用它的规则之前，其余按 (priority, 原顺序)。
+    inputs 包含规则自身及其引用事件（递归）读取的全部状态路径；
+    skippable 表示 inputs 全部未变化且没有 action_result 时规则必然为假。
+
+    静态判断在“输入未变化”的前提下对 AST 做抽象求值：curr.X 与 prev.X 视为同一个值，
+    于是 curr.X > prev.X 恒假；同一路径上的多个约束用候选值穷举检查能否同时成立，
+    例如 curr.player.hp <= 0 && prev.player.hp > 0 恒假。
+    """
+
+    def __init__(self, rules: List[Any], compiler: ExpressionCompiler = None,
+                 computed_inputs: Dict[str, Tuple[Tuple[str, ...], Any]] = None):
+        self.compiler = compiler or ExpressionCompiler()
+        self.computed_inputs = COMPUTED_VALUE_INPUTS if computed_inputs is None else computed_inputs
+
+        self.nodes: Dict[str, RuleNode] = {rule.event_id: RuleNode(rule) for rule in rules}
+        asts = {rule.event_id: self.compiler.parse(rule.condition) for rule in rules}
+        for event_id, node in self.nodes.items():
+            node.event_refs = {
+                name for name in self._names(asts[event_id])
+                if name in self.nodes and name not in self.computed_inputs and name != event_id
+            }
+
+        self.order: List[RuleNode] = self._topological_order(rules)
+
+        analyzed: Set[str] = set()
+        for node in self.order:
+            event_id = node.rule.event_id
+            inputs = set(self._inputs(asts[event_id]))
+            for ref in node.event_refs:
+                inputs |= self.nodes[ref].inputs
+            node.inputs = frozenset(inputs)
+            if node.event_refs <= analyzed:
+                node.skippable = _is_falsy(self._abstract(asts[event_id]))
+            analyzed.add(event_id)
+
+        self.paths: List[str] = sorted({
+            path for node in self.order for path in node.inputs if path != ACTION_RESULT
+        })
+        self._getters = [self._getter(path) for path in self.paths]
+        self._direct: List[str] = []
+        self._direct_getter = None
+        self._walked: List[Tuple[str, Callable[[Any], Any]]] = []
+
+    def dirty_inputs(self, prev: Any, curr: Any, action_result: Dict[str, Any] = None,
+                     extra: Iterable[str] = ()) -> Set[str]:
+        """
+        能直接属性访问的路径合并成一个 attrgetter 一次取完，其余路径逐个走 _walker；
+        路径落在 dataclass 上不存在的字段时恒为 None，不再比较。分组按第一次调用时的状态确定。
+        extra 为调用方另外知道已变化的路径
+        """
+        if self._direct_getter is None:
+            self._split_paths(curr)
+        try:
+            a = self._direct_getter(curr)
+            b = self._direct_getter(prev)
+        except AttributeError:
+            dirty = {
+                path for path, get in zip(self.paths, self._getters)
+                if get(curr) != get(prev)
+            }
+        else:
+            dirty = {path for path, x, y in zip(self._direct, a, b) if x != y}
+            for path, get in self._walked:
+                if get(curr) != get(prev):
+                    dirty.add(path)
+        if action_result is not None:
+            dirty.add(ACTION_RESULT)
+        dirty.update(extra)
+        return dirty
+
+    def _split_paths(self, state: Any) -> None:
+        direct, walked = [], []
+        for path, get in zip(self.paths, self._getters):
+            try:
+                attrgetter(path)(state)
+                direct.append(path)
+            except AttributeError:
+                if not self._missing_field(state, path):
+                    walked.append((path, get))
+        getter = attrgetter(*direct) if direct else (lambda state: ())
+        self._direct, self._walked = direct, walked
+        if len(direct) == 1:
+            self._direct_getter = lambda state: (getter(state),)
+        else:
+            self._direct_getter = getter
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'rules': len(self.order),
+            'skippable': sum(1 for node in self.order if node.skippable),
+            'paths': len(self.paths),
+        }
+
+    @staticmethod
+    def _missing_field(state: Any, path: str) -> bool:
+        obj = state
+        for part in path.split('.'):
+            if is_dataclass(obj) and not hasattr(type(obj), part) \
+                    and part not in {f.name for f in fields(obj)}:
+                return True
+            obj = getattr(obj, part, None)
+            if obj is None:
+                return False
+        return False
+
+    @staticmethod
+    def _getter(path: str) -> Callable[[Any], Any]:
+        fast = attrgetter(path)
+        walk = ExpressionCompiler._walker(path.split('.'))
+
+        def get(state):
+            try:
+                return fast(state)
+            except AttributeError:
+                return walk(state)
+        return get
+
+    def _topological_order(self, rules: List[Any]) -> List[RuleNode]:
+        """Kahn 算法，入度为 0 的规则按 (priority, 原顺序) 出队；成环的规则按优先级追加在最后"""
+        index = {rule.event_id: i for i, rule in enumerate(rules)}
+        indegree = {event_id: len(node.event_refs) for event_id, node in self.nodes.items()}
+        dependents: Dict[str, List[str]] = {event_id: [] for event_id in self.nodes}
+        for event_id, node in self.nodes.items():
+            for ref in node.event_refs:
+                dependents[ref].append(event_id)
+
+        def key(event_id):
+            return (self.nodes[event_id].rule.priority, index[event_id], event_id)
+
+        heap = [key(event_id) for event_id, degree in indegree.items() if degree == 0]
+        heapq.heapify(heap)
+        order = []
+        while heap:
+            event_id = heapq.heappop(heap)[2]
+            order.append(self.nodes[event_id])
+            for dependent in dependents[event_id]:
+                indegree[dependent] -= 1
+                if indegree[dependent] == 0:
+                    heapq.heappush(heap, key(dependent))
+
+        if len(order) < len(self.nodes):
+            cyclic = sorted((e for e, degree in indegree.items() if degree > 0), key=key)
+            logging.warning(f"Event rule cycle detected: {cyclic}")
+            order.extend(self.nodes[event_id] for event_id in cyclic)
+        return order
+
+    def _names(self, node: tuple):
+        kind = node[0]
+        if kind == 'name':
+            yield node[1]
+        elif kind in ('or', 'and'):
+            for child in node[1]:
+                yield from self._names(child)
+        elif kind in ('not', 'len'):
+            yield from self._names(node[1])
+        elif kind in ('cmp', 'arith'):
+            yield from self._names(node[2])
+            yield from self._names(node[3])
+
+    def _inputs(self, ast: tuple):
+        for name in self._names(ast):
+            root, _, path = name.partition('.')
+            if name in self.computed_inputs:
+                yield from self.computed_inputs[name][0]
+            elif root in ('curr', 'prev') and path:
+                yield path
+            elif root == ACTION_RESULT:
+                yield ACTION_RESULT
+            elif root == 'computed' and path in self.computed_inputs:
+                yield from self.computed_inputs[path][0]
+
+    def _abstract(self, node: tuple):
+        """
+        抽象值：('const', v) 确定值；('sym', path, wrap) 状态路径上的值（wrap 为 'id' 或 'len'）；
+        ('fact', path, wrap, tests) 对该值的约束，tests 为 (negate, op, const) 元组；UNKNOWN 不确定
+        """
+        kind = node[0]
+
+        if kind == 'const':
+            return node
+
+        if kind == 'name':
+            return self._abstract_name(node[1])
+
+        if kind == 'len':
+            inner = self._abstract(node[1])
+            if inner is UNKNOWN:
+                return UNKNOWN
+            if inner[0] == 'sym' and inner[2] == 'id':
+                return ('sym', inner[1], 'len')
+            if inner[0] == 'const':
+                return ('const', _length(inner[1]))
+            return UNKNOWN
+
+        if kind == 'not':
+            inner = self._as_condition(self._abstract(node[1]))
+            if inner is UNKNOWN:
+                return UNKNOWN
+            if inner[0] == 'const':
+                return ('const', not inner[1])
+            (negate, op, const), = inner[3]
+            return ('fact', inner[1], inner[2], ((not negate, op, const),))
+
+        if kind == 'cmp':
+            return self._abstract_comparison(node[1], self._abstract(node[2]), self._abstract(node[3]))
+
+        if kind == 'arith':
+            left = self._abstract(node[2])
+            right = self._abstract(node[3])
+            if left is UNKNOWN or right is UNKNOWN or left[0] != 'const' or right[0] != 'const':
+                return UNKNOWN
+            try:
+                return ('const', self.compiler._compile_node(('arith', node[1], left, right))(None))
+            except Exception:
+                return UNKNOWN
+
+        parts = [self._as_condition(self._abstract(child)) for child in node[1]]
+        consts = [p[1] for p in parts if p is not UNKNOWN and p[0] == 'const']
+
+        if kind == 'or':
+            if any(consts):
+                return ('const', True)
+            if len(consts) == len(parts):
+                return ('const', False)
+            return UNKNOWN
+
+        if not all(consts):
+            return ('const', False)
+        if len(consts) == len(parts):
+            return ('const', True)
+        tests: Dict[Tuple[str, str], List[tuple]] = {}
+        for p in parts:
+            if p is not UNKNOWN and p[0] == 'fact':
+                tests.setdefault((p[1], p[2]), []).extend(p[3])
+        if any(not _satisfiable(t) for t in tests.values()):
+            return ('const', False)
+        return UNKNOWN
+
+    def _abstract_name(self, name: str):
+        if name in self.computed_inputs:
+            clean = self.computed_inputs[name][1]
+            return UNKNOWN if clean is UNKNOWN else ('const', clean)
+
+        if name in self.nodes:
+            return ('const', None) if self.nodes[name].skippable else UNKNOWN
+
+        root, _, path = name.partition('.')
+        if root in ('curr', 'prev'):
+            return ('sym', path, 'id') if path else UNKNOWN
+        if root == 'computed':
+            return self._abstract_name(path) if path in self.computed_inputs else UNKNOWN
+        # action_result 为空时取到 None；其余名字既非派生值也非事件，求值结果同样是 None
+        return ('const', None)
+
+    def _abstract_comparison(self, op: str, left, right):
+        if left is UNKNOWN or right is UNKNOWN or 'fact' in (left[0], right[0]):
+            return UNKNOWN
+
+        if left[0] == 'sym' and right[0] == 'sym':
+            if left[1:] != right[1:]:
+                return UNKNOWN
+            if op == '==':
+                return ('const', True)
+            if op in ('!=', '>', '<'):
+                return ('const', False)
+            return UNKNOWN
+
+        if left[0] == 'const' and right[0] == 'const':
+            try:
+                return ('const', _test(op, left[1], right[1]))
+            except Exception:
+                return UNKNOWN
+
+        if left[0] == 'sym':
+            return ('fact', left[1], left[2], ((False, op, right[1]),))
+        return ('fact', right[1], right[2], ((False, _MIRRORED[op], left[1]),))
+
+    @staticmethod
+    def _as_condition(value):
+        """条件位置上的裸路径视为对其真值的约束"""
+        if value is not UNKNOWN and value[0] == 'sym':
+            return ('fact', value[1], value[2], ((False, 'truthy', None),))
+        return value
+
+
+_MIRRORED = {'==': '==', '!=': '!=', '>': '<', '<': '>', '>=': '<=', '<=': '>='}
+
+_EPSILON = 1e-9
+
+
+def _test(op: str, a: Any, b: Any) -> bool:
+    """与 ExpressionCompiler 的比较语义一致，异常由调用方处理"""
+    if op == 'truthy':
+        return bool(a)
+    if op == '==':
+        return a == b
+    if op == '!=':
+        return a != b
+    if a is None or b is None:
+        return False
+    if op == '>':
+        return a > b
+    if op == '<':
+        return a < b
+    if op == '>=':
+        return a >= b
+    return a <= b
+
+
+def _satisfiable(tests: List[tuple]) -> bool:
+    """
+    同一个值上的约束能否同时成立。比较对象都是常量，取常量及其两侧邻域，
+    再加上各类型的代表值作为候选；比较抛异常时规则不会触发，按不成立处理
+    """
+    candidates: List[Any] = [None, True, False, 0, 1, -1, '', 'x', [], [0]]
+    for _, _, const in tests:
+        if isinstance(const, (int, float)) and not isinstance(const, bool):
+            candidates.extend((const - 1, const - _EPSILON, const, const + _EPSILON, const + 1))
+        elif const is not None:
+            candidates.append(const)
+
+    for candidate in candidates:
+        try:
+            if all(_test(op, candidate, const) != negate for negate, op, const in tests):
+                return True
+        except Exception:
+            continue
+    return False
+
+
+def _is_falsy(value) -> bool:
+    return value is not UNKNOWN and value[0] == 'const' and not value[1]
+
+
+def _length(value: Any) -> int:
+    if value is None:
+        return 0
+    return len(value) if hasattr(value, '__len__') else 0
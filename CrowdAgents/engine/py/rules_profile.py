@@ -0,0 +1,74 @@
+"""
+事件规则性能报告
+按累计耗时（或命中率、异常数）列出 event_rules.json 中每条规则，找出拖慢 tick 或从不触发的规则
+
+示例：
+    python rules_profile.py
+    python rules_profile.py --duration 300000 --sort hit-rate --limit 20
+    python rules_profile.py --report ../output/report.json --sort errors
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from event_inference import RuleProfiler
+from simulator import run_simulation
+from snapshot_query import print_rows
+
+
+COLUMNS = ('eventId', 'evaluations', 'skipped', 'hits', 'hitRate', 'totalUs', 'avgNs', 'errors')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CrowdAgents 事件规则性能报告')
+    parser.add_argument('--report', default=None,
+                        help='读取 main.py --profile-rules 生成的报告，不指定则现场跑一次模拟')
+    parser.add_argument('--config', '-c', default=None, help='配置目录路径')
+    parser.add_argument('--duration', '-d', type=int, default=60000, help='模拟时长(ms)')
+    parser.add_argument('--seed', '-s', type=int, default=42)
+    parser.add_argument('--hybrid-events', action='store_true', help='以混合事件模式运行')
+    parser.add_argument('--sort', choices=sorted(RuleProfiler.SORT_KEYS), default='cost')
+    parser.add_argument('--limit', type=int, default=None)
+    parser.add_argument('--errors', action='store_true', help='额外列出各规则最后一次异常')
+    args = parser.parse_args()
+
+    if args.report:
+        with open(args.report, encoding='utf-8') as f:
+            profile = json.load(f)['meta'].get('ruleProfile')
+        if not profile:
+            print(f"{args.report} 中没有 ruleProfile，请用 main.py --profile-rules 重新生成")
+            return 1
+    else:
+        with contextlib.redirect_stdout(io.StringIO()):
+            report = run_simulation(
+                config_dir=args.config, duration_ms=args.duration, seed=args.seed,
+                log_level='WARNING', hybrid_events=args.hybrid_events, profile_rules=True,
+            )
+        profile = report['meta']['ruleProfile']
+
+    rows = sorted(profile['rows'], key=RuleProfiler.SORT_KEYS[args.sort])
+    if args.limit:
+        rows = rows[:args.limit]
+    print(f"tick 数: {profile['ticks']}  规则数: {profile['rules']}  规则求值总耗时: {profile['totalMs']} ms\n")
+    print_rows([{column: row[column] for column in COLUMNS} for row in rows])
+
+    if profile['neverFired']:
+        print(f"\n从未触发 ({len(profile['neverFired'])}): {', '.join(profile['neverFired'])}")
+    if args.errors:
+        failing = [row for row in profile['rows'] if row['errors']]
+        print('\n求值异常:')
+        print_rows([
+            {'eventId': row['eventId'], 'errors': row['errors'], 'lastError': row['lastError']}
+            for row in failing
+        ])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""
+数据驱动评分
+evaluation.json 中带 on 字段的评分因子，其 trigger 用事件规则同一套 ExpressionCompiler 编译成闭包，
+按触发时机分组；每个 tick 对 diff 事件与 Agent 计数器只求值一遍。
+因子的 delta 是不做正则化时加减的分值（缺省为 baseScore）；triggers 可给出多组 (trigger, delta)，依次求值
+"""
+
+import logging
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from event_flags import EVENT_BITS, event_mask
+from expression import ExpressionCompiler, EvaluationContext, CompiledExpression
+
+
+# on 取该值的因子不挂在事件上：Agent 处理完事件后求值，条件成立期间由 check_unmet_expectations 每 tick 结算
+EXPECTATIONS = 'expectations'
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+class ScoringVariables:
+    """
+    trigger 取名字时才调用对应的 getter(*args)，没被任何命中分组引用的变量不计算。
+    getters 由 Agent 按类定义：变量名 -> 以 (agent, prev, curr) 为参数的函数
+    """
+
+    __slots__ = ('getters', 'args')
+
+    def __init__(self, getters: Dict[str, Callable[..., Any]], *args: Any):
+        self.getters = getters
+        self.args = args
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.getters
+
+    def __getitem__(self, name: str) -> Any:
+        return self.getters[name](*self.args)
+
+    def get(self, name: str, default: Any = None) -> Any:
+        getter = self.getters.get(name)
+        return getter(*self.args) if getter is not None else default
+
+
+@dataclass(frozen=True)
+class ScoringFactor:
+    factor_id: str
+    dimension: str
+    delta: float
+    on: str
+    trigger: str
+    condition: CompiledExpression
+
+
+class ScoringKernel:
+    """
+    评分内核：因子按 on（事件 id 或 EXPECTATIONS）分组。
+    trigger 里的名字先查 Agent 给出的评分变量，再查本 tick 已触发的事件；
+    没有 on、或 trigger 不是合法表达式（如 "3+ skills in battle" 这类说明文字）的因子不进内核
+    """
+
+    # 按配置对象的身份缓存，条目持有配置本身，只保留最近用过的 CACHE_SIZE 份
+    CACHE_SIZE = 8
+    _cache: 'OrderedDict[int, Tuple[Dict[str, Any], ScoringKernel]]' = OrderedDict()
+    _lock = threading.Lock()
+
+    def __init__(self, evaluation_config: Dict[str, Any]):
+        compiler = ExpressionCompiler()
+        groups: Dict[str, List[ScoringFactor]] = {}
+        self.rejected: List[str] = []
+
+        for dimension, signs in evaluation_config.get('factors', {}).items():
+            for sign, factors in signs.items():
+                for factor_id, factor in factors.items():
+                    on = factor.get('on')
+                    if not on:
+                        continue
+                    default_delta = factor.get('delta', factor.get('baseScore', 0))
+                    rules = factor.get('triggers') or [{'trigger': factor.get('trigger'), 'delta': default_delta}]
+                    for rule in rules:
+                        trigger = rule.get('trigger')
+                        if not trigger:
+                            continue
+                        condition = self._compile(compiler, trigger)
+                        if condition is None:
+                            logging.warning(f"Scoring trigger of {dimension}.{factor_id} is not an expression: {trigger}")
+                            self.rejected.append(factor_id)
+                            continue
+                        delta = rule.get('delta', default_delta)
+                        groups.setdefault(on, []).append(ScoringFactor(
+                            factor_id=factor_id,
+                            dimension=dimension,
+                            delta=delta if sign == 'positive' else -delta,
+                            on=on,
+                            trigger=trigger,
+                            condition=condition,
+                        ))
+
+        self.groups: Dict[str, Tuple[ScoringFactor, ...]] = {on: tuple(f) for on, f in groups.items()}
+        triggers = {on for on in self.groups if on != EXPECTATIONS}
+        self.trigger_mask = event_mask(triggers)
+        # 热加载或自定义 rules_path 的规则 id 在 EventFlag 中没有位，按名字匹配
+        self.unmasked_triggers = frozenset(triggers - EVENT_BITS.keys())
+
+    @classmethod
+    def for_config(cls, evaluation_config: Dict[str, Any]) -> 'ScoringKernel':
+        """同一份 evaluation 配置只编译一次，所有 Agent 共用"""
+        key = id(evaluation_config)
+        with cls._lock:
+            entry = cls._cache.get(key)
+            if entry is not None and entry[0] is evaluation_config:
+                cls._cache.move_to_end(key)
+                return entry[1]
+        kernel = cls(evaluation_config)
+        with cls._lock:
+            cls._cache[key] = (evaluation_config, kernel)
+            cls._cache.move_to_end(key)
+            while len(cls._cache) > cls.CACHE_SIZE:
+                cls._cache.popitem(last=False)
+        return kernel
+
+    @property
+    def factors(self) -> List[ScoringFactor]:
+        return [factor for group in self.groups.values() for factor in group]
+
+    def triggered_by(self, events: Iterable[str], mask: int = None) -> bool:
+        """mask 为 events 的 EventFlag 位掩码，给出时先用位运算判断，再按名字匹配没有位的触发事件"""
+        if mask is not None:
+            return bool(mask & self.trigger_mask) or not self.unmasked_triggers.isdisjoint(events)
+        groups = self.groups
+        return any(event in groups for event in events)
+
+    def fired(self, events: Iterable[str], variables: Any) -> List[ScoringFactor]:
+        """
+        按事件出现顺序返回本次命中的因子；同一事件出现多次则对应因子也求值多次。
+        variables 为 dict 或 ScoringVariables
+        """
+        context = EvaluationContext(
+            prev=None, curr=None, computed=variables, events=list(events), action_result=None,
+        )
+        groups = self.groups
+        fired = []
+        for event in context.events:
+            for factor in groups.get(event, ()):
+                try:
+                    if factor.condition(context):
+                        fired.append(factor)
+                except Exception as e:
+                    logging.debug(f"Error evaluating scoring factor {factor.factor_id}: {e}")
+        return fired
+
+    @staticmethod
+    def _compile(compiler: ExpressionCompiler, trigger: str) -> Optional[CompiledExpression]:
+        expr = trigger.replace('===', '==')
+        try:
+            tree = compiler.parse(expr)
+        except Exception:
+            return None
+        if not all(_IDENTIFIER.match(name) for name in _names(tree)):
+            return None
+        return compiler.compile(expr)
+
+
+def _names(node: Any) -> Iterator[str]:
+    if isinstance(node, tuple) and node:
+        if node[0] == 'name':
+            yield node[1]
+            return
+        for child in node[1:]:
+            yield from _names(child)
+    elif isinstance(node, list):
+        for child in node:
+            yield from _names(child)
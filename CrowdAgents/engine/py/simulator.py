@@ -3,13 +3,22 @@
 管理 Agent-Engine 绑定实例，驱动模拟过程
 """
 
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass
+from collections import Counter
+from pathlib import Path
 import time
 import logging
 
 from state import GameState, StateDiff
-from snapshot import SnapshotManager, SnapshotStore
+from snapshot import SnapshotManager, SnapshotStore, CompressedSnapshotStore, RetentionPolicy
+from event_inference import BatchInferenceEngine, RuleProfiler, diff_stats, engine_event_ids, action_result_view
+from codec import get_codec
+from snapshot_writer import SnapshotWriter
+from sqlite_store import SqliteSnapshotStore
+from timetravel import ActionLog
+from event_log import EventLog
+from timer_wheel import TimerWheel
 from engine import GameEngine
 from modules.base import Action, ActionResult
 from agents.base import AgentBase
@@ -17,6 +26,15 @@ from config import GameConfig, SimulationConfig, ConfigLoader
 from evaluator import Evaluator
 from analyzer import Analyzer
 from advisor import Advisor
+from scoring import EXPECTATIONS
+
+
+# 检查 Agent 是否收敛的周期(tick)
+CONVERGENCE_CHECK_TICKS = 50
+
+# 每隔这么多 tick 对所有 Agent 的 expectations 因子再结算一次，定时轮里的键不属于任何 Agent
+EXPECTATION_CHECK_TICKS = 50
+EXPECTATION_CHECK_KEY = (None, EXPECTATIONS)
 
 
 @dataclass
@@ -24,6 +42,7 @@ class AgentInstance:
     agent: AgentBase
     engine: GameEngine
     snapshot_manager: SnapshotManager
+    action_log: Optional[ActionLog] = None
 
 
 class SimulationLogger:
@@ -59,13 +78,39 @@ class Simulator:
         self.instances: List[AgentInstance] = []
         self.tick = 0
         self.logger = SimulationLogger(simulation_config.log_level)
+        self._snapshot_codec = (
+            get_codec(simulation_config.snapshot_codec)
+            if simulation_config.snapshot_dir and simulation_config.snapshot_codec else None
+        )
+        self._snapshot_writer = (
+            SnapshotWriter(
+                max_queue=simulation_config.snapshot_queue_size,
+                workers=simulation_config.snapshot_writer_threads,
+            )
+            if (simulation_config.snapshot_dir or simulation_config.snapshot_db)
+            and simulation_config.snapshot_writer_threads > 0 else None
+        )
         
+        self._batch_inference = BatchInferenceEngine() if simulation_config.batch_inference else None
+        self._rule_profiler = RuleProfiler() if simulation_config.profile_rules else None
+        if self._batch_inference is not None:
+            self._batch_inference.scalar.profiler = self._rule_profiler
+        
+        # 所有 Agent 的期望期限，时钟为模拟 tick
+        self._expectation_timers = TimerWheel()
+        self._expectation_timers.schedule(EXPECTATION_CHECK_KEY, EXPECTATION_CHECK_TICKS)
+        self._agents: Dict[str, AgentBase] = {}
+        # 已收敛退役的 Agent -> 退役 tick；分数漂移检查的起点 -> (tick, 维度分)
+        self._retired: Dict[str, int] = {}
+        self._score_marks: Dict[str, Tuple[int, Dict[str, float]]] = {}
         self._create_instances()
 
     def _create_instances(self) -> None:
         for agent_config in self.simulation_config.agents:
             instance = self._create_instance(agent_config)
+            instance.agent.schedule_expectations(self._expectation_timers, self.simulation_config.tick_interval_ms)
             self.instances.append(instance)
+            self._agents[instance.agent.id] = instance.agent
 
     def _create_instance(self, agent_config: Dict[str, Any]) -> AgentInstance:
         seed = self.simulation_config.random_seed
@@ -73,20 +118,58 @@ class Simulator:
             import random
             seed = seed + hash(agent_config.get('id', ''))
         
-        engine = GameEngine(self.game_config, seed)
+        engine = GameEngine(self.game_config, seed, steady_state=self.simulation_config.steady_state)
         agent = AgentBase.create(agent_config)
         
         agent.set_engine(engine)
         agent.set_evaluation_config(self.evaluation_config)
         
-        snapshot_manager = SnapshotManager()
+        retention = self.simulation_config.snapshot_retention
+        snapshot_manager = SnapshotManager(
+            self._create_snapshot_store(agent_config),
+            retention=RetentionPolicy.from_dict(retention) if retention is not None else None,
+        )
+        snapshot_manager.event_engine.profiler = self._rule_profiler
+        snapshot_manager.event_engine.pool_diffs = self.simulation_config.steady_state
+        
+        action_log = (
+            ActionLog(self.simulation_config.keyframe_interval)
+            if self.simulation_config.action_log_dir else None
+        )
+        if action_log is not None:
+            # 行动日志目录同时保存该 Agent 的完整事件历史
+            agent.event_log.spill_to(str(
+                Path(self.simulation_config.action_log_dir) / agent_config.get('id', 'unknown') / EventLog.SPILL_FILE
+            ))
         
         return AgentInstance(
             agent=agent,
             engine=engine,
             snapshot_manager=snapshot_manager,
+            action_log=action_log,
         )
 
+    def _create_snapshot_store(self, agent_config: Dict[str, Any]) -> SnapshotStore:
+        if self.simulation_config.snapshot_db:
+            return SqliteSnapshotStore(
+                self.simulation_config.snapshot_db,
+                agent_config.get('id', 'unknown'), agent_config.get('type'),
+                writer=self._snapshot_writer,
+            )
+        
+        snapshot_dir = self.simulation_config.snapshot_dir
+        if not snapshot_dir:
+            return SnapshotStore()
+        
+        agent_dir = str(Path(snapshot_dir) / agent_config.get('id', 'unknown'))
+        if self._snapshot_codec:
+            return CompressedSnapshotStore(
+                agent_dir, self._snapshot_codec,
+                dictionary_path=str(Path(snapshot_dir) / CompressedSnapshotStore.DICTIONARY_FILE),
+                writer=self._snapshot_writer,
+            )
+        return SnapshotStore(agent_dir, writer=self._snapshot_writer)
+
     def run(self, duration_ms: int = None) -> Dict[str, Any]:
         if duration_ms is None:
             duration_ms = self.simulation_config.max_ticks * self.simulation_config.tick_interval_ms
@@ -96,14 +179,34 @@ class Simulator:
         print(f"[CrowdAgents] 开始模拟，共 {end_tick} ticks，{len(self.instances)} 个 Agent")
         start_time = time.time()
         
-        while self.tick < end_tick:
-            self.tick += 1
-            self._run_tick()
+        try:
+            while self.tick < end_tick:
+                self.tick += 1
+                self._run_tick()
             
-            if self.tick % 100 == 0:
-                elapsed = time.time() - start_time
-                tps = self.tick / elapsed if elapsed > 0 else 0
-                print(f"[CrowdAgents] Tick {self.tick}/{end_tick} ({tps:.1f} ticks/s)")
+                if (self.simulation_config.retire_converged and self.tick % CONVERGENCE_CHECK_TICKS == 0
+                        and not self._retire_converged()):
+                    print(f"[CrowdAgents] 所有 Agent 已收敛或退出，提前结束于 Tick {self.tick}")
+                    break
+            
+                if self.tick % 100 == 0:
+                    elapsed = time.time() - start_time
+                    tps = self.tick / elapsed if elapsed > 0 else 0
+                    print(f"[CrowdAgents] Tick {self.tick}/{end_tick} ({tps:.1f} ticks/s)")
+        
+            for instance in self.instances:
+                instance.snapshot_manager.finalize()
+                instance.snapshot_manager.store.close()
+            if self._snapshot_writer:
+                self._snapshot_writer.close()
+                print(f"[CrowdAgents] 快照写入: {self._snapshot_writer.stats()}")
+            if self.simulation_config.action_log_dir:
+                for instance in self.instances:
+                    instance.action_log.save(str(Path(self.simulation_config.action_log_dir) / instance.agent.id))
+        finally:
+            # 异常退出时也关闭事件日志的落盘文件
+            for instance in self.instances:
+                instance.agent.event_log.close()
         
         elapsed = time.time() - start_time
         print(f"[CrowdAgents] 模拟完成，耗时 {elapsed:.2f}s")
@@ -111,35 +214,161 @@ class Simulator:
         return self._generate_result()
 
     def _run_tick(self) -> None:
+        if self._batch_inference is not None:
+            self._run_batch_tick()
+        else:
+            for instance in self.instances:
+                if self._is_active(instance.agent):
+                    self._run_instance_tick(instance)
+        self._fire_expectation_timers()
+
+    def _is_active(self, agent: AgentBase) -> bool:
+        return agent.id not in self._retired and not agent.should_quit()
+
+    def _fire_expectation_timers(self) -> None:
+        """
+        到期的期望交给对应 Agent；已退出或退役的 Agent 不再处理，其定时器也不再续期。
+        周期结算排在同一 tick 到期的期限之前
+        """
+        expired = self._expectation_timers.advance(self.tick)
+        if not expired:
+            return
+        for agent_id, name in sorted(expired, key=lambda key: key[0] is not None):
+            if agent_id is None:
+                self._expectation_timers.schedule(EXPECTATION_CHECK_KEY, EXPECTATION_CHECK_TICKS)
+                for instance in self.instances:
+                    if self._is_active(instance.agent):
+                        instance.agent.check_unmet_expectations()
+                continue
+            agent = self._agents[agent_id]
+            if self._is_active(agent):
+                agent.on_expectation_timer(name)
+
+    def _retire_converged(self) -> int:
+        """
+        让维度分已不会再变的 Agent 退役，返回仍在模拟的 Agent 数。
+        评分因子全部饱和时退役不改变分数；convergence_window > 0 时分数在该窗口内的漂移
+        都小于 convergence_epsilon 也视为收敛，这是近似判断
+        """
+        window = self.simulation_config.convergence_window
+        active = 0
         for instance in self.instances:
-            if not instance.agent.should_quit():
-                self._run_instance_tick(instance)
+            agent = instance.agent
+            if not self._is_active(agent):
+                continue
+            converged = agent.is_saturated()
+            if not converged and window > 0:
+                mark = self._score_marks.get(agent.id)
+                if mark is None or self.tick - mark[0] >= window:
+                    scores = agent.dimension_scores
+                    converged = mark is not None and max(
+                        abs(scores[dim] - score) for dim, score in mark[1].items()
+                    ) < self.simulation_config.convergence_epsilon
+                    self._score_marks[agent.id] = (self.tick, dict(scores))
+            if converged:
+                self._retired[agent.id] = self.tick
+                self.logger.logger.info(f"Agent {agent.id} 评分已收敛，于 Tick {self.tick} 退役")
+            else:
+                active += 1
+        return active
+
+    def _run_batch_tick(self) -> None:
+        """所有 Agent 先各自行动，再对整批状态变化一次性推断事件，最后各自处理 diff"""
+        steps = [
+            (instance, *self._step_instance(instance))
+            for instance in self.instances
+            if self._is_active(instance.agent)
+        ]
+        if not steps:
+            return
+        
+        prevs = [step[1] for step in steps]
+        currs = [step[2] for step in steps]
+        computeds = [
+            instance.snapshot_manager.event_engine._compute_values(prev, curr, inventory_changes)
+            for instance, prev, curr, _, _, inventory_changes in steps
+        ]
+        action_results = engine_events = None
+        if self.simulation_config.hybrid_events:
+            action_results = [step[3] for step in steps]
+            engine_events = [step[4] for step in steps]
+        results = self._batch_inference.infer_batch(
+            prevs, currs, action_results, computeds=computeds, engine_events=engine_events,
+        )
+        
+        for (instance, prev, curr, *_), computed, (events, _) in zip(steps, computeds, results):
+            diff = instance.snapshot_manager.event_engine.build_state_diff(prev, curr, events, computed)
+            self._observe(instance, prev, curr, diff)
 
     def _run_instance_tick(self, instance: AgentInstance) -> None:
+        prev_state, curr_state, action_result, engine_events, inventory_changes = self._step_instance(instance)
+        if self.simulation_config.hybrid_events:
+            diff = instance.snapshot_manager.compute_diff(
+                prev_state, curr_state, action_result, engine_events, inventory_changes,
+            )
+        else:
+            diff = instance.snapshot_manager.compute_diff(
+                prev_state, curr_state, inventory_changes=inventory_changes,
+            )
+        self._observe(instance, prev_state, curr_state, diff)
+
+    def _step_instance(self, instance: AgentInstance):
+        """
+        推进一步，返回 (prev, curr, action_result 字典, 引擎事件对应的规则 id, 背包变动日志)；
+        action_result 字典与引擎事件 id 只有混合模式用得到，其余模式为 None
+        """
         engine = instance.engine
         agent = instance.agent
-        snapshot_mgr = instance.snapshot_manager
         
         prev_state = engine.get_state()
         
         action = agent.decide(prev_state)
-        result = engine.execute(action)
+        if instance.action_log:
+            if instance.action_log.should_keyframe(engine._tick):
+                instance.action_log.add_keyframe(engine.save_keyframe())
+            result = engine.execute(action)
+            instance.action_log.capture(engine, action)
+        else:
+            result = engine.execute(action)
         
         curr_state = engine.get_state()
         
         events = engine.get_events()
-        snapshot_mgr.create_snapshot(self.tick, curr_state, events)
-        
-        diff = snapshot_mgr.compute_diff(prev_state, curr_state)
+        instance.snapshot_manager.create_snapshot(self.tick, curr_state, events, engine.get_event_mask())
+        if not self.simulation_config.hybrid_events:
+            return prev_state, curr_state, None, None, engine.get_inventory_changes()
+        return (
+            prev_state, curr_state, action_result_view(result), engine_event_ids(events, result),
+            engine.get_inventory_changes(),
+        )
+
+    def _observe(self, instance: AgentInstance, prev_state: GameState, curr_state: GameState,
+                 diff: StateDiff) -> None:
+        agent = instance.agent
         agent.analyze_state_change(prev_state, curr_state, diff)
-        
         agent.check_unmet_expectations()
-        
-        if self.tick % 50 == 0:
-            agent.check_unmet_expectations()
+
+    def _diff_stats(self) -> Dict[str, Any]:
+        engines = [instance.snapshot_manager.event_engine for instance in self.instances]
+        return diff_stats(
+            sum(engine.diffs_built for engine in engines),
+            sum((engine.diff_fields_touched for engine in engines), Counter()),
+        )
+
+    def _rule_stats(self) -> Dict[str, Any]:
+        totals = {'ticks': 0, 'evaluated': 0, 'skipped': 0, 'trusted': 0}
+        for instance in self.instances:
+            for name, count in instance.snapshot_manager.event_engine.rule_stats.items():
+                totals[name] += count
+        totals['hybrid'] = self.simulation_config.hybrid_events
+        return totals
 
     def _generate_result(self) -> Dict[str, Any]:
         agent_reports = [inst.agent.get_report() for inst in self.instances]
+        if self.simulation_config.retire_converged:
+            # 退役后不再统计，该 Agent 的 stats 以及 metrics 里的合计只计到 retiredAtTick 为止
+            for agent_report in agent_reports:
+                agent_report['retiredAtTick'] = self._retired.get(agent_report['id'])
         
         evaluator = Evaluator(self.evaluation_config, self.target_audience)
         evaluation = evaluator.evaluate(agent_reports)
@@ -193,6 +422,20 @@ class Simulator:
                 'totalDuration': self.simulation_config.max_ticks * self.simulation_config.tick_interval_ms,
                 'totalTicks': self.tick,
                 'agentCount': len(self.instances),
+                'snapshotWriter': self._snapshot_writer.stats() if self._snapshot_writer else None,
+                'snapshotRetention': {
+                    instance.agent.id: instance.snapshot_manager.retention_stats
+                    for instance in self.instances
+                } if self.simulation_config.snapshot_retention is not None else None,
+                'actionLog': {
+                    instance.agent.id: instance.action_log.stats()
+                    for instance in self.instances
+                } if self.simulation_config.action_log_dir else None,
+                'stateDiff': self._diff_stats(),
+                'ruleEvaluation': self._rule_stats(),
+                'ruleProfile': self._rule_profiler.summary() if self._rule_profiler else None,
+                'batchInference': self._batch_inference.stats if self._batch_inference else None,
+                'retiredAt': dict(self._retired) if self.simulation_config.retire_converged else None,
             },
             'target_audience': self.target_audience,
             'matrix': {
@@ -225,7 +468,14 @@ class Simulator:
 
 
 def run_simulation(config_dir: str = None, duration_ms: int = None, 
-                   seed: int = None, log_level: str = "INFO") -> Dict[str, Any]:
+                   seed: int = None, log_level: str = "INFO",
+                   snapshot_dir: str = None, snapshot_codec: str = None, snapshot_db: str = None,
+                   snapshot_writer_threads: int = 0,
+                   snapshot_retention: bool = False,
+                   action_log_dir: str = None, keyframe_interval: int = 500,
+                   batch_inference: bool = False, hybrid_events: bool = False,
+                   profile_rules: bool = False, steady_state: bool = False,
+                   retire_converged: bool = False, convergence_window: int = 0) -> Dict[str, Any]:
     loader = ConfigLoader(config_dir)
     
     game_config = loader.load_game_config()
@@ -236,6 +486,20 @@ def run_simulation(config_dir: str = None, duration_ms: int = None,
     if seed is not None:
         simulation_config.random_seed = seed
     simulation_config.log_level = log_level
+    simulation_config.snapshot_dir = snapshot_dir
+    simulation_config.snapshot_codec = snapshot_codec
+    simulation_config.snapshot_db = snapshot_db
+    simulation_config.snapshot_writer_threads = snapshot_writer_threads
+    if snapshot_retention and simulation_config.snapshot_retention is None:
+        simulation_config.snapshot_retention = {}
+    simulation_config.action_log_dir = action_log_dir
+    simulation_config.keyframe_interval = keyframe_interval
+    simulation_config.batch_inference = batch_inference
+    simulation_config.hybrid_events = hybrid_events
+    simulation_config.profile_rules = profile_rules
+    simulation_config.steady_state = steady_state
+    simulation_config.retire_converged = retire_converged
+    simulation_config.convergence_window = convergence_window
     
     if duration_ms is not None:
         simulation_config.max_ticks = duration_ms // simulation_config.tick_interval_ms
@@ -4,19 +4,24 @@
 """
 
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Any
+from typing import Dict, FrozenSet, Iterable, List, Optional, Any, Set, Tuple, Union
+from collections import deque
 from pathlib import Path
 import time
 import hashlib
 import logging
+import threading
 
 import orjson
 
 from state import (
     GameState, StateDiff, SnapshotType, PlayerState, MonsterState,
-    InventoryState, WorldState, CharacterState, UIState
+    InventoryState, WorldState, CharacterState, UIState, ItemChange, summarize_item_changes,
 )
 from event_inference import EventInferenceEngine
+from event_flags import EVENT_BITS, event_mask
+from codec import SnapshotCodec, get_codec
+from snapshot_writer import SnapshotWriter
 
 
 @dataclass
@@ -35,31 +40,116 @@ class SnapshotStrategy:
         self.checkpoint_triggers = {'level_up', 'floor_advance', 'player_death'}
         self.max_incremental_chain = 20
 
-    def should_create_snapshot(self, tick: int, events: List[str], 
+    @property
+    def checkpoint_triggers(self) -> FrozenSet[str]:
+        return self._checkpoint_triggers
+
+    @checkpoint_triggers.setter
+    def checkpoint_triggers(self, triggers: Iterable[str]) -> None:
+        self._checkpoint_triggers = frozenset(triggers)
+        self._checkpoint_mask = event_mask(self._checkpoint_triggers)
+        # 不在 EventFlag 中的自定义触发事件只能按名字比较
+        self._unmasked_triggers = self._checkpoint_triggers - EVENT_BITS.keys()
+
+    def should_create_snapshot(self, tick: int, events: Union[List[str], int], 
                                 last_full_tick: int, incremental_count: int) -> SnapshotType:
+        """events 可以是事件名列表或 EventFlag 位掩码"""
         if tick - last_full_tick >= self.full_snapshot_interval:
             return SnapshotType.FULL
         
         if incremental_count >= self.max_incremental_chain:
             return SnapshotType.FULL
         
-        for event in events:
-            if event in self.checkpoint_triggers:
+        if isinstance(events, int):
+            if events & self._checkpoint_mask:
                 return SnapshotType.CHECKPOINT
+        elif event_mask(events) & self._checkpoint_mask or not self._unmasked_triggers.isdisjoint(events):
+            return SnapshotType.CHECKPOINT
         
         return SnapshotType.INCREMENTAL
 
 
+@dataclass
+class RetentionPolicy:
+    """
+    快照保留策略
+    关注事件（死亡、升级、Boss 战、低血量）前后 interest_window 个 tick 内全量保留，
+    平淡期每 decimation 个 tick 保留一帧，超过 age_after 个 tick 的历史再稀疏到 aged_decimation
+    """
+    interest_events: Set[str] = field(default_factory=lambda: {'player_death', 'level_up'})
+    interest_window: int = 20
+    low_hp_ratio: float = 0.2
+    boss_fights: bool = True
+    decimation: int = 10
+    age_after: int = 3000
+    aged_decimation: int = 100
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'RetentionPolicy':
+        default = cls()
+        return cls(
+            interest_events=set(data.get('interestEvents', default.interest_events)),
+            interest_window=data.get('interestWindow', default.interest_window),
+            low_hp_ratio=data.get('lowHpRatio', default.low_hp_ratio),
+            boss_fights=data.get('bossFights', default.boss_fights),
+            decimation=max(1, data.get('decimation', default.decimation)),
+            age_after=data.get('ageAfter', default.age_after),
+            aged_decimation=max(1, data.get('agedDecimation', default.aged_decimation)),
+        )
+
+    def is_low_hp(self, state: GameState) -> bool:
+        player = state.player
+        return player.max_hp > 0 and 0 < player.hp <= player.max_hp * self.low_hp_ratio
+
+    def __post_init__(self):
+        self._interest_mask = event_mask(self.interest_events)
+        self._unmasked_interest = set(self.interest_events) - EVENT_BITS.keys()
+
+    def is_interesting(self, state: GameState, events: List[str], was_low_hp: bool = False,
+                       mask: int = None) -> bool:
+        """
+        低血量只在跌破阈值的那一刻算关注点，持续残血不会让整段历史都被保留。
+        mask 为 events 对应的 EventFlag 位掩码，调用方已算好时传入
+        """
+        if mask is None:
+            mask = event_mask(events)
+        if mask & self._interest_mask:
+            return True
+        if self._unmasked_interest and not self._unmasked_interest.isdisjoint(events):
+            return True
+        
+        if self.boss_fights and state.monster and state.monster.is_boss:
+            return True
+        
+        return not was_low_hp and self.is_low_hp(state)
+
+
 class SnapshotStore:
-    def __init__(self, snapshot_dir: str = None):
+    def __init__(self, snapshot_dir: str = None, writer: 'SnapshotWriter' = None):
         self.snapshot_dir = Path(snapshot_dir) if snapshot_dir else None
+        self.writer = writer
         self._snapshots: Dict[str, GameState] = {}
         self._metadata: Dict[str, SnapshotMetadata] = {}
+        self._inflight: Dict[str, GameState] = {}
+        self._write_lock = threading.Lock()
         
         if self.snapshot_dir:
             self.snapshot_dir.mkdir(parents=True, exist_ok=True)
 
-    def save(self, state: GameState) -> str:
+    def save(self, state: GameState, events: List[str] = None) -> str:
+        snapshot_id = self._register(state)
+        if events:
+            self._record_events(snapshot_id, events)
+        
+        if self.writer:
+            self._inflight[snapshot_id] = state
+            self.writer.submit(self, snapshot_id, state)
+        else:
+            self._persist(snapshot_id, state)
+        
+        return snapshot_id
+
+    def _register(self, state: GameState) -> str:
         snapshot_id = self._generate_id(state)
         self._snapshots[snapshot_id] = state
         self._metadata[snapshot_id] = SnapshotMetadata(
@@ -69,13 +159,42 @@ class SnapshotStore:
             snapshot_type=state.snapshot_type,
             parent_id=state.parent_id,
         )
-        
+        return snapshot_id
+
+    def _record_events(self, snapshot_id: str, events: List[str]) -> None:
+        pass
+
+    def observe(self, state: GameState) -> None:
+        """每个 tick 的状态都会传入，不论该 tick 的快照是否保存"""
+        pass
+
+    def _persist(self, snapshot_id: str, state: GameState) -> None:
         if self.snapshot_dir:
             file_path = self.snapshot_dir / f"{snapshot_id}.json"
             file_path.write_bytes(orjson.dumps(state.to_dict(), option=orjson.OPT_INDENT_2))
             self._metadata[snapshot_id].file_path = str(file_path)
-        
-        return snapshot_id
+
+    def _persist_batch(self, batch: List[Tuple[str, GameState]]) -> None:
+        """由后台写入线程调用"""
+        with self._write_lock:
+            for snapshot_id, state in batch:
+                if snapshot_id in self._metadata:
+                    self._persist(snapshot_id, state)
+                self._inflight.pop(snapshot_id, None)
+
+    def delete(self, snapshot_id: str) -> bool:
+        with self._write_lock:
+            metadata = self._metadata.pop(snapshot_id, None)
+            if metadata is None:
+                return False
+            self._snapshots.pop(snapshot_id, None)
+            self._inflight.pop(snapshot_id, None)
+            self._discard(snapshot_id, metadata)
+        return True
+
+    def _discard(self, snapshot_id: str, metadata: SnapshotMetadata) -> None:
+        if metadata.file_path:
+            Path(metadata.file_path).unlink(missing_ok=True)
 
     def restore_to(self, snapshot_id: str) -> Optional[GameState]:
         if snapshot_id in self._snapshots:
@@ -101,26 +220,337 @@ class SnapshotStore:
         self._snapshots.clear()
         self._metadata.clear()
 
+    def flush(self) -> None:
+        if self.writer:
+            self.writer.flush()
+
+    def close(self) -> None:
+        self.flush()
+
     def _generate_id(self, state: GameState) -> str:
         data = f"{state.tick}_{state.timestamp}_{id(state)}"
         return hashlib.md5(data.encode()).hexdigest()[:12]
 
 
+class CompressedSnapshotStore(SnapshotStore):
+    """
+    分块压缩快照存储
+    每 block_size 条快照拼成一个块整体压缩后追加到段文件，
+    随机读取只需解压所在的块；索引与字典在 flush 时落盘。
+    多个 Store 共享同一个 codec 时，可通过 dictionary_path 指向同一份字典文件。
+    默认每次打开时删除目录下已有的索引与段文件，从空存储开始；
+    只读回看时传 resume=True 载入已有索引和字典
+    """
+
+    INDEX_FILE = 'index.json'
+    DICTIONARY_FILE = 'dictionary.bin'
+
+    def __init__(self, snapshot_dir: str, codec: SnapshotCodec = None,
+                 block_size: int = 64, segment_max_bytes: int = 64 * 1024 * 1024,
+                 training_samples: int = 256, dictionary_path: str = None,
+                 writer: 'SnapshotWriter' = None, resume: bool = False):
+        super().__init__(snapshot_dir, writer)
+        self.codec = codec or get_codec()
+        self.dictionary_path = (
+            Path(dictionary_path) if dictionary_path
+            else self.snapshot_dir / self.DICTIONARY_FILE
+        )
+        self.block_size = block_size
+        self.segment_max_bytes = segment_max_bytes
+        self.training_samples = training_samples
+
+        self._pending: List[Tuple[str, bytes]] = []
+        self._pending_index: Dict[str, int] = {}
+        self._samples: List[bytes] = []
+        self._blocks: List[Tuple[int, int, int]] = []
+        self._locations: Dict[str, Tuple[int, int]] = {}
+        self._segment_no = 0
+        self._segment_size = 0
+        self._cached_block = -1
+        self._cached_records: List[bytes] = []
+        self._dead_records = 0
+        self._dictionary_digest: Optional[str] = None
+
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+
+        index_path = self.snapshot_dir / self.INDEX_FILE
+        if resume:
+            if index_path.exists():
+                self._load_index()
+        else:
+            index_path.unlink(missing_ok=True)
+            for segment_path in self.snapshot_dir.glob('segment_*.bin'):
+                segment_path.unlink()
+
+    def _register(self, state: GameState) -> str:
+        snapshot_id = self._generate_id(state)
+        self._metadata[snapshot_id] = SnapshotMetadata(
+            snapshot_id=snapshot_id,
+            tick=state.tick,
+            timestamp=state.timestamp,
+            snapshot_type=state.snapshot_type,
+            parent_id=state.parent_id,
+            file_path=str(self._segment_path(self._segment_no)),
+        )
+        return snapshot_id
+
+    def _persist(self, snapshot_id: str, state: GameState) -> None:
+        self._append(snapshot_id, orjson.dumps(state.to_dict()))
+
+    def _append(self, snapshot_id: str, record: bytes) -> None:
+        self._pending_index[snapshot_id] = len(self._pending)
+        self._pending.append((snapshot_id, record))
+        self.raw_bytes += len(record)
+
+        if self.codec.needs_training:
+            if len(self._samples) < self.training_samples:
+                self._samples.append(record)
+            if len(self._samples) < self.training_samples:
+                return
+
+        if len(self._pending) >= self.block_size:
+            self._flush_blocks()
+
+    def restore_to(self, snapshot_id: str) -> Optional[GameState]:
+        state = self._inflight.get(snapshot_id)
+        if state is not None:
+            return state
+        
+        with self._write_lock:
+            record = self._read_record(snapshot_id)
+        if record is None:
+            return None
+        return GameState.from_dict(orjson.loads(record))
+
+    def _read_record(self, snapshot_id: str) -> Optional[bytes]:
+        slot = self._pending_index.get(snapshot_id)
+        if slot is not None:
+            return self._pending[slot][1]
+
+        location = self._locations.get(snapshot_id)
+        if location is None:
+            return None
+
+        block_no, slot = location
+        if block_no != self._cached_block:
+            segment_no, offset, length = self._blocks[block_no]
+            with open(self._segment_path(segment_no), 'rb') as f:
+                f.seek(offset)
+                data = self.codec.decompress(f.read(length))
+            self._cached_records = data.split(b'\n')
+            self._cached_block = block_no
+        return self._cached_records[slot]
+
+    def _discard(self, snapshot_id: str, metadata: SnapshotMetadata) -> None:
+        slot = self._pending_index.get(snapshot_id)
+        if slot is not None:
+            del self._pending[slot]
+            self._pending_index = {sid: i for i, (sid, _) in enumerate(self._pending)}
+        elif self._locations.pop(snapshot_id, None) is not None:
+            self._dead_records += 1
+
+    def flush(self) -> None:
+        super().flush()
+        with self._write_lock:
+            if self.codec.needs_training and self._samples:
+                self._train_codec()
+            self._flush_blocks(force=True)
+            self._write_index()
+
+    def close(self) -> None:
+        self.flush()
+        if self._dead_records:
+            self.compact()
+
+    def compact(self) -> None:
+        """把存活记录重写到新段文件，回收已删除快照占用的空间"""
+        with self._write_lock:
+            old_blocks = self._blocks
+            live = {block_no: [] for block_no in range(len(old_blocks))}
+            for snapshot_id, (block_no, slot) in self._locations.items():
+                live[block_no].append((slot, snapshot_id))
+
+            old_segments = {segment_no for segment_no, _, _ in old_blocks}
+            self._blocks = []
+            self._locations = {}
+            self._segment_no = max(old_segments) + 1 if old_segments else 0
+            self._segment_size = 0
+            self.compressed_bytes = 0
+            self._cached_block = -1
+            self._cached_records = []
+
+            chunk: List[Tuple[str, bytes]] = []
+            for block_no, (segment_no, offset, length) in enumerate(old_blocks):
+                if not live[block_no]:
+                    continue
+                with open(self._segment_path(segment_no), 'rb') as f:
+                    f.seek(offset)
+                    records = self.codec.decompress(f.read(length)).split(b'\n')
+                for slot, snapshot_id in sorted(live[block_no]):
+                    chunk.append((snapshot_id, records[slot]))
+                    if len(chunk) >= self.block_size:
+                        self._write_block(chunk)
+                        chunk = []
+            if chunk:
+                self._write_block(chunk)
+
+            for segment_no in old_segments:
+                self._segment_path(segment_no).unlink(missing_ok=True)
+            self._dead_records = 0
+            self._write_index()
+
+    def clear(self):
+        super().clear()
+        self._pending.clear()
+        self._pending_index.clear()
+        self._blocks.clear()
+        self._locations.clear()
+        self._cached_block = -1
+        self._cached_records = []
+        self._dead_records = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'codec': self.codec.name,
+            'records': len(self._metadata),
+            'dead_records': self._dead_records,
+            'blocks': len(self._blocks),
+            'raw_bytes': self.raw_bytes,
+            'compressed_bytes': self.compressed_bytes,
+            'ratio': self.raw_bytes / self.compressed_bytes if self.compressed_bytes else 0.0,
+        }
+
+    def _train_codec(self) -> None:
+        self.codec.train(self._samples)
+        self._samples = []
+
+    def _flush_blocks(self, force: bool = False) -> None:
+        if self.codec.needs_training:
+            self._train_codec()
+
+        while len(self._pending) >= self.block_size or (force and self._pending):
+            chunk = self._pending[:self.block_size]
+            self._pending = self._pending[self.block_size:]
+            self._write_block(chunk)
+
+        self._pending_index = {sid: i for i, (sid, _) in enumerate(self._pending)}
+
+    def _write_block(self, chunk: List[Tuple[str, bytes]]) -> None:
+        data = self.codec.compress(b'\n'.join(record for _, record in chunk))
+
+        if self._segment_size > 0 and self._segment_size + len(data) > self.segment_max_bytes:
+            self._segment_no += 1
+            self._segment_size = 0
+
+        segment_path = self._segment_path(self._segment_no)
+        with open(segment_path, 'ab') as f:
+            f.write(data)
+
+        block_no = len(self._blocks)
+        self._blocks.append((self._segment_no, self._segment_size, len(data)))
+        for slot, (snapshot_id, _) in enumerate(chunk):
+            self._locations[snapshot_id] = (block_no, slot)
+            metadata = self._metadata.get(snapshot_id)
+            if metadata:
+                metadata.file_path = str(segment_path)
+
+        self._segment_size += len(data)
+        self.compressed_bytes += len(data)
+
+    def _segment_path(self, segment_no: int) -> Path:
+        return self.snapshot_dir / f"segment_{segment_no:05d}.bin"
+
+    def _write_index(self) -> None:
+        dictionary = self.codec.get_dictionary()
+        digest = hashlib.sha256(dictionary).hexdigest() if dictionary else None
+        if digest is not None and digest != self._dictionary_digest:
+            # 覆盖上一轮留下的旧字典，保证字典与本 Store 压缩的块一致
+            self.dictionary_path.write_bytes(dictionary)
+            self._dictionary_digest = digest
+
+        index = {
+            'codec': self.codec.name,
+            'dictionary': str(self.dictionary_path.resolve()) if dictionary else None,
+            'dictionary_sha256': digest,
+            'block_size': self.block_size,
+            'blocks': self._blocks,
+            'records': self._locations,
+            'metadata': [
+                {
+                    'snapshot_id': m.snapshot_id,
+                    'tick': m.tick,
+                    'timestamp': m.timestamp,
+                    'snapshot_type': m.snapshot_type.value,
+                    'parent_id': m.parent_id,
+                }
+                for m in self._metadata.values() if m.snapshot_id in self._locations
+            ],
+        }
+        (self.snapshot_dir / self.INDEX_FILE).write_bytes(orjson.dumps(index))
+
+    def _load_index(self) -> None:
+        index = orjson.loads((self.snapshot_dir / self.INDEX_FILE).read_bytes())
+        if index['codec'] != self.codec.name:
+            self.codec = get_codec(index['codec'])
+
+        if index.get('dictionary'):
+            self.dictionary_path = Path(index['dictionary'])
+            dictionary = self.dictionary_path.read_bytes()
+            digest = hashlib.sha256(dictionary).hexdigest()
+            if index.get('dictionary_sha256', digest) != digest:
+                raise ValueError(f"Dictionary {self.dictionary_path} does not match snapshot index")
+            self.codec.load_dictionary(dictionary)
+            self._dictionary_digest = digest
+
+        self._blocks = [tuple(b) for b in index['blocks']]
+        self._locations = {sid: tuple(loc) for sid, loc in index['records'].items()}
+        if self._blocks:
+            self._segment_no = self._blocks[-1][0]
+            self._segment_size = self._blocks[-1][1] + self._blocks[-1][2]
+            self.compressed_bytes = sum(b[2] for b in self._blocks)
+
+        for m in index['metadata']:
+            self._metadata[m['snapshot_id']] = SnapshotMetadata(
+                snapshot_id=m['snapshot_id'],
+                tick=m['tick'],
+                timestamp=m['timestamp'],
+                snapshot_type=SnapshotType(m['snapshot_type']),
+                parent_id=m.get('parent_id'),
+                file_path=str(self._segment_path(self._blocks[self._locations[m['snapshot_id']][0]][0])),
+            )
+
+
 class SnapshotManager:
-    def __init__(self, store: SnapshotStore = None, event_engine: EventInferenceEngine = None):
+    def __init__(self, store: SnapshotStore = None, event_engine: EventInferenceEngine = None,
+                 retention: RetentionPolicy = None):
         self.store = store or SnapshotStore()
         self.strategy = SnapshotStrategy()
         self.event_engine = event_engine or EventInferenceEngine()
+        self.retention = retention
         self._snapshots: List[SnapshotMetadata] = []
         self._last_full_tick = 0
         self._incremental_count = 0
         self._use_legacy_diff = False
+        
+        self._tentative: deque = deque()
+        self._dense_until = -1
+        self._anchors: Set[str] = set()
+        self._aged_until = 0
+        # _snapshots 按 tick 追加，此下标之前的都已稀疏过，_age 只看其后的部分
+        self._aged_index = 0
+        self._low_hp = False
+        self.retention_stats = {'seen': 0, 'kept': 0, 'dropped': 0, 'aged_out': 0}
 
     def create_snapshot(self, tick: int, state: GameState, 
-                        events: List[str] = None) -> str:
+                        events: List[str] = None, mask: int = None) -> Optional[str]:
+        """mask 为 events 的 EventFlag 位掩码，不传则由 events 计算"""
+        self.store.observe(state)
         events = events or []
+        if mask is None:
+            mask = event_mask(events)
         snapshot_type = self.strategy.should_create_snapshot(
-            tick, events, self._last_full_tick, self._incremental_count
+            tick, mask, self._last_full_tick, self._incremental_count
         )
         
         state.snapshot_type = snapshot_type
@@ -130,10 +560,16 @@ class SnapshotManager:
             self._incremental_count = 0
         else:
             self._incremental_count += 1
-            if self._snapshots:
-                state.parent_id = self._snapshots[-1].snapshot_id
         
-        snapshot_id = self.store.save(state)
+        if self.retention is None:
+            return self._save(state, events)
+        return self._retain(tick, state, events, mask)
+
+    def _save(self, state: GameState, events: List[str] = None) -> str:
+        if state.snapshot_type != SnapshotType.FULL and self._snapshots:
+            state.parent_id = self._snapshots[-1].snapshot_id
+        
+        snapshot_id = self.store.save(state, events)
         
         metadata = self.store.get_metadata(snapshot_id)
         if metadata:
@@ -141,19 +577,94 @@ class SnapshotManager:
         
         return snapshot_id
 
-    def compute_diff(self, prev: GameState, curr: GameState) -> StateDiff:
+    def _retain(self, tick: int, state: GameState, events: List[str], mask: int = None) -> Optional[str]:
+        policy = self.retention
+        self.retention_stats['seen'] += 1
+        
+        snapshot_id = None
+        interesting = policy.is_interesting(state, events, self._low_hp, mask)
+        self._low_hp = policy.is_low_hp(state)
+        if interesting:
+            while self._tentative:
+                self._keep(*self._tentative.popleft())
+            snapshot_id = self._keep(state, events)
+            self._anchors.add(snapshot_id)
+            self._dense_until = tick + policy.interest_window
+        elif tick <= self._dense_until or state.snapshot_type == SnapshotType.CHECKPOINT:
+            snapshot_id = self._keep(state, events)
+        else:
+            self._tentative.append((state, events))
+            while self._tentative and self._tentative[0][0].tick <= tick - policy.interest_window:
+                self._decimate(*self._tentative.popleft())
+        
+        if tick % policy.aged_decimation == 0:
+            self._age(tick)
+        
+        return snapshot_id
+
+    def _keep(self, state: GameState, events: List[str] = None) -> str:
+        self.retention_stats['kept'] += 1
+        return self._save(state, events)
+
+    def _decimate(self, state: GameState, events: List[str] = None) -> None:
+        if state.tick % self.retention.decimation == 0:
+            self._keep(state, events)
+        else:
+            self.retention_stats['dropped'] += 1
+
+    def _age(self, tick: int) -> None:
+        """把 age_after 之前的历史稀疏到 aged_decimation，关注点与检查点保留"""
+        policy = self.retention
+        cutoff = tick - policy.age_after
+        if cutoff <= self._aged_until:
+            return
+        
+        snapshots = self._snapshots
+        start = end = self._aged_index
+        kept = []
+        while end < len(snapshots) and snapshots[end].tick < cutoff:
+            metadata = snapshots[end]
+            end += 1
+            if (metadata.tick % policy.aged_decimation != 0
+                    and metadata.snapshot_type != SnapshotType.CHECKPOINT
+                    and metadata.snapshot_id not in self._anchors):
+                self.store.delete(metadata.snapshot_id)
+                self.retention_stats['aged_out'] += 1
+            else:
+                kept.append(metadata)
+                self._anchors.discard(metadata.snapshot_id)
+        snapshots[start:end] = kept
+        self._aged_index = start + len(kept)
+        self._aged_until = cutoff
+
+    def finalize(self) -> None:
+        """模拟结束时处理尚未定夺的快照，最后一帧总是保留"""
+        if self.retention is None:
+            return
+        while len(self._tentative) > 1:
+            self._decimate(*self._tentative.popleft())
+        if self._tentative:
+            self._keep(*self._tentative.popleft())
+
+    def compute_diff(self, prev: GameState, curr: GameState,
+                     action_result: Dict[str, Any] = None,
+                     engine_events: List[str] = None,
+                     inventory_changes: List[ItemChange] = None) -> StateDiff:
         if self._use_legacy_diff:
-            return self._compute_diff_legacy(prev, curr)
+            return self._compute_diff_legacy(prev, curr, inventory_changes)
         
         try:
-            events, extracted = self.event_engine.infer(prev, curr)
-            computed = self.event_engine._compute_values(prev, curr)
+            computed = self.event_engine._compute_values(prev, curr, inventory_changes)
+            events, extracted = self.event_engine.infer(
+                prev, curr, action_result, computed=computed, engine_events=engine_events,
+            )
             return self.event_engine.build_state_diff(prev, curr, events, computed)
         except Exception as e:
             logging.warning(f"Event inference failed, falling back to legacy: {e}")
-            return self._compute_diff_legacy(prev, curr)
+            return self._compute_diff_legacy(prev, curr, inventory_changes)
 
-    def _compute_diff_legacy(self, prev: GameState, curr: GameState) -> StateDiff:
+    def _compute_diff_legacy(self, prev: GameState, curr: GameState,
+                             inventory_changes: List[ItemChange] = None) -> StateDiff:
         changes = {}
         events_inferred = []
         
@@ -202,24 +713,29 @@ class SnapshotManager:
         
         item_obtained = []
         item_used = []
-        prev_items = {item['id']: item.get('count', 1) for item in prev.inventory.items}
-        curr_items = {item['id']: item.get('count', 1) for item in curr.inventory.items}
-        
-        for item_id, count in curr_items.items():
-            if item_id not in prev_items:
-                item_obtained.append(item_id)
-                events_inferred.append('item_obtain')
-            elif count > prev_items[item_id]:
-                item_obtained.append(item_id)
-                events_inferred.append('item_obtain')
-        
-        for item_id, count in prev_items.items():
-            if item_id not in curr_items:
-                item_used.append(item_id)
-                events_inferred.append('item_use')
-            elif count > curr_items.get(item_id, 0):
-                item_used.append(item_id)
-                events_inferred.append('item_use')
+        if inventory_changes is not None:
+            item_obtained, item_used, _ = summarize_item_changes(inventory_changes)
+            events_inferred.extend('item_obtain' for _ in item_obtained)
+            events_inferred.extend('item_use' for _ in item_used)
+        elif curr.inventory.items is not prev.inventory.items:
+            prev_items = {item['id']: item.get('count', 1) for item in prev.inventory.items}
+            curr_items = {item['id']: item.get('count', 1) for item in curr.inventory.items}
+            
+            for item_id, count in curr_items.items():
+                if item_id not in prev_items:
+                    item_obtained.append(item_id)
+                    events_inferred.append('item_obtain')
+                elif count > prev_items[item_id]:
+                    item_obtained.append(item_id)
+                    events_inferred.append('item_obtain')
+            
+            for item_id, count in prev_items.items():
+                if item_id not in curr_items:
+                    item_used.append(item_id)
+                    events_inferred.append('item_use')
+                elif count > curr_items.get(item_id, 0):
+                    item_used.append(item_id)
+                    events_inferred.append('item_use')
         
         scene_changed = curr.ui.current_scene != prev.ui.current_scene
         scene_from = prev.ui.current_scene if scene_changed else None
@@ -286,6 +802,9 @@ class SnapshotManager:
         )
 
     def get_snapshot_at_tick(self, tick: int) -> Optional[GameState]:
+        for state, _ in reversed(self._tentative):
+            if state.tick <= tick:
+                return state
         for metadata in reversed(self._snapshots):
             if metadata.tick <= tick:
                 return self.store.restore_to(metadata.snapshot_id)
@@ -305,12 +824,21 @@ class SnapshotManager:
         self._snapshots.clear()
         self._last_full_tick = 0
         self._incremental_count = 0
+        self._tentative.clear()
+        self._dense_until = -1
+        self._anchors.clear()
+        self._aged_until = 0
+        self._aged_index = 0
+        self._low_hp = False
 
 
 class SnapshotReplayer:
     def __init__(self, snapshot_dir: str):
         self.snapshot_dir = Path(snapshot_dir)
-        self.store = SnapshotStore(snapshot_dir)
+        if (self.snapshot_dir / CompressedSnapshotStore.INDEX_FILE).exists():
+            self.store = CompressedSnapshotStore(snapshot_dir, resume=True)
+        else:
+            self.store = SnapshotStore(snapshot_dir)
 
     def replay(self, snapshot_id: str) -> Optional[GameState]:
         state = self.store.restore_to(snapshot_id)
@@ -0,0 +1,101 @@
+"""
+快照数据库查询工具
+
+示例：
+    python snapshot_query.py output/snapshots.db ticks --agent-type hardcore --max-hp-ratio 0.15 --min-floor 8
+    python snapshot_query.py output/snapshots.db battles --min-turns 20
+    python snapshot_query.py output/snapshots.db events --agent-type casual
+    python snapshot_query.py output/snapshots.db sql "SELECT agent, max(floor) FROM snapshots GROUP BY agent"
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from sqlite_store import SnapshotQuery
+
+
+def print_rows(rows: List[Dict[str, Any]]) -> None:
+    if not rows:
+        print('(无结果)')
+        return
+
+    columns = list(rows[0].keys())
+    widths = [
+        max(len(column), *(len(str(row[column])) for row in rows))
+        for column in columns
+    ]
+    print('  '.join(column.ljust(width) for column, width in zip(columns, widths)))
+    print('  '.join('-' * width for width in widths))
+    for row in rows:
+        print('  '.join(str(row[column]).ljust(width) for column, width in zip(columns, widths)))
+    print(f"\n共 {len(rows)} 行")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CrowdAgents 快照数据库查询')
+    parser.add_argument('db', help='SQLite 快照数据库路径')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ticks = subparsers.add_parser('ticks', help='按条件筛选 tick')
+    ticks.add_argument('--agent', default=None)
+    ticks.add_argument('--agent-type', default=None)
+    ticks.add_argument('--min-floor', type=int, default=None)
+    ticks.add_argument('--max-floor', type=int, default=None)
+    ticks.add_argument('--min-level', type=int, default=None)
+    ticks.add_argument('--max-level', type=int, default=None)
+    ticks.add_argument('--max-hp-ratio', type=float, default=None, help='hp/max_hp 小于该值')
+    ticks.add_argument('--max-hp', type=int, default=None)
+    ticks.add_argument('--scene', default=None)
+    ticks.add_argument('--event', default=None, help='该 tick 发生的事件')
+    ticks.add_argument('--from-tick', type=int, default=None)
+    ticks.add_argument('--to-tick', type=int, default=None)
+    ticks.add_argument('--limit', type=int, default=100)
+
+    battles = subparsers.add_parser('battles', help='按回合数筛选战斗')
+    battles.add_argument('--agent', default=None)
+    battles.add_argument('--agent-type', default=None)
+    battles.add_argument('--min-turns', type=int, default=None, help='回合数大于该值')
+    battles.add_argument('--lost', action='store_true', help='只看失败的战斗')
+    battles.add_argument('--limit', type=int, default=100)
+
+    events = subparsers.add_parser('events', help='各 Agent 事件计数')
+    events.add_argument('--agent-type', default=None)
+
+    sql = subparsers.add_parser('sql', help='执行只读 SQL')
+    sql.add_argument('query')
+
+    args = parser.parse_args()
+    query = SnapshotQuery(args.db)
+
+    if args.command == 'ticks':
+        rows = query.ticks(
+            agent=args.agent, agent_type=args.agent_type,
+            min_floor=args.min_floor, max_floor=args.max_floor,
+            min_level=args.min_level, max_level=args.max_level,
+            max_hp_ratio=args.max_hp_ratio, max_hp=args.max_hp,
+            scene=args.scene, event=args.event,
+            from_tick=args.from_tick, to_tick=args.to_tick,
+            limit=args.limit,
+        )
+    elif args.command == 'battles':
+        rows = query.battles(
+            agent=args.agent, agent_type=args.agent_type,
+            min_turns=args.min_turns, victory=False if args.lost else None,
+            limit=args.limit,
+        )
+    elif args.command == 'events':
+        rows = query.event_counts(agent_type=args.agent_type)
+    else:
+        rows = query.sql(args.query)
+
+    print_rows(rows)
+    query.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""
+后台快照写入器
+tick 循环只负责入队，序列化与落盘由写入线程批量完成
+"""
+
+from typing import Any, Dict, List, Tuple
+from collections import defaultdict
+import logging
+import queue
+import threading
+import time
+
+
+class SnapshotWriter:
+    """
+    有界队列 + 写入线程池
+    队列满时 submit 阻塞（背压），flush 等待所有已入队快照写完
+    """
+
+    def __init__(self, max_queue: int = 1024, workers: int = 1, batch_size: int = 32):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._stats_lock = threading.Lock()
+        self._closed = False
+
+        self.submitted = 0
+        self.written = 0
+        self.errors = 0
+        self.blocked_submits = 0
+        self.max_queue_depth = 0
+        self._queue_depth_sum = 0
+        self._write_latency_total = 0.0
+        self._write_latency_max = 0.0
+        self._queue_latency_total = 0.0
+        self._queue_latency_max = 0.0
+
+        self._threads = [
+            threading.Thread(target=self._run, name=f"SnapshotWriter-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, store: Any, snapshot_id: str, state: Any) -> None:
+        if self._closed:
+            raise RuntimeError("SnapshotWriter is closed")
+
+        depth = self._queue.qsize()
+        self.submitted += 1
+        self._queue_depth_sum += depth
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+
+        item = (store, snapshot_id, state, time.perf_counter())
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.blocked_submits += 1
+            self._queue.put(item)
+
+    def flush(self) -> None:
+        self._queue.join()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            written = self.written
+            return {
+                'submitted': self.submitted,
+                'written': written,
+                'errors': self.errors,
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self.max_queue_depth,
+                'avg_queue_depth': round(self._queue_depth_sum / self.submitted, 2) if self.submitted else 0.0,
+                'blocked_submits': self.blocked_submits,
+                'avg_write_latency_ms': round(self._write_latency_total / written * 1000, 4) if written else 0.0,
+                'max_write_latency_ms': round(self._write_latency_max * 1000, 4),
+                'avg_queue_latency_ms': round(self._queue_latency_total / written * 1000, 4) if written else 0.0,
+                'max_queue_latency_ms': round(self._queue_latency_max * 1000, 4),
+            }
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    self._queue.task_done()
+                    break
+                batch.append(item)
+
+            try:
+                self._write_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write_batch(self, batch: List[Tuple[Any, str, Any, float]]) -> None:
+        by_store: Dict[int, List[Tuple[str, Any]]] = defaultdict(list)
+        stores: Dict[int, Any] = {}
+        enqueued_at: Dict[str, float] = {}
+        for store, snapshot_id, state, submitted_at in batch:
+            by_store[id(store)].append((snapshot_id, state))
+            stores[id(store)] = store
+            enqueued_at[snapshot_id] = submitted_at
+
+        for key, items in by_store.items():
+            start = time.perf_counter()
+            try:
+                stores[key]._persist_batch(items)
+            except Exception as e:
+                logging.error(f"Snapshot write failed: {e}")
+                with self._stats_lock:
+                    self.errors += len(items)
+                continue
+            end = time.perf_counter()
+
+            per_item = (end - start) / len(items)
+            with self._stats_lock:
+                self.written += len(items)
+                self._write_latency_total += end - start
+                self._write_latency_max = max(self._write_latency_max, per_item)
+                for snapshot_id, _ in items:
+                    waited = end - enqueued_at[snapshot_id]
+                    self._queue_latency_total += waited
+                    if waited > self._queue_latency_max:
+                        self._queue_latency_max = waited
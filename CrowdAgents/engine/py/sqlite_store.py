@@ -0,0 +1,365 @@
+"""
+SQLite 快照存储
+快照按 Agent 写入同一个数据库，关键字段单独成列并建索引，
+事件与战斗记录分表存放，方便直接用 SQL 排查数值问题
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+from pathlib import Path
+import sqlite3
+import threading
+
+import orjson
+
+from state import GameState, SnapshotType
+from snapshot import SnapshotStore, SnapshotMetadata
+from snapshot_writer import SnapshotWriter
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id TEXT PRIMARY KEY,
+    agent TEXT NOT NULL,
+    agent_type TEXT,
+    tick INTEGER NOT NULL,
+    timestamp REAL,
+    snapshot_type TEXT,
+    parent_id TEXT,
+    floor INTEGER,
+    level INTEGER,
+    hp INTEGER,
+    max_hp INTEGER,
+    hp_ratio REAL,
+    mp INTEGER,
+    gold INTEGER,
+    exp INTEGER,
+    in_battle INTEGER,
+    monster TEXT,
+    is_boss INTEGER,
+    scene TEXT,
+    state BLOB
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_agent_tick ON snapshots (agent, tick);
+CREATE INDEX IF NOT EXISTS idx_snapshots_agent_type ON snapshots (agent_type, tick);
+CREATE INDEX IF NOT EXISTS idx_snapshots_floor ON snapshots (floor);
+CREATE INDEX IF NOT EXISTS idx_snapshots_level ON snapshots (level);
+CREATE INDEX IF NOT EXISTS idx_snapshots_hp ON snapshots (hp);
+CREATE INDEX IF NOT EXISTS idx_snapshots_hp_ratio ON snapshots (hp_ratio);
+CREATE INDEX IF NOT EXISTS idx_snapshots_scene ON snapshots (scene);
+
+CREATE TABLE IF NOT EXISTS events (
+    snapshot_id TEXT NOT NULL,
+    agent TEXT NOT NULL,
+    agent_type TEXT,
+    tick INTEGER NOT NULL,
+    event TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_event ON events (event, agent_type);
+CREATE INDEX IF NOT EXISTS idx_events_agent_tick ON events (agent, tick);
+
+CREATE TABLE IF NOT EXISTS battles (
+    agent TEXT NOT NULL,
+    agent_type TEXT,
+    start_tick INTEGER NOT NULL,
+    end_tick INTEGER NOT NULL,
+    turns INTEGER NOT NULL,
+    monster TEXT,
+    is_boss INTEGER,
+    floor INTEGER,
+    victory INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_battles_turns ON battles (turns);
+CREATE INDEX IF NOT EXISTS idx_battles_agent ON battles (agent, start_tick);
+"""
+
+INSERT_SNAPSHOT = (
+    "INSERT OR REPLACE INTO snapshots VALUES "
+    "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+INSERT_EVENT = "INSERT INTO events VALUES (?, ?, ?, ?, ?)"
+INSERT_BATTLE = "INSERT INTO battles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+# 数据库文件 -> [连接, 事务锁, 引用数]
+_CONNECTIONS: Dict[Path, List[Any]] = {}
+_CONNECTIONS_LOCK = threading.Lock()
+
+
+def acquire(db_path: Path) -> Tuple[sqlite3.Connection, threading.Lock]:
+    """同一数据库文件的所有 Store 共用一个连接；各 Store 的事务用同一把锁串行"""
+    with _CONNECTIONS_LOCK:
+        entry = _CONNECTIONS.get(db_path)
+        if entry is None:
+            conn = connect(str(db_path))
+            conn.executescript(SCHEMA)
+            entry = _CONNECTIONS[db_path] = [conn, threading.Lock(), 0]
+        entry[2] += 1
+        return entry[0], entry[1]
+
+
+def release(db_path: Path) -> None:
+    """最后一个 Store 关闭时关闭连接"""
+    with _CONNECTIONS_LOCK:
+        entry = _CONNECTIONS.get(db_path)
+        if entry is None:
+            return
+        entry[2] -= 1
+        if entry[2] <= 0:
+            del _CONNECTIONS[db_path]
+            entry[0].close()
+
+
+class SqliteSnapshotStore(SnapshotStore):
+    """
+    每 batch_size 条快照在一个事务里批量插入，同一数据库文件的 Store 共用一个连接。
+    战斗记录由每个 tick 的 in_battle 进出推导（不论该 tick 的快照是否保存），
+    turns 为战斗期间执行的行动数。
+    默认每次打开时清空该 agent 已有的行，避免多次运行写入同一数据库时数据叠加；
+    只读回看时传 resume=True 载入已有快照
+    """
+
+    def __init__(self, db_path: str, agent_id: str = 'default', agent_type: str = None,
+                 batch_size: int = 256, writer: SnapshotWriter = None, resume: bool = False):
+        super().__init__(None, writer)
+        self.db_path = Path(db_path).resolve()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.agent_id = agent_id
+        self.agent_type = agent_type
+        self.batch_size = batch_size
+
+        self._conn, self._db_lock = acquire(self.db_path)
+        self._closed = False
+
+        self._rows: Dict[str, Tuple] = {}
+        self._event_rows: List[Tuple] = []
+        self._battle_rows: List[Tuple] = []
+        self._events: Dict[str, List[str]] = {}
+        self._battle: Optional[Tuple[int, Optional[str], bool, int]] = None
+        self._battle_turns = 0
+
+        if resume:
+            self._load_metadata()
+        else:
+            self.clear()
+
+    def _register(self, state: GameState) -> str:
+        snapshot_id = self._generate_id(state)
+        self._metadata[snapshot_id] = SnapshotMetadata(
+            snapshot_id=snapshot_id,
+            tick=state.tick,
+            timestamp=state.timestamp,
+            snapshot_type=state.snapshot_type,
+            parent_id=state.parent_id,
+            file_path=str(self.db_path),
+        )
+        return snapshot_id
+
+    def _record_events(self, snapshot_id: str, events: List[str]) -> None:
+        self._events[snapshot_id] = events
+
+    def observe(self, state: GameState) -> None:
+        in_battle = state.world.in_battle
+        if self._battle is not None:
+            # 开战之后观察到的每个状态都对应战斗中执行的一次行动
+            self._battle_turns += 1
+        if in_battle and self._battle is None:
+            monster = state.monster
+            self._battle = (
+                state.tick, monster.id if monster else None,
+                bool(monster and monster.is_boss), state.world.floor,
+            )
+            self._battle_turns = 0
+        elif not in_battle and self._battle is not None:
+            start_tick, monster, is_boss, floor = self._battle
+            battle = (
+                self.agent_id, self.agent_type, start_tick, state.tick,
+                self._battle_turns, monster, is_boss, floor, state.player.hp > 0,
+            )
+            with self._write_lock:
+                self._battle_rows.append(battle)
+            self._battle = None
+
+    def _persist(self, snapshot_id: str, state: GameState) -> None:
+        player = state.player
+        monster = state.monster
+        self._rows[snapshot_id] = (
+            snapshot_id, self.agent_id, self.agent_type, state.tick, state.timestamp,
+            state.snapshot_type.value, state.parent_id,
+            state.world.floor, player.level, player.hp, player.max_hp,
+            player.hp / player.max_hp if player.max_hp else 0.0,
+            player.mp, player.gold, player.exp, state.world.in_battle,
+            monster.id if monster else None, bool(monster and monster.is_boss),
+            state.ui.current_scene, orjson.dumps(state.to_dict()),
+        )
+        for event in self._events.pop(snapshot_id, ()):
+            self._event_rows.append((snapshot_id, self.agent_id, self.agent_type, state.tick, event))
+
+        if len(self._rows) >= self.batch_size:
+            self._flush_rows()
+
+    def _flush_rows(self) -> None:
+        if not (self._rows or self._event_rows or self._battle_rows):
+            return
+        with self._db_lock, self._conn:
+            self._conn.executemany(INSERT_SNAPSHOT, self._rows.values())
+            self._conn.executemany(INSERT_EVENT, self._event_rows)
+            self._conn.executemany(INSERT_BATTLE, self._battle_rows)
+        self._rows.clear()
+        self._event_rows.clear()
+        self._battle_rows.clear()
+
+    def restore_to(self, snapshot_id: str) -> Optional[GameState]:
+        state = self._inflight.get(snapshot_id)
+        if state is not None:
+            return state
+
+        with self._write_lock:
+            row = self._rows.get(snapshot_id)
+            if row is not None:
+                data = row[-1]
+            else:
+                with self._db_lock:
+                    result = self._conn.execute(
+                        "SELECT state FROM snapshots WHERE id = ?", (snapshot_id,)
+                    ).fetchone()
+                if result is None:
+                    return None
+                data = result[0]
+        return GameState.from_dict(orjson.loads(data))
+
+    def _discard(self, snapshot_id: str, metadata: SnapshotMetadata) -> None:
+        self._events.pop(snapshot_id, None)
+        if self._rows.pop(snapshot_id, None) is not None:
+            self._event_rows = [row for row in self._event_rows if row[0] != snapshot_id]
+            return
+        with self._db_lock, self._conn:
+            self._conn.execute("DELETE FROM snapshots WHERE id = ?", (snapshot_id,))
+            self._conn.execute("DELETE FROM events WHERE snapshot_id = ?", (snapshot_id,))
+
+    def flush(self) -> None:
+        super().flush()
+        with self._write_lock:
+            self._flush_rows()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        release(self.db_path)
+
+    def clear(self):
+        super().clear()
+        with self._write_lock:
+            self._rows.clear()
+            self._event_rows.clear()
+            self._battle_rows.clear()
+            with self._db_lock, self._conn:
+                for table in ('snapshots', 'events', 'battles'):
+                    self._conn.execute(f"DELETE FROM {table} WHERE agent = ?", (self.agent_id,))
+
+    def _load_metadata(self) -> None:
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT id, tick, timestamp, snapshot_type, parent_id FROM snapshots WHERE agent = ?",
+                (self.agent_id,),
+            ).fetchall()
+        for snapshot_id, tick, timestamp, snapshot_type, parent_id in rows:
+            self._metadata[snapshot_id] = SnapshotMetadata(
+                snapshot_id=snapshot_id,
+                tick=tick,
+                timestamp=timestamp,
+                snapshot_type=SnapshotType(snapshot_type),
+                parent_id=parent_id,
+                file_path=str(self.db_path),
+            )
+
+
+class SnapshotQuery:
+    """只读查询接口，供命令行和分析脚本使用"""
+
+    def __init__(self, db_path: str):
+        self._conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        self._conn.row_factory = sqlite3.Row
+
+    def ticks(self, agent: str = None, agent_type: str = None,
+              min_floor: int = None, max_floor: int = None,
+              min_level: int = None, max_level: int = None,
+              max_hp_ratio: float = None, max_hp: int = None,
+              scene: str = None, event: str = None,
+              from_tick: int = None, to_tick: int = None,
+              limit: int = 100) -> List[Dict[str, Any]]:
+        conditions = []
+        params: List[Any] = []
+        for column, op, value in (
+            ('s.agent', '=', agent),
+            ('s.agent_type', '=', agent_type),
+            ('s.floor', '>=', min_floor),
+            ('s.floor', '<=', max_floor),
+            ('s.level', '>=', min_level),
+            ('s.level', '<=', max_level),
+            ('s.hp_ratio', '<', max_hp_ratio),
+            ('s.hp', '<=', max_hp),
+            ('s.scene', '=', scene),
+            ('s.tick', '>=', from_tick),
+            ('s.tick', '<=', to_tick),
+        ):
+            if value is not None:
+                conditions.append(f"{column} {op} ?")
+                params.append(value)
+        if event is not None:
+            conditions.append("s.id IN (SELECT snapshot_id FROM events WHERE event = ?)")
+            params.append(event)
+
+        sql = (
+            "SELECT s.agent, s.agent_type, s.tick, s.floor, s.level, s.hp, s.max_hp, "
+            "round(s.hp_ratio, 3) AS hp_ratio, s.gold, s.in_battle, s.monster, s.scene FROM snapshots s"
+        )
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY s.agent, s.tick LIMIT ?"
+        params.append(limit)
+        return self.sql(sql, params)
+
+    def battles(self, agent: str = None, agent_type: str = None, min_turns: int = None,
+                victory: bool = None, limit: int = 100) -> List[Dict[str, Any]]:
+        conditions = []
+        params: List[Any] = []
+        for column, op, value in (
+            ('agent', '=', agent),
+            ('agent_type', '=', agent_type),
+            ('turns', '>', min_turns),
+            ('victory', '=', victory),
+        ):
+            if value is not None:
+                conditions.append(f"{column} {op} ?")
+                params.append(value)
+
+        sql = "SELECT * FROM battles"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY turns DESC LIMIT ?"
+        params.append(limit)
+        return self.sql(sql, params)
+
+    def event_counts(self, agent_type: str = None) -> List[Dict[str, Any]]:
+        sql = "SELECT agent, event, count(*) AS count FROM events"
+        params: List[Any] = []
+        if agent_type is not None:
+            sql += " WHERE agent_type = ?"
+            params.append(agent_type)
+        sql += " GROUP BY agent, event ORDER BY agent, count DESC"
+        return self.sql(sql, params)
+
+    def sql(self, sql: str, params: List[Any] = None) -> List[Dict[str, Any]]:
+        return [dict(row) for row in self._conn.execute(sql, params or [])]
+
+    def close(self) -> None:
+        self._conn.close()
@@ -3,11 +3,14 @@
 定义游戏状态快照的核心数据结构
 """
 
-from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Any
+from dataclasses import dataclass, field, fields, replace, MISSING
+from typing import Dict, Iterable, List, Optional, Any, Tuple
+from collections import Counter
 from enum import Enum
 import time
 
+from event_flags import event_mask
+
 
 class SnapshotType(Enum):
     FULL = "full"
@@ -38,6 +41,12 @@ class PlayerState:
     max_stamina: int = 100
     buffs: List[Dict[str, Any]] = field(default_factory=list)
     debuffs: List[Dict[str, Any]] = field(default_factory=list)
+    # 计入装备与增益/减益后的属性，由 PlayerModule 缓存计算
+    total_atk: int = 0
+    total_def: int = 0
+    total_crit_rate: float = 0.0
+    total_dodge_rate: float = 0.0
+    total_max_hp: int = 0
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -62,6 +71,11 @@ class PlayerState:
             'max_stamina': self.max_stamina,
             'buffs': self.buffs,
             'debuffs': self.debuffs,
+            'total_atk': self.total_atk,
+            'total_def': self.total_def,
+            'total_crit_rate': self.total_crit_rate,
+            'total_dodge_rate': self.total_dodge_rate,
+            'total_max_hp': self.total_max_hp,
         }
 
     @classmethod
@@ -88,6 +102,11 @@ class PlayerState:
             max_stamina=data.get('max_stamina', 100),
             buffs=data.get('buffs', []),
             debuffs=data.get('debuffs', []),
+            total_atk=data.get('total_atk', data['atk']),
+            total_def=data.get('total_def', data.get('defense', data.get('def', 0))),
+            total_crit_rate=data.get('total_crit_rate', data.get('crit_rate', 0.1)),
+            total_dodge_rate=data.get('total_dodge_rate', data.get('dodge_rate', 0.05)),
+            total_max_hp=data.get('total_max_hp', data['max_hp']),
         )
 
 
@@ -160,6 +179,15 @@ class CharacterState:
             'last_login_date': self.last_login_date,
         }
 
+    def copy(self) -> 'CharacterState':
+        return replace(
+            self,
+            skill_tree=dict(self.skill_tree),
+            achievements=list(self.achievements),
+            unlocked_features=list(self.unlocked_features),
+            story_progress=dict(self.story_progress),
+        )
+
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'CharacterState':
         return cls(
@@ -204,6 +232,14 @@ class UIState:
             'last_action_time': self.last_action_time,
         }
 
+    def copy(self) -> 'UIState':
+        return replace(
+            self,
+            dialog_options=list(self.dialog_options),
+            selected_options=list(self.selected_options),
+            notifications=list(self.notifications),
+        )
+
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'UIState':
         return cls(
@@ -239,6 +275,29 @@ class InventoryState:
         )
 
 
+@dataclass
+class ItemChange:
+    """背包变动日志中的一条：delta 为实际增减的数量，stack_delta 为新开(+1)或清空(-1)的格子"""
+    item_id: str
+    delta: int
+    stack_delta: int = 0
+    source: str = ''
+
+
+def summarize_item_changes(changes: List[ItemChange]) -> Tuple[List[str], List[str], int]:
+    """按变动日志汇总 (获得的物品, 消耗的物品, 格子数变化)，同一 tick 内先得后用的物品两边都会出现"""
+    obtained: Dict[str, None] = {}
+    used: Dict[str, None] = {}
+    stacks = 0
+    for change in changes:
+        if change.delta > 0:
+            obtained[change.item_id] = None
+        elif change.delta < 0:
+            used[change.item_id] = None
+        stacks += change.stack_delta
+    return list(obtained), list(used), stacks
+
+
 @dataclass
 class WorldState:
     floor: int
@@ -445,6 +504,10 @@ class StateDiff:
     story_progress_updated: bool = False
     playtime_delta_ms: int = 0
 
+    def __post_init__(self):
+        # events_inferred 的 EventFlag 位掩码，构建时算一次
+        self.event_mask = event_mask(self.events_inferred)
+
     def to_dict(self) -> Dict[str, Any]:
         return {
             'tick_from': self.tick_from,
@@ -473,3 +536,71 @@ class StateDiff:
             'story_progress_updated': self.story_progress_updated,
             'playtime_delta_ms': self.playtime_delta_ms,
         }
+
+
+class _LazyDiffField:
+    """
+    非数据描述符：首次访问时从 changes 取值并写入实例字典，之后的访问直接命中实例属性，
+    不再经过描述符；每个字段在每个 diff 上只计一次
+    """
+
+    def __init__(self, name: str, default: Any, factory: Any):
+        self.name = name
+        self.default = default
+        self.factory = factory
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        changes = obj.changes
+        if self.name in changes:
+            value = changes[self.name]
+        elif self.factory is not MISSING:
+            value = self.factory()
+        else:
+            value = self.default
+        obj.__dict__[self.name] = value
+        if obj._touched is not None:
+            obj._touched[self.name] += 1
+        return value
+
+
+class LazyStateDiff(StateDiff):
+    """
+    事件推断路径使用的 StateDiff：tick 区间、changes 与事件列表立即可用，
+    其余字段在首次访问时才从 changes 取出。touched 记录各字段被读取的次数
+    """
+
+    def __init__(self, tick_from: int, tick_to: int, changes: Dict[str, Any],
+                 events_inferred: List[str], touched: Counter = None):
+        self.tick_from = tick_from
+        self.tick_to = tick_to
+        self.changes = changes
+        self.events_inferred = events_inferred
+        self.event_mask = event_mask(events_inferred)
+        self._touched = touched
+
+    def reuse(self, tick_from: int, tick_to: int, changes: Dict[str, Any],
+              events: Iterable[str] = ()) -> 'LazyStateDiff':
+        """换成新的 tick 区间、changes 与事件：丢弃已取出的字段，events_inferred 原地替换"""
+        events_inferred, touched = self.events_inferred, self._touched
+        self.__dict__.clear()
+        events_inferred.clear()
+        events_inferred.extend(events)
+        self.__init__(tick_from, tick_to, changes, events_inferred, touched)
+        return self
+
+
+# LazyStateDiff 中延迟取值的字段；tick 区间、changes 与 events_inferred 在构建时给出
+LAZY_DIFF_FIELDS = (
+    'hp_delta', 'gold_delta', 'exp_delta', 'floor_changed', 'battle_started', 'battle_ended',
+    'level_up', 'item_obtained', 'item_used', 'monster_killed', 'player_died',
+    'scene_changed', 'scene_from', 'scene_to', 'dialog_opened', 'dialog_closed',
+    'tutorial_advanced', 'achievement_unlocked', 'feature_unlocked', 'story_progress_updated',
+    'playtime_delta_ms',
+)
+
+_DIFF_FIELDS = {f.name: f for f in fields(StateDiff)}
+for _name in LAZY_DIFF_FIELDS:
+    _f = _DIFF_FIELDS[_name]
+    setattr(LazyStateDiff, _name, _LazyDiffField(_name, _f.default, _f.default_factory))
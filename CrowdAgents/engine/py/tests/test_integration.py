@@ -6,12 +6,17 @@
 import pytest
 import sys
 import json
+import random
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from config import ConfigLoader
-from simulator import Simulator, run_simulation
+from simulator import Simulator, run_simulation, EXPECTATION_CHECK_KEY
+from agents.base import SCORING_VARIABLES
+from scoring import ScoringVariables, EXPECTATIONS
+from sqlite_store import SnapshotQuery
+from timetravel import TimeTravel
 
 
 class TestIntegration:
@@ -112,6 +117,137 @@ class TestIntegration:
         assert 'meta' in report
         assert 'agents' in report
 
+    def test_retired_agents_are_marked_in_report(self):
+        report = run_simulation(duration_ms=100000, seed=3, retire_converged=True, convergence_window=100)
+        
+        retired = report['meta']['retiredAt']
+        assert retired
+        for agent_report in report['agents']:
+            assert agent_report['retiredAtTick'] == retired.get(agent_report['id'])
+        assert 'retiredAtTick' not in run_simulation(duration_ms=5000, seed=3)['agents'][0]
+
+    def test_hybrid_events_simulation(self):
+        report = run_simulation(duration_ms=5000, seed=42, hybrid_events=True)
+
+        stats = report['meta']['ruleEvaluation']
+        assert stats['hybrid']
+        assert stats['trusted'] > 0
+        assert stats['ticks'] > 0
+
+    
+    def test_time_travel_reproduces_snapshots(self, tmp_path):
+        loader = ConfigLoader()
+        
+        game_config = loader.load_game_config()
+        simulation_config = loader.load_simulation_config()
+        evaluation_config = loader.load_evaluation_config()
+        
+        simulation_config.max_ticks = 120
+        simulation_config.random_seed = 7
+        simulation_config.action_log_dir = str(tmp_path)
+        simulation_config.keyframe_interval = 25
+        
+        simulator = Simulator(simulation_config, game_config, evaluation_config)
+        report = simulator.run()
+        
+        instance = simulator.instances[0]
+        travel = TimeTravel.from_dir(game_config, str(tmp_path / instance.agent.id))
+        assert report['meta']['actionLog'][instance.agent.id]['keyframes'] == len(travel.log.keyframes)
+        
+        manager = instance.snapshot_manager
+        for metadata in manager._snapshots[::7] + manager._snapshots[3:1:-1]:
+            expected = manager.store.restore_to(metadata.snapshot_id)
+            actual = travel.state_at(metadata.tick)
+            
+            assert actual.tick == expected.tick
+            assert actual.player.to_dict() == expected.player.to_dict()
+            assert actual.world.to_dict() == expected.world.to_dict()
+            assert actual.inventory.to_dict() == expected.inventory.to_dict()
+            assert actual.character.to_dict() == expected.character.to_dict()
+            assert (actual.monster and actual.monster.to_dict()) == (expected.monster and expected.monster.to_dict())
+
+    def test_rerun_replaces_snapshot_db(self, tmp_path):
+        loader = ConfigLoader()
+        
+        game_config = loader.load_game_config()
+        simulation_config = loader.load_simulation_config()
+        evaluation_config = loader.load_evaluation_config()
+        
+        simulation_config.max_ticks = 100
+        simulation_config.random_seed = 7
+        simulation_config.snapshot_db = str(tmp_path / 'snapshots.db')
+        
+        for _ in range(2):
+            simulator = Simulator(simulation_config, game_config, evaluation_config)
+            simulator.run()
+        
+        query = SnapshotQuery(simulation_config.snapshot_db)
+        try:
+            for instance in simulator.instances:
+                agent = instance.agent.id
+                rows = query.sql("SELECT tick FROM snapshots WHERE agent = ?", [agent])
+                ticks = [row['tick'] for row in rows]
+                assert len(ticks) == len(set(ticks))
+                assert len(ticks) == len(instance.snapshot_manager.store.list_snapshots())
+        finally:
+            query.close()
+    
+    def test_rerun_replaces_snapshot_dir(self, tmp_path):
+        loader = ConfigLoader()
+        
+        game_config = loader.load_game_config()
+        simulation_config = loader.load_simulation_config()
+        evaluation_config = loader.load_evaluation_config()
+        
+        simulation_config.max_ticks = 100
+        simulation_config.random_seed = 7
+        simulation_config.snapshot_dir = str(tmp_path)
+        simulation_config.snapshot_codec = 'zlib'
+        
+        for _ in range(2):
+            simulator = Simulator(simulation_config, game_config, evaluation_config)
+            simulator.run()
+        
+        for instance in simulator.instances:
+            index = json.loads((tmp_path / instance.agent.id / 'index.json').read_text())
+            ticks = [m['tick'] for m in index['metadata']]
+            assert len(ticks) == len(set(ticks))
+            assert len(ticks) == len(instance.snapshot_manager._snapshots)
+            assert len(index['records']) == len(ticks)
+
+    def test_expectation_checks_match_per_tick_evaluation(self):
+        class PerTickSimulator(Simulator):
+            """每个 tick 都对 expectations 条件求值，tick 为 50 的倍数时求值两次"""
+            def __init__(self, *args):
+                super().__init__(*args)
+                self._expectation_timers.cancel(EXPECTATION_CHECK_KEY)
+            
+            def _observe(self, instance, prev_state, curr_state, diff):
+                agent = instance.agent
+                agent.analyze_state_change(prev_state, curr_state, diff)
+                for _ in range(2 if self.tick % 50 == 0 else 1):
+                    variables = ScoringVariables(SCORING_VARIABLES, agent, None, None)
+                    for factor in agent._scoring.fired((EXPECTATIONS,), variables):
+                        agent._adjust_score(factor.dimension, factor.delta, factor.factor_id)
+        
+        loader = ConfigLoader()
+        
+        game_config = loader.load_game_config()
+        simulation_config = loader.load_simulation_config()
+        evaluation_config = loader.load_evaluation_config()
+        
+        simulation_config.max_ticks = 300
+        simulation_config.random_seed = 11
+        
+        scores = []
+        for simulator_class in (PerTickSimulator, Simulator):
+            random.seed(11)
+            simulator = simulator_class(simulation_config, game_config, evaluation_config)
+            report = simulator.run()
+            scores.append([agent['dimension_scores'] for agent in report['agents']])
+        
+        assert scores[0] == scores[1]
+
 
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
@@ -3,17 +3,37 @@
 测试核心组件的功能
 """
 
+import json
+import os
+from dataclasses import fields
 import pytest
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from state import GameState, PlayerState, MonsterState, InventoryState, WorldState, StateDiff, SnapshotType
-from snapshot import SnapshotManager, SnapshotStore
-from modules.base import Action, ActionType
+from state import (
+    GameState, PlayerState, MonsterState, InventoryState, WorldState, StateDiff, SnapshotType, LAZY_DIFF_FIELDS,
+)
+from snapshot import SnapshotManager, SnapshotStore, CompressedSnapshotStore, RetentionPolicy, SnapshotStrategy
+from codec import CODECS, get_codec
+from snapshot_writer import SnapshotWriter
+from sqlite_store import SqliteSnapshotStore, SnapshotQuery
+from expression import ExpressionEvaluator, ExpressionCompiler, EvaluationContext, VectorizedCompiler, BatchContext
+from event_inference import (
+    EventInferenceEngine, RuleSetRegistry, BatchInferenceEngine, RuleProfiler,
+    engine_event_ids, action_result_view,
+)
+from modules.base import Action, ActionResult, ActionType, GameModule, ModularGameEngine
 from engine import GameEngine
-from agents.base import AgentBase
+from timetravel import ActionLog, TimeTravel
+from agents.base import AgentBase, DIMENSIONS, EVENT_LOG_CAPACITY
+from scoring import ScoringKernel, ScoringVariables
+from timer_wheel import TimerWheel
+from interning import EntityRegistry
+from event_flags import EventFlag, event_mask, event_names
+from event_log import EventLog
+from modules.combat import Monster
 from config import GameConfig
 
 
@@ -120,6 +140,416 @@ class TestSnapshotManager:
         assert diff.battle_started == True
         assert 'player_damaged' in diff.events_inferred
 
+    def test_diff_is_computed_once_and_lazily(self, monkeypatch):
+        manager = SnapshotManager()
+        engine = manager.event_engine
+        calls = []
+        compute = engine._compute_values
+        monkeypatch.setattr(engine, '_compute_values', lambda *args: calls.append(1) or compute(*args))
+
+        diff = manager.compute_diff(make_state(1), make_state(2, hp=70))
+
+        assert len(calls) == 1
+        assert engine.diff_stats()['fieldsTouched'] == 0
+        assert diff.hp_delta == -30
+        assert diff.hp_delta == -30
+        assert diff.item_obtained == []
+        stats = engine.diff_stats()
+        assert stats['diffs'] == 1
+        assert stats['touches'] == {'hp_delta': 1, 'item_obtained': 1}
+
+    def test_lazy_fields_cover_state_diff(self):
+        eager = {'tick_from', 'tick_to', 'changes', 'events_inferred'}
+        assert set(LAZY_DIFF_FIELDS) == {f.name for f in fields(StateDiff)} - eager
+
+
+def make_state(tick: int, hp: int = 100, in_battle: bool = False) -> GameState:
+    return GameState(
+        tick=tick, timestamp=1000.0 + tick,
+        player=PlayerState(
+            hp=hp, max_hp=100, mp=50, max_mp=50,
+            level=1, exp=0, max_exp=100,
+            atk=10, defense=5, gold=0,
+            crit_rate=0.1, dodge_rate=0.05,
+        ),
+        monster=None,
+        inventory=InventoryState(slots=20, items=[{'id': 'potion', 'count': 1}]),
+        world=WorldState(
+            floor=1, killed_on_floor=0, monsters_to_advance=3,
+            can_advance=False, in_battle=in_battle,
+        ),
+    )
+
+
+class TestCompressedSnapshotStore:
+    def test_roundtrip_across_blocks(self, tmp_path):
+        store = CompressedSnapshotStore(str(tmp_path), get_codec('zlib'), block_size=4)
+        ids = [store.save(make_state(t, hp=100 - t)) for t in range(10)]
+        
+        assert store.stats()['blocks'] == 2
+        assert store.restore_to(ids[1]).player.hp == 99
+        assert store.restore_to(ids[9]).player.hp == 91
+        
+        store.flush()
+        assert store.stats()['blocks'] == 3
+        assert store.stats()['ratio'] > 1
+    
+    def test_reopen_from_index(self, tmp_path):
+        store = CompressedSnapshotStore(str(tmp_path), get_codec('lzma'), block_size=3)
+        ids = [store.save(make_state(t, hp=50 + t)) for t in range(7)]
+        store.close()
+        
+        reopened = CompressedSnapshotStore(str(tmp_path), resume=True)
+        
+        assert reopened.codec.name == 'lzma'
+        assert [m.tick for m in reopened.list_snapshots()] == list(range(7))
+        assert reopened.restore_to(ids[5]).player.hp == 55
+        
+        fresh = CompressedSnapshotStore(str(tmp_path), get_codec('zlib'), block_size=3)
+        fresh.save(make_state(0))
+        fresh.close()
+        assert len(CompressedSnapshotStore(str(tmp_path), resume=True).list_snapshots()) == 1
+        assert sorted(p.name for p in tmp_path.glob('segment_*.bin')) == ['segment_00000.bin']
+
+    @pytest.mark.skipif('zstd' not in CODECS, reason='zstandard is not installed')
+    def test_replaces_stale_dictionary(self, tmp_path):
+        (tmp_path / 'dictionary.bin').write_bytes(b'stale')
+        store = CompressedSnapshotStore(str(tmp_path), get_codec('zstd', dict_size=2048), block_size=8,
+                                        training_samples=64)
+        ids = [store.save(make_state(t, hp=t % 100)) for t in range(80)]
+        store.close()
+        assert (tmp_path / 'dictionary.bin').read_bytes() == store.codec.get_dictionary()
+
+        reopened = CompressedSnapshotStore(str(tmp_path), resume=True)
+        assert reopened.restore_to(ids[70]).player.hp == 70
+
+        (tmp_path / 'dictionary.bin').write_bytes(b'stale')
+        with pytest.raises(ValueError):
+            CompressedSnapshotStore(str(tmp_path), resume=True)
+
+
+class TestSnapshotWriter:
+    def test_background_write_and_flush(self, tmp_path):
+        writer = SnapshotWriter(max_queue=2, workers=2, batch_size=3)
+        store = CompressedSnapshotStore(str(tmp_path), get_codec('zlib'), block_size=4, writer=writer)
+        
+        ids = [store.save(make_state(t, hp=100 - t)) for t in range(20)]
+        assert store.restore_to(ids[19]).player.hp == 81
+        
+        store.close()
+        writer.close()
+        
+        stats = writer.stats()
+        assert stats['written'] == 20
+        assert stats['queue_depth'] == 0
+        assert stats['max_queue_depth'] <= 2
+        assert CompressedSnapshotStore(str(tmp_path), resume=True).restore_to(ids[3]).player.hp == 97
+
+
+class TestSqliteSnapshotStore:
+    def test_indexed_queries(self, tmp_path):
+        db_path = str(tmp_path / 'snapshots.db')
+        store = SqliteSnapshotStore(db_path, 'hardcore_01', 'hardcore', batch_size=8)
+        
+        ids = []
+        for tick in range(30):
+            in_battle = 5 <= tick < 28
+            events = ['player_death'] if tick == 12 else []
+            state = make_state(tick, hp=100 - tick * 3, in_battle=in_battle)
+            store.observe(state)
+            ids.append(store.save(state, events))
+        assert store.restore_to(ids[29]).player.hp == 13
+        store.close()
+        
+        query = SnapshotQuery(db_path)
+        low_hp = query.ticks(agent_type='hardcore', max_hp_ratio=0.15, min_floor=1)
+        assert [row['tick'] for row in low_hp] == [29]
+        assert [row['tick'] for row in query.ticks(event='player_death')] == [12]
+        
+        battles = query.battles(min_turns=20)
+        assert len(battles) == 1
+        assert (battles[0]['start_tick'], battles[0]['turns']) == (5, 23)
+        query.close()
+        
+        reopened = SqliteSnapshotStore(db_path, 'hardcore_01', resume=True)
+        assert len(reopened.list_snapshots()) == 30
+        assert reopened.restore_to(ids[3]).player.hp == 91
+        reopened.close()
+
+    def test_battles_between_saved_snapshots_share_connection(self, tmp_path):
+        db_path = str(tmp_path / 'snapshots.db')
+        stores = [SqliteSnapshotStore(db_path, f'casual_0{i}', 'casual') for i in range(2)]
+        assert stores[0]._conn is stores[1]._conn
+
+        for tick in range(30):
+            state = make_state(tick, in_battle=12 <= tick < 15 or 21 <= tick < 23)
+            stores[0].observe(state)
+            if tick % 10 == 0:
+                stores[0].save(state)
+        for store in stores:
+            store.close()
+
+        query = SnapshotQuery(db_path)
+        battles = query.sql("SELECT start_tick, end_tick, turns FROM battles ORDER BY start_tick")
+        assert [tuple(b.values()) for b in battles] == [(12, 15, 3), (21, 23, 2)]
+        query.close()
+
+
+class TestRetentionPolicy:
+    def test_dense_around_events_and_decimated_elsewhere(self):
+        policy = RetentionPolicy(interest_window=5, decimation=10, age_after=10000)
+        manager = SnapshotManager(retention=policy)
+        
+        for tick in range(1, 101):
+            events = ['level_up'] if tick == 50 else []
+            manager.create_snapshot(tick, make_state(tick), events)
+        manager.finalize()
+        
+        ticks = [m.tick for m in manager._snapshots]
+        assert ticks == [10, 20, 30, 40, 45, 46, 47, 48, 49, 50,
+                         51, 52, 53, 54, 55, 60, 70, 80, 90, 100]
+        assert manager.retention_stats['dropped'] == 80
+        assert manager.get_snapshot_at_tick(58).tick == 55
+    
+    def test_low_hp_is_interesting(self):
+        policy = RetentionPolicy(low_hp_ratio=0.2)
+        
+        assert policy.is_interesting(make_state(1, hp=15), [])
+        assert not policy.is_interesting(make_state(2, hp=12), [], was_low_hp=True)
+        assert not policy.is_interesting(make_state(1, hp=60), [])
+    
+    def test_aging_compacts_store(self, tmp_path):
+        policy = RetentionPolicy(interest_window=0, decimation=2, age_after=20, aged_decimation=10)
+        store = CompressedSnapshotStore(str(tmp_path), get_codec('zlib'), block_size=4)
+        manager = SnapshotManager(store, retention=policy)
+        
+        for tick in range(1, 41):
+            events = ['player_death'] if tick == 7 else []
+            manager.create_snapshot(tick, make_state(tick), events)
+        store.close()
+        
+        ticks = [m.tick for m in manager._snapshots]
+        assert ticks[:3] == [7, 10, 20]
+        assert manager.retention_stats['aged_out'] > 0
+        assert [m.tick for m in manager._snapshots[:manager._aged_index]] == [7, 10]
+        assert not manager._anchors
+        
+        reopened = CompressedSnapshotStore(str(tmp_path), resume=True)
+        assert [m.tick for m in reopened.list_snapshots()] == ticks
+        assert reopened.stats()['dead_records'] == 0
+
+
+class TestExpressionCompiler:
+    def make_context(self, events=None, action_result=None):
+        prev = make_state(1, hp=80)
+        curr = make_state(2, hp=10, in_battle=True)
+        computed = EventInferenceEngine()._compute_values(prev, curr)
+        return EvaluationContext(prev=prev, curr=curr, computed=computed,
+                                 events=events or [], action_result=action_result)
+    
+    def test_matches_interpreter_on_rules(self):
+        evaluator = ExpressionEvaluator()
+        compiler = ExpressionCompiler()
+        rules = EventInferenceEngine().loader.get_all_rules()
+        expressions = [r.condition for r in rules] + [f for r in rules for f in r.data_extract]
+        
+        for context in (self.make_context(),
+                        self.make_context(['battle_end', 'level_up'], {'critical': True, 'success': False})):
+            for expr in expressions:
+                assert compiler.evaluate(expr, context) == evaluator.evaluate(expr, context), expr
+    
+    def test_null_and_arithmetic_semantics(self):
+        compiler = ExpressionCompiler()
+        context = self.make_context()
+        
+        assert compiler.evaluate('curr.monster.hp > 0', context) is False
+        assert compiler.evaluate('prev.monster == null', context) is True
+        assert compiler.evaluate('curr.player.hp / 0', context) == 0
+        assert compiler.evaluate('10 - 4 - 3', context) == 9
+        assert compiler.evaluate('len(curr.inventory.items) + missing', context) == 1
+    
+    def test_compiled_form_is_cached(self):
+        assert ExpressionCompiler().compile('hp_delta < 0') is ExpressionCompiler().compile('hp_delta < 0')
+
+
+class TestRuleGraph:
+    def test_referenced_events_are_ordered_first(self):
+        graph = EventInferenceEngine().graph
+        order = [node.rule.event_id for node in graph.order]
+
+        assert order.index('battle_end') < order.index('monster_killed')
+        assert order.index('quest_fail') < order.index('quest_abandon')
+        assert graph.nodes['monster_killed'].inputs == {'monster', 'world.in_battle'}
+        assert graph.nodes['player_death'].skippable
+        assert not graph.nodes['hp_critical'].skippable
+        assert not graph.nodes['skill_used'].skippable
+
+    def test_short_circuit_matches_full_evaluation(self):
+        full = EventInferenceEngine(short_circuit=False)
+        fast = EventInferenceEngine()
+
+        killed = make_state(2, hp=90)
+        battle = make_state(1, hp=95, in_battle=True)
+        battle.monster = MonsterState(id='slime', name='Slime', hp=0, max_hp=20, atk=3, defense=1,
+                                      crit_rate=0.0, dodge_rate=0.0)
+        pairs = [
+            (make_state(1), make_state(2)),
+            (make_state(1), make_state(2, hp=0)),
+            (make_state(1, hp=10), make_state(2, hp=40)),
+            (make_state(1), make_state(2, in_battle=True)),
+            (battle, killed),
+        ]
+        for prev, curr in pairs:
+            for action_result in (None, {'success': True, 'critical': True}):
+                expected, expected_data = full.infer(prev, curr, action_result)
+                events, data = fast.infer(prev, curr, action_result)
+                assert [e.event_id for e in events] == [e.event_id for e in expected]
+                assert data == expected_data
+
+        assert 'monster_killed' in [e.event_id for e in fast.infer(battle, killed)[0]]
+
+    def test_idle_tick_skips_most_rules(self):
+        engine = EventInferenceEngine()
+        engine.infer(make_state(1), make_state(2))
+
+        stats = engine.rule_stats
+        assert stats['ticks'] == 1
+        assert stats['skipped'] > stats['evaluated']
+        assert stats['skipped'] + stats['evaluated'] == len(engine.graph.order)
+
+
+class TestHybridEvents:
+    def test_engine_events_map_to_rule_ids(self):
+        events = ['player_attack', 'critical_hit', 'monster_killed', 'battle_end', 'player_death', 'player_death']
+        assert engine_event_ids(events) == ['critical_hit_dealt', 'monster_killed', 'player_death']
+
+        failed = ActionResult(success=False, action_type=ActionType.FORGE, message="Not enough materials")
+        assert engine_event_ids([], failed) == ['forge_fail']
+
+    def test_action_result_view(self):
+        result = ActionResult(
+            success=True, action_type=ActionType.ATTACK,
+            data={'damage': 12, 'is_critical': True, 'enemy_attack': {'damage': 0, 'dodged': True}},
+        )
+        view = action_result_view(result)
+
+        assert view['critical'] and view['dodged'] and not view['enemy_critical']
+        assert view['damage'] == 12 and view['damage_taken'] == 0
+        assert view['action_type'] == 'attack'
+        assert action_result_view(None) is None
+
+    def test_trusted_rules_come_from_engine(self):
+        engine = EventInferenceEngine()
+        prev, curr = make_state(1), make_state(2, in_battle=True)
+        view = {'success': True, 'critical': False, 'enemy_critical': True, 'dodged': False}
+
+        inferred = [e.event_id for e in engine.infer(prev, curr)[0]]
+        assert 'battle_start' in inferred and 'skill_used' in inferred
+
+        silent = [e.event_id for e in engine.infer(prev, curr, view, engine_events=[])[0]]
+        assert 'battle_start' not in silent and 'skill_used' not in silent
+        assert 'critical_hit_received' in silent
+
+        reported = [e.event_id for e in engine.infer(prev, curr, view, engine_events=['battle_start'])[0]]
+        assert 'battle_start' in reported
+        assert engine.rule_stats['trusted'] > 0
+
+    def test_batch_matches_scalar_hybrid(self):
+        engine = EventInferenceEngine()
+        batch = BatchInferenceEngine()
+        prevs = [make_state(1), make_state(1, hp=10), make_state(1)]
+        currs = [make_state(2, in_battle=True), make_state(2, hp=40), make_state(2, hp=0)]
+        views = [{'success': True, 'critical': True}, None, {'success': True, 'enemy_critical': True}]
+        engine_events = [['battle_start', 'critical_hit_dealt'], ['level_up'], ['player_death']]
+
+        results = batch.infer_batch(prevs, currs, views, engine_events=engine_events)
+        for prev, curr, view, ids, (events, data) in zip(prevs, currs, views, engine_events, results):
+            expected, expected_data = engine.infer(prev, curr, view, engine_events=ids)
+            assert [e.event_id for e in events] == [e.event_id for e in expected]
+            assert data == expected_data
+        assert batch.stats['trusted'] > 0
+
+
+class TestBatchInference:
+    def make_batch(self):
+        battle = make_state(1, hp=95, in_battle=True)
+        battle.monster = MonsterState(id='slime', name='Slime', hp=0, max_hp=20, atk=3, defense=1,
+                                      crit_rate=0.0, dodge_rate=0.0)
+        battle.ui.tutorial_step = 2
+        curr = make_state(2, hp=0)
+        curr.ui.tutorial_step = None
+        return [
+            (make_state(1), make_state(2)),
+            (make_state(1), curr),
+            (make_state(1, hp=10), make_state(2, hp=40)),
+            (make_state(1), make_state(2, in_battle=True)),
+            (battle, make_state(2, hp=90)),
+        ]
+
+    def test_matches_per_agent_inference(self):
+        pairs = self.make_batch()
+        prevs = [prev for prev, _ in pairs]
+        currs = [curr for _, curr in pairs]
+        action_results = [None, {'success': True}, None, {'critical': True, 'dodged': True}, None]
+        scalar = EventInferenceEngine(short_circuit=False)
+        batch = BatchInferenceEngine()
+
+        results = batch.infer_batch(prevs, currs, action_results)
+
+        for (prev, curr), action_result, (events, data) in zip(pairs, action_results, results):
+            expected, expected_data = scalar.infer(prev, curr, action_result)
+            assert [e.event_id for e in events] == [e.event_id for e in expected]
+            assert data == expected_data
+        assert 'monster_killed' in [e.event_id for e in results[4][0]]
+        assert batch.stats['agents'] == 5
+
+    def test_null_semantics_match_scalar(self):
+        pairs = self.make_batch()
+        compiler = VectorizedCompiler()
+        context = BatchContext(
+            prevs=[prev for prev, _ in pairs], currs=[curr for _, curr in pairs],
+            computed=[{} for _ in pairs],
+        )
+
+        assert compiler.compile_condition('curr.monster.hp > 0')(context).tolist() == [False] * 5
+        assert compiler.compile('prev.monster == null')(context).tolist() == [True] * 4 + [False]
+        assert compiler.compile('prev.ui.tutorial_step > 1')(context).tolist() == [False] * 4 + [True]
+        assert compiler.compile('curr.player.hp / 0')(context).tolist() == [0] * 5
+
+
+class TestRuleSetRegistry:
+    def write_rules(self, path, event_id, condition):
+        rules = {'state_change_events': {'combat': {event_id: {'condition': condition, 'priority': 1}}}}
+        path.write_text(json.dumps(rules))
+
+    def test_engines_share_compiled_rules(self):
+        assert EventInferenceEngine().rule_set is SnapshotManager().event_engine.rule_set
+
+    def test_reloads_when_file_changes(self, tmp_path):
+        path = tmp_path / 'event_rules.json'
+        self.write_rules(path, 'hurt', 'hp_delta < 0')
+        registry = RuleSetRegistry(check_interval=0)
+        engine = EventInferenceEngine(str(path), registry=registry)
+        other = EventInferenceEngine(str(path), registry=registry)
+        prev, curr = make_state(1), make_state(2, hp=50)
+
+        assert [e.event_id for e in engine.infer(prev, curr)[0]] == ['hurt']
+
+        self.write_rules(path, 'wounded', 'curr.player.hp < 60')
+        mtime = path.stat().st_mtime_ns + 1_000_000_000
+        os.utime(path, ns=(mtime, mtime))
+
+        assert [e.event_id for e in engine.infer(prev, curr)[0]] == ['wounded']
+        assert other.infer(prev, curr)[0][0].event_id == 'wounded'
+        assert engine.rule_set is other.rule_set
+
+        path.write_text('{broken')
+        os.utime(path, ns=(mtime + 1_000_000_000, mtime + 1_000_000_000))
+        assert [e.event_id for e in engine.infer(prev, curr)[0]] == ['wounded']
+
+        path.unlink()
+        assert [e.event_id for e in engine.infer(prev, curr)[0]] == ['wounded']
+
 
 class TestAction:
     def test_action_creation(self):
@@ -174,6 +604,594 @@ class TestAgentBase:
         assert 'dimension_scores' in report
         assert 'overall_score' in report
 
+    def test_event_log_keeps_recent_and_spills_all(self, tmp_path):
+        agent = AgentBase({'id': 'test_01', 'name': 'Test Agent', 'type': 'casual'})
+        path = tmp_path / 'test_01' / EventLog.SPILL_FILE
+        agent.event_log.spill_to(str(path))
+        for level in range(EVENT_LOG_CAPACITY + 20):
+            agent._log_event('levelUp', {'new_level': level})
+        agent.event_log.close()
+
+        assert len(agent.event_log) == EVENT_LOG_CAPACITY and agent.event_log.total == EVENT_LOG_CAPACITY + 20
+        assert agent.event_log.recent(1)[0]['data'] == {'new_level': EVENT_LOG_CAPACITY + 19}
+        assert len(EventLog.load(str(path))) == EVENT_LOG_CAPACITY + 20
+
+        rerun = EventLog(spill_path=str(path))
+        rerun.append({'event': 'levelUp'})
+        rerun.close()
+        assert EventLog.load(str(path)) == [{'event': 'levelUp'}]
+
+    def test_breakdown_counts_repeated_issues(self):
+        agent = AgentBase({'id': 'test_01', 'name': 'Test Agent', 'type': 'casual'})
+        agent._add_breakdown('growth', 'noUpgrade', 'medium')
+        agent._add_breakdown('pacing', 'slow', 'low')
+        agent._add_breakdown('growth', 'noUpgrade', 'medium')
+        assert [(b['issue'], b['count']) for b in agent.get_report()['breakdown']] == [('noUpgrade', 2), ('slow', 1)]
+
+    def test_expectation_deadlines_rearm_on_events(self):
+        agent = AgentBase({'id': 'a', 'name': 'A', 'type': 'casual'})
+        wheel = TimerWheel()
+        agent.schedule_expectations(wheel, tick_ms=1000)
+        agent.dimension_scores['playability'] = 5.0
+
+        def fire(now):
+            for agent_id, name in wheel.advance(now):
+                assert agent_id == 'a'
+                agent.on_expectation_timer(name)
+
+        fire(19)
+        agent._rearm('noDiscovery')
+        fire(38)
+        assert agent.dimension_scores['playability'] == 5.0
+        fire(39)
+        assert agent.dimension_scores['playability'] == pytest.approx(4.92)
+        assert wheel.remaining(('a', 'noDiscovery')) == 20
+
+    def test_score_table_caps_accumulated(self):
+        agent = AgentBase({'id': 'test_01', 'name': 'Test Agent', 'type': 'casual'})
+        agent.set_evaluation_config({
+            'frequencyMultipliers': {'low': {'baseMultiplier': 1.0}},
+            'factors': {'growth': {'negative': {
+                'goldWasted': {'baseScore': 0.3, 'frequency': 'low', 'maxAccumulated': 0.4},
+            }}},
+        })
+        agent.dimension_scores['growth'] = 5.0
+        for _ in range(3):
+            agent._adjust_score('growth', -0.3, 'goldWasted')
+        
+        # 与原实现一致：负面因子封顶的那一次余量按加分计
+        assert agent.dimension_scores['growth'] == pytest.approx(4.95, abs=0.02)
+        assert agent._accumulated[DIMENSIONS.index('growth') * 2 + 1] == pytest.approx(0.4)
+
+    def test_signed_cap_remainder_subtracts(self):
+        agent = AgentBase({'id': 'test_01', 'name': 'Test Agent', 'type': 'casual'})
+        agent.set_evaluation_config({
+            'regularization': {'signedCapRemainder': True},
+            'frequencyMultipliers': {'low': {'baseMultiplier': 1.0}},
+            'factors': {'growth': {'negative': {
+                'goldWasted': {'baseScore': 0.3, 'frequency': 'low', 'maxAccumulated': 0.4},
+            }}},
+        })
+        agent.dimension_scores['growth'] = 5.0
+        for _ in range(3):
+            agent._adjust_score('growth', -0.3, 'goldWasted')
+        
+        assert agent.dimension_scores['growth'] == pytest.approx(4.6, abs=0.02)
+
+    def test_score_table_defaults_base_score_to_delta(self):
+        agent = AgentBase({'id': 'test_01', 'name': 'Test Agent', 'type': 'casual'})
+        agent.set_evaluation_config({
+            'frequencyMultipliers': {'low': {'baseMultiplier': 2.0}},
+            'factors': {'growth': {'positive': {'goldFound': {'frequency': 'low'}}}},
+        })
+        agent.dimension_scores['growth'] = 5.0
+        agent._adjust_score('growth', 0.4, 'goldFound')
+        
+        assert agent.dimension_scores['growth'] == pytest.approx(5.0 + 0.4 * 2.0 * 0.5 * 0.5)
+
+    def test_saturated_once_all_firing_factors_are_capped(self):
+        agent = AgentBase({'id': 'test_01', 'name': 'Test Agent', 'type': 'casual'})
+        agent.dimension_scores.update(playability=5.0, growth=5.0, pacing=5.0)
+        assert not agent.is_saturated()
+
+        factor = {'baseScore': 1.0, 'frequency': 'low', 'maxAccumulated': 0.2}
+        agent.set_evaluation_config({
+            'frequencyMultipliers': {'low': {'baseMultiplier': 1.0}},
+            'factors': {
+                'playability': {'positive': {'newItem': factor}, 'negative': {'noDiscovery': factor}},
+                'growth': {'negative': {'noUpgrade': factor, 'lowDropRate': factor}},
+                'pacing': {'negative': {'progressStall': factor}},
+            },
+        })
+        for dimension, delta, name in [('playability', 0.1, 'newItem'), ('playability', -0.1, 'noDiscovery'),
+                                       ('growth', -0.1, 'noUpgrade')]:
+            agent._adjust_score(dimension, delta, name)
+        assert not agent.is_saturated()
+
+        agent._adjust_score('pacing', -0.1, 'progressStall')
+        assert agent.is_saturated()
+        scores = dict(agent.dimension_scores)
+        agent._adjust_score('growth', -0.1, 'lowDropRate')
+        agent._adjust_score('playability', 0.1, 'newItem')
+        assert agent.dimension_scores == scores
+
+    def test_saturated_when_uncapped_factors_push_into_bound(self):
+        agent = AgentBase({'id': 'test_01', 'name': 'Test Agent', 'type': 'casual'})
+        agent.set_evaluation_config({
+            'frequencyMultipliers': {'low': {'baseMultiplier': 1.0}},
+            'factors': {'playability': {'negative': {
+                'noDiscovery': {'baseScore': 1.0, 'frequency': 'low', 'maxAccumulated': 0.2},
+            }}},
+        })
+        agent.dimension_scores['playability'] = 9.0
+        agent._adjust_score('playability', -0.3, 'noDiscovery')
+        assert not agent.is_saturated()
+
+        # newItem 不在评分表里、不受累计上限约束，只有分数贴住 10 后才不再改变分数
+        agent._adjust_score('playability', 2.0, 'newItem')
+        assert agent.dimension_scores['playability'] == 10
+        assert agent.is_saturated()
+
+
+class TestRuleProfiler:
+    def test_records_hits_cost_and_errors(self, tmp_path):
+        path = tmp_path / 'event_rules.json'
+        path.write_text(json.dumps({'state_change_events': {'combat': {
+            'hurt': {'condition': 'hp_delta < 0', 'priority': 1},
+            'broken': {'condition': 'curr.player.weapon > 1', 'priority': 2},
+        }}}))
+        engine = EventInferenceEngine(str(path), registry=RuleSetRegistry())
+        engine.profiler = RuleProfiler()
+        curr = make_state(2, hp=50)
+        curr.player.weapon = 'sword'
+
+        for _ in range(3):
+            events, _ = engine.infer(make_state(1), curr)
+        assert [e.event_id for e in events] == ['hurt']
+
+        rows = {row['eventId']: row for row in engine.profiler.report()}
+        assert rows['hurt']['evaluations'] == 3 and rows['hurt']['hitRate'] == 1.0
+        assert rows['broken']['errors'] == 3 and 'TypeError' in rows['broken']['lastError']
+        assert rows['hurt']['totalUs'] > 0
+        assert engine.profiler.summary()['neverFired'] == ['broken']
+
+    def test_batch_shares_profiler(self):
+        batch = BatchInferenceEngine()
+        batch.scalar.profiler = RuleProfiler()
+        batch.infer_batch([make_state(1), make_state(1)], [make_state(2, hp=50), make_state(2)])
+
+        rows = {row['eventId']: row for row in batch.scalar.profiler.report()}
+        assert batch.scalar.profiler.ticks == 2
+        assert rows['player_damaged']['evaluations'] == 2
+        assert rows['player_damaged']['hits'] == 1
+
+
+class TestInventoryJournal:
+    def make_inventory(self):
+        from modules.inventory import InventoryModule
+        items = {'consumables': [{'id': 'potion', 'heal': 30, 'stackMax': 5}], 'materials': [{'id': 'ore'}]}
+        return InventoryModule({'initialSlots': 4}, items, {}, {})
+
+    def test_journal_records_exact_changes(self):
+        inventory = self.make_inventory()
+        inventory.add_item('potion', 3, 'loot')
+        inventory.add_item('potion', 4)
+        inventory.add_item('ore')
+        inventory.remove_item('ore')
+        inventory.remove_item('potion', 2)
+
+        changes = inventory.drain_journal()
+        assert [(c.item_id, c.delta, c.stack_delta) for c in changes] == [
+            ('potion', 3, 1), ('potion', 2, 0), ('ore', 1, 1), ('ore', -1, -1), ('potion', -2, 0),
+        ]
+        assert changes[0].source == 'loot'
+        assert inventory.journal == []
+
+    def test_same_tick_add_and_consume_is_seen(self):
+        inventory = self.make_inventory()
+        inventory.add_item('ore')
+        inventory.remove_item('ore')
+        changes = inventory.drain_journal()
+
+        prev, curr = make_state(1), make_state(2)
+        computed = EventInferenceEngine()._compute_values(prev, curr, changes)
+        assert computed['item_obtained'] == ['ore'] and computed['item_used'] == ['ore']
+        assert computed['item_count_delta'] == 0
+
+        diff = SnapshotManager().compute_diff(prev, curr, inventory_changes=changes)
+        assert diff.item_obtained == ['ore'] and diff.item_used == ['ore']
+
+    def test_items_view_reused_until_mutated(self):
+        inventory = self.make_inventory()
+        inventory.add_item('potion', 2)
+        inventory.add_item('ore')
+        view = inventory.get_state()['items']
+        assert view == [{'id': 'potion', 'count': 2}, {'id': 'ore', 'count': 1}]
+        assert inventory.get_state()['items'] is view
+
+        inventory.remove_item('potion', 2)
+        assert inventory.items == [{'id': 'ore', 'count': 1}]
+        assert view[0] == {'id': 'potion', 'count': 2}
+
+        inventory.registry = EntityRegistry(items=['ironSword', 'ore'])
+        assert inventory.get_item_count('ore') == 1 and inventory.get_healing_item() is None
+
+    def test_forge_checks_material_counts(self):
+        from modules.inventory import InventoryModule
+        items = {'materials': [{'id': 'ore'}, {'id': 'wood'}]}
+        equipment = {'weapons': [
+            {'id': 'club', 'materials': {'wood': 2}},
+            {'id': 'sword', 'materials': {'ore': 3, 'wood': 1}},
+        ]}
+        inventory = InventoryModule({}, items, equipment, {})
+        inventory.add_item('wood', 2)
+        assert inventory.forgeable('weapons') == ['club']
+        inventory.add_item('ore', 3)
+        assert inventory.forgeable('weapons') == ['club', 'sword']
+
+
+class TestScoringKernel:
+    @staticmethod
+    def evaluation_config():
+        return {
+            'factors': {
+                'excitement': {
+                    'positive': {
+                        'closeVictory': {'baseScore': 0.5, 'on': 'battle_end', 'trigger': 'victory && hpRatio < 0.2'},
+                        'skillCombo': {'baseScore': 0.3, 'trigger': '3+ skills in battle'},
+                    },
+                    'negative': {
+                        'noThrill': {'baseScore': 0.2, 'on': 'expectations', 'trigger': 'noLowHPBattles > 10'},
+                        'prose': {'baseScore': 0.2, 'on': 'battle_end', 'trigger': 'player.hp is low'},
+                    },
+                },
+            },
+        }
+
+    def test_compiles_expression_triggers_only(self):
+        kernel = ScoringKernel(self.evaluation_config())
+        assert sorted(f.factor_id for f in kernel.factors) == ['closeVictory', 'noThrill']
+        assert kernel.rejected == ['prose']
+        assert kernel.groups['expectations'][0].delta == -0.2
+
+    def test_fired_by_event_and_variables(self):
+        kernel = ScoringKernel(self.evaluation_config())
+        fired = kernel.fired(['player_damaged', 'battle_end'], {'victory': True, 'hpRatio': 0.1})
+        assert [f.factor_id for f in fired] == ['closeVictory']
+        assert kernel.fired(['battle_end'], {'victory': True, 'hpRatio': 0.5}) == []
+        assert not kernel.triggered_by(['player_damaged'])
+
+    def test_variables_are_resolved_lazily(self):
+        calls = []
+        variables = ScoringVariables({'hpRatio': lambda *args: calls.append(args) or 0.1, 'victory': lambda *_: False}, 'x')
+        ScoringKernel(self.evaluation_config()).fired(['battle_end'], variables)
+        assert calls == []
+
+    def test_agent_applies_fired_factors(self):
+        agent = AgentBase({'id': 'a', 'name': 'A', 'type': 'casual'})
+        config = self.evaluation_config()
+        agent.set_evaluation_config(config)
+        assert agent._scoring is ScoringKernel.for_config(config)
+
+        agent.dimension_scores['excitement'] = 5.0
+        agent._no_low_hp_battles = 11
+        agent.check_unmet_expectations()
+        assert agent.dimension_scores['excitement'] == 5.0
+
+        agent._refresh_expectations()
+        agent.check_unmet_expectations()
+        assert agent.dimension_scores['excitement'] < 5.0
+
+    def test_delta_and_triggers_override_base_score(self):
+        kernel = ScoringKernel({'factors': {'excitement': {'positive': {
+            'lowHPBattle': {
+                'baseScore': 0.2, 'on': 'player_damaged', 'trigger': 'hpRatio < 0.3',
+                'triggers': [{'trigger': 'hpRatio < 0.3', 'delta': 0.1}, {'trigger': 'hpRatio < 0.15', 'delta': 0.15}],
+            },
+            'bossFight': {'baseScore': 0.3, 'on': 'battle_start', 'trigger': 'isBoss', 'delta': 0.25},
+        }}}})
+        assert [f.delta for f in kernel.fired(['player_damaged'], {'hpRatio': 0.1})] == [0.1, 0.15]
+        assert [f.delta for f in kernel.fired(['player_damaged'], {'hpRatio': 0.2})] == [0.1]
+        assert [f.delta for f in kernel.fired(['battle_start'], {'isBoss': True})] == [0.25]
+
+    def test_for_config_cache_is_bounded(self):
+        configs = [self.evaluation_config() for _ in range(ScoringKernel.CACHE_SIZE + 2)]
+        kernels = [ScoringKernel.for_config(config) for config in configs]
+        assert ScoringKernel.for_config(configs[-1]) is kernels[-1]
+        assert len(ScoringKernel._cache) <= ScoringKernel.CACHE_SIZE
+
+    def test_unmasked_trigger_fires_by_name(self):
+        config = {'factors': {'excitement': {'positive': {
+            'custom': {'baseScore': 1.0, 'on': 'custom_rule', 'trigger': 'hpRatio < 0.5'},
+        }}}}
+        kernel = ScoringKernel(config)
+        assert 'custom_rule' not in EventFlag.__members__
+        assert kernel.triggered_by(['custom_rule'], event_mask(['custom_rule']))
+        assert not kernel.triggered_by(['explore'], event_mask(['explore']))
+
+        agent = AgentBase({'id': 'a', 'name': 'A', 'type': 'casual'})
+        agent.set_evaluation_config(config)
+        state = make_state(1, hp=10)
+        agent.analyze_state_change(state, state, StateDiff(0, 1, {}, ['custom_rule']))
+        assert agent.dimension_scores['excitement'] > 0
+
+
+class TestTimerWheel:
+    def test_expires_in_deadline_order(self):
+        wheel = TimerWheel()
+        wheel.schedule('b', 3)
+        wheel.schedule('a', 1)
+        wheel.schedule('c', 3)
+        wheel.schedule('c', 5)
+        wheel.cancel('b')
+        
+        assert wheel.advance(2) == ['a']
+        assert wheel.remaining('c') == 3
+        assert wheel.advance(100) == ['c']
+        assert len(wheel) == 0
+
+    def make_engine(self):
+        config = GameConfig(
+            player={'initial': {'hp': 100, 'maxHP': 100, 'atk': 10, 'def': 5}},
+            skills=[{'id': 'powerStrike', 'type': 'attack', 'damageMultiplier': 2.0, 'cd': 3, 'slow': 0.3}],
+            battle={'normalAttackRand': 0, 'enemyAttackRand': 0},
+        )
+        engine = GameEngine(config, seed=1)
+        engine._combat_module.current_monster = Monster(
+            id='slime', name='Slime', hp=10000, max_hp=10000, atk=20, defense=0,
+            crit_rate=0, dodge_rate=0, exp=0, gold=0,
+        )
+        engine._world_module.in_battle = True
+        return engine
+
+    def test_skill_cooldown_counts_actions(self):
+        engine = self.make_engine()
+        skill = Action(ActionType.USE_SKILL, {'skill_id': 'powerStrike'})
+        
+        assert engine.execute(skill).success
+        assert engine.get_state().player.skill_cooldowns == {'powerStrike': 2}
+        assert engine.get_available_skills() == []
+        
+        engine.execute(Action(ActionType.DEFEND))
+        assert not engine.execute(skill).success
+        assert engine.get_available_skills() == ['powerStrike']
+        assert engine.get_state().player.skill_cooldowns == {}
+
+    def test_slow_decays_per_enemy_swing(self):
+        engine = self.make_engine()
+        engine.execute(Action(ActionType.USE_SKILL, {'skill_id': 'powerStrike'}))
+        combat = engine._combat_module
+        
+        assert combat.slow_effect == pytest.approx(0.2)
+        engine.execute(Action(ActionType.USE_ITEM, {'item_id': 'potion'}))
+        engine.tick()
+        assert combat.slow_effect == pytest.approx(0.2)
+        engine.execute(Action(ActionType.DEFEND))
+        engine.execute(Action(ActionType.DEFEND))
+        assert combat.slow_effect == 0
+
+    def test_tick_does_not_advance_cooldowns(self):
+        engine = self.make_engine()
+        engine.execute(Action(ActionType.USE_SKILL, {'skill_id': 'powerStrike'}))
+        for _ in range(5):
+            engine.tick()
+        assert engine.get_state().player.skill_cooldowns == {'powerStrike': 2}
+
+    def test_effects_expire_and_survive_keyframes(self):
+        engine = self.make_engine()
+        player = engine._player_module
+        player.apply_effect('buffs', 'rage', 2, atk=5)
+        assert player.get_total_atk() == 15
+        
+        keyframe = engine.save_keyframe()
+        engine.execute(Action(ActionType.DEFEND))
+        assert engine.get_state().player.buffs == [{'id': 'rage', 'remaining': 1, 'atk': 5}]
+        engine.execute(Action(ActionType.DEFEND))
+        assert engine.get_state().player.buffs == []
+        assert player.get_total_atk() == 10
+        
+        engine.load_keyframe(keyframe)
+        assert player.get_state()['buffs'] == [{'id': 'rage', 'remaining': 2, 'atk': 5}]
+
+
+class StubModule(GameModule):
+    def __init__(self, module_id, dependencies=(), actions=()):
+        self._id = module_id
+        self._dependencies = list(dependencies)
+        self.actions = tuple(actions)
+        self.bound = {}
+        self.ticks = []
+
+    @property
+    def module_id(self):
+        return self._id
+
+    @property
+    def dependencies(self):
+        return self._dependencies
+
+    def get_state(self):
+        return {}
+
+    def set_state(self, state):
+        pass
+
+    def bind(self, dependencies):
+        self.bound = dependencies
+
+    def process_action(self, action, context):
+        return ActionResult(success=True, action_type=action.type, message=self._id)
+
+
+class TickingStubModule(StubModule):
+    def on_tick(self, tick, context):
+        self.ticks.append(tick)
+
+
+class TestModuleDispatch:
+    def test_dependency_order_and_bindings(self):
+        engine = ModularGameEngine()
+        world = StubModule('world', ['player', 'combat'], [ActionType.EXPLORE])
+        combat = StubModule('combat', ['player'], [ActionType.ATTACK])
+        player = StubModule('player')
+        for module in (world, combat, player):
+            engine.register_module(module)
+        
+        assert list(engine.get_state()) == ['player', 'combat', 'world']
+        assert world.bound == {'player': player, 'combat': combat}
+        assert engine.process_action(Action(ActionType.ATTACK)).message == 'combat'
+        assert not engine.process_action(Action(ActionType.FORGE)).success
+
+    def test_only_tick_subscribers_are_called(self):
+        engine = ModularGameEngine()
+        weather = TickingStubModule('weather')
+        engine.register_module(StubModule('player'))
+        engine.register_module(weather)
+        engine.tick()
+        
+        assert engine._tick_modules == [weather]
+        assert weather.ticks == [1]
+
+    def test_circular_dependency_rejected(self):
+        engine = ModularGameEngine()
+        engine.register_module(StubModule('a', ['b']))
+        with pytest.raises(ValueError):
+            engine.register_module(StubModule('b', ['a']))
+
+
+class TestDerivedStats:
+    def make_player(self):
+        from modules.player import PlayerModule
+        equipment = {'weapons': [{'id': 'ironSword', 'atk': 5}], 'armors': [{'id': 'leatherArmor', 'def': 3}]}
+        return PlayerModule({'initial': {'atk': 10, 'def': 5}, 'levelUp': {'atk': 2, 'def': 1}}, equipment)
+
+    def test_cached_until_invalidated(self):
+        player = self.make_player()
+        stats = player.stats
+        assert (stats.atk, stats.defense) == (10, 5)
+        assert player.stats is stats
+        
+        player.weapon = 'ironSword'
+        assert player.stats.atk == 15
+        player.level_up()
+        assert (player.stats.atk, player.stats.defense) == (17, 6)
+        player.apply_effect('debuffs', 'weaken', 2, atk=-4, dodge_rate=-0.05)
+        assert player.stats.atk == 13 and player.stats.dodge_rate == pytest.approx(0)
+        player.remove_effect('debuffs', 'weaken')
+        assert player.stats.atk == 17
+
+    def test_exposed_in_player_state(self):
+        player = self.make_player()
+        player.armor = 'leatherArmor'
+        state = PlayerState.from_dict(player.get_state())
+        assert (state.total_atk, state.total_def, state.total_max_hp) == (10, 8, 100)
+        assert PlayerState.from_dict(state.to_dict()) == state
+
+
+class TestEntityRegistry:
+    def test_config_entities_get_dense_ids(self):
+        config = GameConfig(
+            skills=[{'id': 'powerStrike'}, {'id': 'fireball'}],
+            items={'materials': [{'id': 'ironOre'}]},
+            equipment={'weapons': [{'id': 'ironSword'}]},
+        )
+        registry = EntityRegistry.for_config(config)
+        assert registry is EntityRegistry.for_config(config)
+        assert registry.skills.ids == {'powerStrike': 0, 'fireball': 1}
+        assert registry.items.names == ['ironOre', 'ironSword']
+        assert registry.items.get('ironSword') == registry.items.intern('ironSword') == 1
+        assert 'ironOre' in registry.items
+        assert registry.items.intern('dragonScale') == 2
+
+    def test_for_config_cache_is_bounded(self):
+        configs = [GameConfig(skills=[{'id': 'powerStrike'}]) for _ in range(EntityRegistry.CACHE_SIZE + 2)]
+        registries = [EntityRegistry.for_config(config) for config in configs]
+        assert EntityRegistry.for_config(configs[-1]) is registries[-1]
+        assert len(EntityRegistry._cache) <= EntityRegistry.CACHE_SIZE
+
+    def test_cooldown_keys_built_once_from_config(self):
+        engine = TestTimerWheel().make_engine()
+        player = engine._engine.get_module('player')
+        key = player._cooldown_keys['powerStrike']
+        assert key == ('player', 'cooldown', engine.registry.skills.get('powerStrike'))
+        player.start_cooldown('powerStrike', 2)
+        assert player._cooldown_keys['powerStrike'] is key
+        assert not player.is_skill_ready('powerStrike') and player.cooldown_remaining('powerStrike') == 2
+        assert player.is_skill_ready('frostArrow') and player.cooldown_remaining('frostArrow') == 0
+
+
+class TestEventFlags:
+    def test_mask_roundtrip(self):
+        mask = event_mask(['battle_start', 'player_damaged', 'unknown_event', 'battle_start'])
+        assert mask == EventFlag.battle_start | EventFlag.player_damaged
+        assert event_names(mask) == ['battle_start', 'player_damaged']
+        assert StateDiff(0, 1, {}, ['level_up']).event_mask == EventFlag.level_up
+
+    def test_checkpoint_by_mask_or_names(self):
+        strategy = SnapshotStrategy()
+        assert strategy.should_create_snapshot(1, EventFlag.level_up, 0, 0) == SnapshotType.CHECKPOINT
+        assert strategy.should_create_snapshot(1, EventFlag.explore, 0, 0) == SnapshotType.INCREMENTAL
+        strategy.checkpoint_triggers = {'custom_marker'}
+        assert strategy.should_create_snapshot(1, ['custom_marker'], 0, 0) == SnapshotType.CHECKPOINT
+
+    def test_engine_reports_event_mask(self):
+        engine = TestTimerWheel().make_engine()
+        engine.execute(Action(ActionType.ATTACK))
+        assert engine.get_event_mask() & EventFlag.player_attack
+        assert engine.get_event_mask() == event_mask(engine.get_events())
+
+
+class TestTimeTravel:
+    def test_replay_checks_full_rng_state(self, tmp_path):
+        engine = TestTimerWheel().make_engine()
+        digest, position = engine.rng_digest(), engine._engine.rng.getstate()[1][-1]
+        for _ in range(624):
+            engine._engine.rng.random()
+        assert engine._engine.rng.getstate()[1][-1] == position
+        assert engine.rng_digest() != digest
+
+        log = ActionLog()
+        log.add_keyframe(engine.save_keyframe())
+        for _ in range(5):
+            action = Action(ActionType.ATTACK)
+            engine.execute(action)
+            log.capture(engine, action)
+        log.save(str(tmp_path))
+
+        travel = TimeTravel(engine.config, ActionLog.load(str(tmp_path)))
+        assert travel.state_at(travel.last_tick).monster.hp == engine.get_state().monster.hp
+
+        tick, action_type, params, digest = travel.log.records[2]
+        travel.log.records[2] = (tick, action_type, params, digest ^ 1)
+        travel._engine = None
+        with pytest.raises(RuntimeError):
+            travel.state_at(travel.last_tick)
+
+
+class TestSteadyState:
+    def test_actions_are_interned(self):
+        assert Action.of(ActionType.EXPLORE) is Action.of(ActionType.EXPLORE)
+        skill = Action.of(ActionType.USE_SKILL, skill_id='powerStrike')
+        assert skill is Action.of(ActionType.USE_SKILL, skill_id='powerStrike')
+        assert skill.params == {'skill_id': 'powerStrike'}
+
+    def test_results_recycled_per_action_type(self):
+        engine = TestTimerWheel().make_engine()
+        engine._engine.recycle_results = True
+        first = engine.execute(Action.of(ActionType.ATTACK))
+        second = engine.execute(Action.of(ActionType.ATTACK))
+        assert second is first and second.events.count('player_attack') == 1
+        assert engine.execute(Action.of(ActionType.DEFEND)) is not first
+
+    def test_pooled_diff_drops_previous_fields(self):
+        inference = EventInferenceEngine()
+        inference.pool_diffs = True
+        prev, curr = make_state(1), make_state(2)
+        first = inference.build_state_diff(prev, curr, [], {'hp_delta': -5})
+        assert first.hp_delta == -5
+        second = inference.build_state_diff(curr, make_state(3), [], {})
+        assert second is first and second.hp_delta == 0 and second.tick_to == 3
+
 
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
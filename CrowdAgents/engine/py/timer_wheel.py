@@ -0,0 +1,72 @@
+"""
+定时轮
+按到期 tick 分桶登记定时器：登记、取消、查询剩余时间都是 O(1)，推进时钟只访问到期的桶，
+开销与到期的定时器数成正比，与挂着的定时器总数无关
+"""
+
+from typing import Dict, Hashable, List, Sequence
+
+
+class TimerWheel:
+    def __init__(self, now: int = 0):
+        self.now = now
+        self._buckets: Dict[int, List[Hashable]] = {}
+        self._deadlines: Dict[Hashable, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._deadlines
+
+    def schedule(self, key: Hashable, delay: int) -> int:
+        """delay 个 tick 后到期；同一 key 重复登记以最后一次为准，delay <= 0 视为已到期"""
+        deadline = self.now + delay
+        if delay <= 0:
+            self._deadlines.pop(key, None)
+            return deadline
+        self._deadlines[key] = deadline
+        self._buckets.setdefault(deadline, []).append(key)
+        return deadline
+
+    def cancel(self, key: Hashable) -> bool:
+        # 桶里的旧条目留到推进时按 deadline 对不上丢弃
+        return self._deadlines.pop(key, None) is not None
+
+    def remaining(self, key: Hashable) -> int:
+        deadline = self._deadlines.get(key)
+        return deadline - self.now if deadline is not None else 0
+
+    def advance(self, now: int) -> Sequence[Hashable]:
+        """把时钟推进到 now，按到期先后返回这段时间内到期的 key；没有到期时返回共用的空元组"""
+        if now <= self.now:
+            return ()
+        if now - self.now <= len(self._buckets):
+            ticks = range(self.now + 1, now + 1)
+        else:
+            ticks = sorted(t for t in self._buckets if t <= now)
+
+        expired = None
+        deadlines = self._deadlines
+        for tick in ticks:
+            bucket = self._buckets.pop(tick, None)
+            if not bucket:
+                continue
+            for key in bucket:
+                if deadlines.get(key) == tick:
+                    del deadlines[key]
+                    if expired is None:
+                        expired = []
+                    expired.append(key)
+        self.now = now
+        return expired if expired is not None else ()
+
+    def pending(self) -> Dict[Hashable, int]:
+        """所有未到期的 key 及剩余 tick 数"""
+        return {key: deadline - self.now for key, deadline in self._deadlines.items()}
+
+    def clear(self, now: int = None) -> None:
+        self._buckets.clear()
+        self._deadlines.clear()
+        if now is not None:
+            self.now = now
@@ -0,0 +1,141 @@
+"""
+行动日志与时间回溯
+按 Agent 记录每次行动（类型 + 参数 + RNG 状态摘要）与稀疏关键帧，
+通过恢复最近关键帧并重放行动，确定性地还原任意 tick 的 GameState
+"""
+
+from bisect import bisect_right
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from pathlib import Path
+
+import orjson
+
+from state import GameState
+from modules.base import Action, ActionType
+from engine import GameEngine
+from config import GameConfig
+
+
+class ActionLog:
+    """
+    单个 Agent 的行动日志
+    records: (tick, action_type, params, rng_digest)，tick 为执行后的引擎 tick
+    keyframes: (tick, 序列化的引擎关键帧)，tick 为关键帧对应的引擎 tick
+    """
+
+    ACTIONS_FILE = 'actions.json'
+    KEYFRAMES_FILE = 'keyframes.json'
+
+    def __init__(self, keyframe_interval: int = 500):
+        self.keyframe_interval = keyframe_interval
+        self.records: List[Tuple[int, str, Dict[str, Any], int]] = []
+        self.keyframes: List[Tuple[int, bytes]] = []
+
+    def should_keyframe(self, tick: int) -> bool:
+        return not self.keyframes or tick - self.keyframes[-1][0] >= self.keyframe_interval
+
+    def add_keyframe(self, keyframe: Dict[str, Any]) -> None:
+        self.keyframes.append((keyframe['tick'], orjson.dumps(keyframe)))
+
+    def record(self, tick: int, action: Action, rng_digest: int) -> None:
+        self.records.append((tick, action.type.value, action.params, rng_digest))
+
+    def capture(self, engine: GameEngine, action: Action) -> None:
+        """在 engine.execute(action) 之后调用"""
+        self.record(engine._tick, action, engine.rng_digest())
+
+    def stats(self) -> Dict[str, Any]:
+        actions_bytes = len(orjson.dumps(self.records))
+        keyframe_bytes = sum(len(data) for _, data in self.keyframes)
+        return {
+            'actions': len(self.records),
+            'keyframes': len(self.keyframes),
+            'action_bytes': actions_bytes,
+            'keyframe_bytes': keyframe_bytes,
+        }
+
+    def save(self, log_dir: str) -> None:
+        path = Path(log_dir)
+        path.mkdir(parents=True, exist_ok=True)
+        (path / self.ACTIONS_FILE).write_bytes(orjson.dumps(self.records))
+        (path / self.KEYFRAMES_FILE).write_bytes(orjson.dumps([
+            {'tick': tick, 'state': orjson.loads(data)} for tick, data in self.keyframes
+        ]))
+
+    @classmethod
+    def load(cls, log_dir: str) -> 'ActionLog':
+        path = Path(log_dir)
+        log = cls()
+        log.records = [tuple(r) for r in orjson.loads((path / cls.ACTIONS_FILE).read_bytes())]
+        log.keyframes = [
+            (k['tick'], orjson.dumps(k['state']))
+            for k in orjson.loads((path / cls.KEYFRAMES_FILE).read_bytes())
+        ]
+        if len(log.keyframes) > 1:
+            log.keyframe_interval = log.keyframes[1][0] - log.keyframes[0][0]
+        return log
+
+
+class TimeTravel:
+    """
+    从行动日志还原任意 tick 的状态
+    顺序向后查询时复用上一次的引擎继续重放，不必每次回到关键帧
+    """
+
+    def __init__(self, game_config: GameConfig, log: ActionLog):
+        self.game_config = game_config
+        self.log = log
+        self._keyframe_ticks = [tick for tick, _ in log.keyframes]
+        self._record_ticks = [record[0] for record in log.records]
+        self._engine: Optional[GameEngine] = None
+        self._cursor = 0
+
+    @classmethod
+    def from_dir(cls, game_config: GameConfig, log_dir: str) -> 'TimeTravel':
+        return cls(game_config, ActionLog.load(log_dir))
+
+    @property
+    def first_tick(self) -> int:
+        return self._keyframe_ticks[0] if self._keyframe_ticks else 0
+
+    @property
+    def last_tick(self) -> int:
+        return self._record_ticks[-1] if self._record_ticks else self.first_tick
+
+    def state_at(self, tick: int) -> GameState:
+        if not self._keyframe_ticks or tick < self.first_tick:
+            raise ValueError(f"No keyframe at or before tick {tick}")
+        if tick > self.last_tick:
+            raise ValueError(f"Tick {tick} is beyond the end of the log ({self.last_tick})")
+
+        keyframe_no = bisect_right(self._keyframe_ticks, tick) - 1
+        keyframe_tick = self._keyframe_ticks[keyframe_no]
+        if self._engine is None or not keyframe_tick <= self._engine._tick <= tick:
+            self._restore(keyframe_no)
+
+        self._advance(tick)
+        return self._engine.get_state()
+
+    def iter_states(self, from_tick: int, to_tick: int) -> Iterator[GameState]:
+        for tick in range(from_tick, to_tick + 1):
+            yield self.state_at(tick)
+
+    def _restore(self, keyframe_no: int) -> None:
+        tick, data = self.log.keyframes[keyframe_no]
+        self._engine = GameEngine(self.game_config)
+        self._engine.load_keyframe(orjson.loads(data))
+        self._cursor = bisect_right(self._record_ticks, tick)
+
+    def _advance(self, tick: int) -> None:
+        engine = self._engine
+        records = self.log.records
+        while self._cursor < len(records) and records[self._cursor][0] <= tick:
+            record_tick, action_type, params, rng_digest = records[self._cursor]
+            engine.execute(Action(ActionType(action_type), dict(params)))
+            engine.get_events()
+            if engine._tick != record_tick or engine.rng_digest() != rng_digest:
+                raise RuntimeError(
+                    f"Replay diverged at tick {record_tick}: "
+                    f"engine tick {engine._tick}, rng digest {engine.rng_digest()} != {rng_digest}"
+                )
+            self._cursor += 1